@@ -1,11 +1,20 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from .schemas import SymbolsResponse, LatestResponse, Candle, PredictResponse
-import yfinance as yf
+from .stream import StreamHub
+from app.lake.schema import PRICE_COLS, normalize_candles
+from app.lake.writer import latest_partitions, partition_date
+from app.market.providers import get_provider
+from app.obs.log import get_logger, log_context
+from app.obs.profiling import profile_route, request_profile
 import pandas as pd
 from datetime import datetime
-from typing import List
+from typing import List, Optional
+import base64
+import json
 import os
+import time
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente do .env
@@ -18,6 +27,8 @@ SYMBOLS_ENV = os.getenv("SYMBOLS", "AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA")
 SYMBOLS = [s.strip() for s in SYMBOLS_ENV.split(",")]
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
 
+log = get_logger(__name__)
+
 app = FastAPI(title=API_TITLE, version=API_VERSION, debug=DEBUG)
 
 # Configuração CORS
@@ -31,6 +42,26 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Correlation id por request (x-request-id, id do Lambda ou novo), amostragem de logs por rota
+    e pedido de profiling pelo header x-profile (ver app/obs/profiling.py)."""
+    aws_context = request.scope.get("aws.context")
+    cid = request.headers.get("x-request-id") or getattr(aws_context, "aws_request_id", None)
+    route = request.url.path
+    with log_context(cid, sample_key=route, route=route) as cid:
+        profile_token = request_profile(request.headers)
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            profile_token.var.reset(profile_token)
+        log.info("request", method=request.method, status=response.status_code,
+                 duration_ms=round((time.perf_counter() - start) * 1000, 2))
+    response.headers["x-request-id"] = cid
+    return response
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
@@ -41,198 +72,183 @@ def symbols():
     return SymbolsResponse(symbols=SYMBOLS)
 
 
-def fetch_from_s3(symbol: str, interval: str, limit: int = 120):
-    """Try to fetch data from S3 first, fallback to yfinance"""
-    print(f"=== STARTING S3 FETCH for {symbol} {interval} ===")
-    
+def fetch_from_s3(symbol: str, interval: str, limit: int = 120, since: Optional[pd.Timestamp] = None):
+    """Try to fetch data from S3 first, fallback to yfinance.
+
+    Com `since` (modo delta), as partições a partir de since são lidas em ordem
+    crescente até haver mais de `limit` barras >= since, e o frame volta com
+    todas essas barras (sem corte): quem chama pega as primeiras e sabe se
+    sobrou. Sem partições a partir de since, devolve um frame vazio (não há
+    novidade, sem fallback).
+    """
     try:
-        print("Step 1: Importing boto3...")
         import boto3
         from pathlib import Path
-        print("✓ boto3 imported successfully")
-        
-        print("Step 2: Creating S3 client...")
+
         s3 = boto3.client('s3')
         bucket = os.getenv('S3_RAW_BUCKET', 'fiap-fase3-finance-raw')
-        print(f"✓ S3 client created, bucket: {bucket}")
-        
+
         # S3 structure: /prices_1d/interval=1d/symbol=AAPL/ or /prices_1h/interval=1h/symbol=AAPL/
         prefix = f"/prices_{interval}/interval={interval}/symbol={symbol}/"
-        print(f"Step 3: Using prefix: {prefix}")
-        
-        print("Step 4: Listing S3 objects...")
         response = s3.list_objects_v2(Bucket=bucket, Prefix=prefix, MaxKeys=1000)
-        print(f"✓ S3 list_objects_v2 completed")
-        print(f"Response keys: {list(response.keys())}")
-        
+
         if 'Contents' not in response:
-            print(f"❌ No Contents in response - no objects found")
+            log.info("no objects in S3", bucket=bucket, prefix=prefix)
             return None
-        
+
         contents = response['Contents']
-        print(f"✓ Found {len(contents)} objects in S3")
-        print(f"First 3 objects: {[obj['Key'] for obj in contents[:3]]}")
-        
+        log.debug("S3 objects listed", prefix=prefix, objects=len(contents),
+                  first_keys=lambda: [obj['Key'] for obj in contents[:3]])
+
+        if since is not None:
+            floor = (since.year, since.month, since.day if interval == "1h" else 0)
+            contents = [
+                obj for obj in contents
+                if (partition_date(obj['Key']) or floor) >= floor
+            ]
+            if not contents:
+                return pd.DataFrame(columns=["timestamp", *PRICE_COLS, "volume"])
+
         # Download and process recent files
         temp_dir = Path("/tmp") / f"data_{symbol}_{interval}"
         temp_dir.mkdir(parents=True, exist_ok=True)
-        print(f"Step 5: Created temp dir: {temp_dir}")
-        
-        # Sort by last modified and get recent files
-        max_files = 20 if interval == "1h" else 10
-        files = sorted(contents, key=lambda x: x['LastModified'], reverse=True)[:max_files]
-        print(f"Step 6: Processing {len(files)} recent files...")
-        
+
+        if since is None:
+            # Partições mais recentes pelo year/month/day da chave, não pelo LastModified
+            max_files = 20 if interval == "1h" else 10
+            keys = latest_partitions([obj['Key'] for obj in contents], max_files)
+        else:
+            # Delta: da partição de since em diante, em ordem, até cobrir limit + 1 barras
+            keys = sorted(
+                (obj['Key'] for obj in contents if obj['Key'].endswith('.parquet')),
+                key=lambda k: (partition_date(k) or (0, 0, 0), k),
+            )
+
         dfs = []
-        for i, file_obj in enumerate(files):
-            key = file_obj['Key']
+        rows_since = 0
+        for i, key in enumerate(keys):
+            if since is not None and rows_since > limit:
+                break
             if key.endswith('.parquet'):
                 try:
                     local_path = temp_dir / f"file_{i}.parquet"
-                    print(f"  Downloading {key}...")
                     s3.download_file(bucket, key, str(local_path))
-                    
-                    df_temp = pd.read_parquet(local_path)
-                    dfs.append(df_temp)
-                    print(f"  ✓ Processed file with {len(df_temp)} rows")
-                except Exception as e:
-                    print(f"  ❌ Error processing file {key}: {e}")
-                    continue
-        
-        if not dfs:
-            print("❌ No data files processed successfully")
-            return None
-            
-        # Combine and sort by timestamp
-        print(f"Step 7: Combining {len(dfs)} dataframes...")
-        df = pd.concat(dfs, ignore_index=True)
-        
-        # Ensure timestamp is datetime
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        
-        # Sort by timestamp and get the most recent data
-        df = df.sort_values('timestamp').tail(limit)
-        
-        print(f"✓ S3 fetch completed: {len(df)} rows from {df['timestamp'].min()} to {df['timestamp'].max()}")
-        
-        # Clean up temp files
-        import shutil
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        
-        return df
-        
-    except Exception as e:
-        print(f"❌ ERROR in fetch_from_s3: {type(e).__name__}: {str(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
-        return None
-            
-        # Download a few recent files
-        temp_dir = Path("/tmp") / f"data_{symbol}_{interval}"
-        temp_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Sort by last modified and get recent files
-        # For hourly data, get more files since they contain less data per file
-        max_files = 20 if interval == "1h" else 10
-        files = sorted(response['Contents'], key=lambda x: x['LastModified'], reverse=True)[:max_files]
-        
-        print(f"Found {len(files)} recent files in S3 for {symbol} {interval}")
-        
-        dfs = []
-        for file_obj in files:
-            key = file_obj['Key']
-            if key.endswith('.parquet'):
-                try:
-                    local_path = temp_dir / Path(key).name
-                    s3.download_file(bucket, key, str(local_path))
-                    
+
                     df_temp = pd.read_parquet(local_path)
+                    if since is not None:
+                        df_temp = normalize_candles(df_temp, symbol, interval)
+                        df_temp = df_temp[df_temp['timestamp'] >= since]
+                        rows_since += len(df_temp)
                     dfs.append(df_temp)
+                    log.debug("S3 file read", key=key, rows=len(df_temp))
                 except Exception as e:
-                    print(f"Error processing file {key}: {e}")
+                    log.warning("error processing S3 file", key=key, error=str(e))
                     continue
-                
+
         if not dfs:
+            log.warning("no S3 files processed successfully", prefix=prefix)
             return None
-            
+
         # Combine and sort by timestamp
-        df = pd.concat(dfs, ignore_index=True)
-        
-        # Ensure timestamp is datetime
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        
-        # Sort by timestamp and get the most recent data
-        df = df.sort_values('timestamp').tail(limit)
-        
-        print(f"Loaded {len(df)} rows from S3 for {symbol} {interval}")
-        print(f"Date range: {df['timestamp'].min()} to {df['timestamp'].max()}")
-        
+        df = normalize_candles(pd.concat(dfs, ignore_index=True), symbol, interval)
+
+        # Sort by timestamp and get the most recent data (delta: tudo desde since)
+        df = df.sort_values('timestamp')
+        if since is None:
+            df = df.tail(limit)
+
+        log.info("S3 fetch completed", symbol=symbol, interval=interval, files=len(dfs), rows=len(df),
+                 first=lambda: df['timestamp'].min(), last=lambda: df['timestamp'].max())
+
         # Clean up temp files
         import shutil
         shutil.rmtree(temp_dir, ignore_errors=True)
-        
+
         return df
-        
+
     except Exception as e:
-        print(f"Error fetching from S3: {e}")
+        log.warning("S3 fetch failed", symbol=symbol, interval=interval,
+                    error_type=type(e).__name__, error=str(e))
+        # Traceback só com LOG_LEVEL=DEBUG: é um caminho esperado (cai no provider)
+        log.debug("S3 fetch traceback", exc_info=True)
         return None
 
 
+def serialize_candles(df: pd.DataFrame) -> List[Candle]:
+    """Converte o frame de candles no payload do /latest."""
+    # Preços podem vir em float32 do lake: arredondar evita 227.52999877929688 no JSON
+    prices = df[PRICE_COLS].astype("float64").round(4)
+    return [
+        Candle(
+            timestamp=pd.to_datetime(row['timestamp']).isoformat(),
+            open=float(prices.at[idx, 'open']),
+            high=float(prices.at[idx, 'high']),
+            low=float(prices.at[idx, 'low']),
+            close=float(prices.at[idx, 'close']),
+            volume=float(row['volume']),
+        )
+        for idx, row in df.iterrows()
+    ]
+
+
+# Duração de uma barra: decide se a última barra devolvida ainda está em formação
+BAR_DURATION = {"1h": pd.Timedelta(hours=1), "1d": pd.Timedelta(days=1)}
+
+
+def encode_cursor(ts: pd.Timestamp, forming: bool) -> str:
+    """Cursor opaco do /latest: última barra entregue e se ela ainda pode mudar."""
+    raw = json.dumps({"ts": ts.isoformat(), "forming": forming}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    data = json.loads(raw)
+    return _utc(data["ts"]), bool(data["forming"])
+
+
+def _utc(value) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
 @app.get("/latest", response_model=LatestResponse)
-def latest(symbol: str, interval: str = "1h", limit: int = 120):
+@profile_route("latest")
+def latest(
+    symbol: str, interval: str = "1h", limit: int = 120,
+    since: Optional[str] = None, cursor: Optional[str] = None,
+):
+    """Últimas `limit` barras; com `since` (timestamp) ou `cursor` (next_cursor anterior),
+    só as barras mais novas e, via `replaced`, a barra em formação atualizada."""
     if symbol not in SYMBOLS:
         raise HTTPException(status_code=400, detail="symbol not allowed")
+
+    after, include_after = None, False
+    try:
+        if cursor:
+            after, include_after = decode_cursor(cursor)
+        elif since:
+            after = _utc(since)
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid since/cursor")
     
     try:
         # Try S3 first, fallback to yfinance
-        df = fetch_from_s3(symbol, interval, limit)
+        df = fetch_from_s3(symbol, interval, limit, since=after)
         
-        if df is None or df.empty:
-            print(f"Using yfinance fallback for {symbol} {interval}")
-            # Fallback to yfinance with appropriate period
+        # Delta sem barras novas no lake é uma resposta válida (vazia), não motivo de fallback
+        if df is None or (df.empty and after is None):
+            log.info("using market data provider fallback", symbol=symbol, interval=interval)
+            # Fallback to the market data provider (yfinance by default) with appropriate period
             period_map = {"1h": "1d", "1d": "30d"}
             period = period_map.get(interval, "30d")
             
-            df = yf.download(
-                tickers=symbol,
-                period=period,
-                interval=interval,
-                progress=False,
-                prepost=False,
-                threads=False,
-            )
+            df = get_provider().download(symbol, interval, period=period)
             
             if df.empty:
                 raise ValueError("Empty dataframe")
-                
-            # Handle multi-index columns (yfinance sometimes returns multi-level columns)
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = [col[0] if col[1] == symbol else col[0] for col in df.columns]
             
-            df = df.reset_index()
             df = df.tail(limit)
-            
-            # Determine the timestamp column name
-            timestamp_col = None
-            for col in df.columns:
-                col_str = str(col).lower()
-                if 'datetime' in col_str or 'date' in col_str or col_str == 'timestamp':
-                    timestamp_col = col
-                    break
-            
-            if timestamp_col is None:
-                timestamp_col = df.columns[0]
-            
-            # Rename columns to match our S3 format
-            column_mapping = {
-                timestamp_col: 'timestamp',
-                'Open': 'open',
-                'High': 'high', 
-                'Low': 'low',
-                'Close': 'close',
-                'Volume': 'volume'
-            }
-            df = df.rename(columns=column_mapping)
         
         # Ensure we have the required columns
         required_cols = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
@@ -240,96 +256,140 @@ def latest(symbol: str, interval: str = "1h", limit: int = 120):
             if col not in df.columns:
                 raise ValueError(f"Missing required column: {col}")
         
-        candles = [
-            Candle(
-                timestamp=pd.to_datetime(row['timestamp']).isoformat(),
-                open=float(row['open']),
-                high=float(row['high']),
-                low=float(row['low']),
-                close=float(row['close']),
-                volume=float(row['volume']),
+        replaced, next_cursor, has_more = False, cursor, False
+        if after is not None:
+            # A barra do cursor volta só se ainda estava em formação quando foi entregue.
+            # As `limit` barras mais antigas depois do cursor: o restante vem na próxima página
+            ts = df["timestamp"]
+            df = df[(ts >= after) if include_after else (ts > after)].sort_values("timestamp")
+            has_more = len(df) > limit
+            df = df.head(limit)
+            replaced = include_after and not df.empty and df["timestamp"].iloc[0] == after
+            if next_cursor is None:
+                next_cursor = encode_cursor(after, False)
+        if not df.empty:
+            last = pd.Timestamp(df["timestamp"].iloc[-1])
+            forming = not has_more and (
+                last + BAR_DURATION.get(interval, pd.Timedelta(0)) > pd.Timestamp.now(tz="UTC")
             )
-            for _, row in df.iterrows()
-        ]
-        
-        print(f"Returning {len(candles)} candles for {symbol} {interval}")
-        return LatestResponse(symbol=symbol, interval=interval, candles=candles)
+            next_cursor = encode_cursor(_utc(last), forming)
+
+        candles = serialize_candles(df)
+
+        log.info("latest served", symbol=symbol, interval=interval, candles=len(candles),
+                 delta=after is not None, has_more=has_more)
+        return LatestResponse(symbol=symbol, interval=interval, candles=candles,
+                              replaced=replaced, next_cursor=next_cursor, has_more=has_more)
         
     except Exception as e:
-        print(f"Error in latest endpoint: {e}")
+        log.error("latest failed", symbol=symbol, interval=interval, error=str(e))
         raise HTTPException(status_code=500, detail=f"failed to fetch latest: {e}")
 
 
 @app.post("/predict", response_model=PredictResponse)
+@profile_route("predict")
 def predict(symbol: str):
     if symbol not in SYMBOLS:
         raise HTTPException(status_code=400, detail="symbol not allowed")
+    return compute_prediction(symbol)
 
-    # Carregar modelo do S3 se existir; cache /tmp em Lambda
-    import os, joblib, boto3
+
+def compute_prediction(symbol: str, refresh: bool = False) -> PredictResponse:
+    """Previsão do símbolo; `refresh=True` ignora o modelo em cache no /tmp (usado pelo /stream)."""
+    # Carregar modelo compacto (.npz) do S3 se existir; cache /tmp em Lambda.
+    # Só NumPy: sklearn/joblib não são importados no caminho de inferência.
+    import os, boto3
     import pandas as pd
-    import yfinance as yf
     from app.ml.features import add_basic_features
-    from app.ml.model import FEATURES
+    from app.ml.scorer import CompactModel, signal_from_prob
 
     bucket = os.getenv("MODELS_BUCKET", "fiap-fase3-finance-models")
-    key = f"models/{symbol}_daily_logreg.pkl"
+    # Mesmo prefixo usado pelo train_daily no upload
+    key = f"daily/{symbol}_daily_logreg.npz"
 
     local_cache_dir = "/tmp/models"
     os.makedirs(local_cache_dir, exist_ok=True)
-    local_path = os.path.join(local_cache_dir, f"{symbol}_daily_logreg.pkl")
+    local_path = os.path.join(local_cache_dir, f"{symbol}_daily_logreg.npz")
 
-    clf = None
-    if os.path.exists(local_path):
+    model = None
+    if os.path.exists(local_path) and not refresh:
         try:
-            clf = joblib.load(local_path)
+            model = CompactModel.load(local_path)
         except Exception:
-            clf = None
+            model = None
 
-    if clf is None:
+    if model is None:
         s3 = boto3.client("s3")
         try:
             s3.download_file(bucket, key, local_path)
-            clf = joblib.load(local_path)
-        except Exception:
+            model = CompactModel.load(local_path)
+        except Exception as e:
             # Modelo não disponível ainda: fallback
+            log.info("model not available, returning hold", symbol=symbol, key=key, error=str(e))
             ts = datetime.utcnow().isoformat() + "Z"
             return PredictResponse(symbol=symbol, prob_up=0.5, signal="hold", asof=ts)
 
     # Inferência com último dia (diário)
-    df = yf.download(
-        tickers=symbol, period="2mo", interval="1d", progress=False, threads=False
-    )
+    df = get_provider().download(symbol, "1d", period="2mo")
     if df.empty:
         raise HTTPException(
             status_code=500, detail="failed to fetch daily data for inference"
         )
-    
-    # CORREÇÃO: Lidar com MultiIndex do yfinance
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
-    
-    df = df.reset_index().rename(
-        columns={
-            "Date": "timestamp",
-            "Open": "open",
-            "High": "high",
-            "Low": "low",
-            "Close": "close",
-            "Volume": "volume",
-        }
-    )
-    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    df = df.rename(columns=str.lower)
 
     feats = add_basic_features(df)
-    x = feats.iloc[[-1]][FEATURES]
-    prob_up = float(getattr(clf, "predict_proba")(x)[0][1])
-    signal = "buy" if prob_up >= 0.6 else ("sell" if prob_up <= 0.4 else "hold")
+    x = feats.iloc[[-1]]
+    prob_up = float(model.predict_proba_up(x)[0])
+    signal = signal_from_prob(prob_up)
     ts = datetime.utcnow().isoformat() + "Z"
     return PredictResponse(symbol=symbol, prob_up=prob_up, signal=signal, asof=ts)
 
 
+def model_version(symbol: str):
+    """ETag do modelo compacto no S3 (None se ainda não existe)."""
+    import boto3
+
+    bucket = os.getenv("MODELS_BUCKET", "fiap-fase3-finance-models")
+    key = f"daily/{symbol}_daily_logreg.npz"
+    resp = boto3.client("s3").list_objects_v2(Bucket=bucket, Prefix=key, MaxKeys=1)
+    return next((obj["ETag"] for obj in resp.get("Contents", []) if obj["Key"] == key), None)
+
+
+def _raw_storage():
+    from app.lake.storage import storage_from_uri
+
+    return storage_from_uri(f"s3://{os.getenv('S3_RAW_BUCKET', 'fiap-fase3-finance-raw')}")
+
+
+# Um poll de watermarks por processo, compartilhado por todos os clientes do /stream
+hub = StreamHub(
+    _raw_storage,
+    serialize_candles,
+    # Versão nova do modelo (ETag) invalida o cache do /tmp antes de recalcular
+    predict=lambda sym: compute_prediction(sym, refresh=True),
+    model_version=model_version,
+)
+
+
+@app.get("/stream")
+async def stream(request: Request, symbols: str, interval: str = "1h", predictions: bool = True):
+    """SSE com candles novos/atualizados e mudanças de previsão dos símbolos assinados."""
+    wanted = [s.strip() for s in symbols.split(",") if s.strip()]
+    if not wanted or any(s not in SYMBOLS for s in wanted):
+        raise HTTPException(status_code=400, detail="symbol not allowed")
+    if interval not in ("1d", "1h"):
+        raise HTTPException(status_code=400, detail="interval not supported")
+    # Atrás do API Gateway (Mangum) a resposta é bufferizada: streaming exige servidor
+    # de longa duração (uvicorn/container); o dashboard volta para o polling do /latest
+    if "aws.event" in request.scope:
+        raise HTTPException(status_code=501, detail="streaming not available on this deployment")
+    sub = hub.subscribe(wanted, interval, predictions)
+    return StreamingResponse(
+        hub.events(sub, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # Lambda handler para AWS Lambda
 try:
     from mangum import Mangum
@@ -26,3 +26,9 @@ class LatestResponse(BaseModel):
     symbol: str
     interval: str
     candles: List[Candle]
+    # Delta (?since= / ?cursor=): replaced=True quando candles[0] substitui a última
+    # barra que o cliente já tinha (ainda em formação); next_cursor vai na próxima chamada;
+    # has_more=True quando há mais de `limit` barras depois do cursor (buscar de novo já)
+    replaced: bool = False
+    next_cursor: Optional[str] = None
+    has_more: bool = False
@@ -0,0 +1,241 @@
+"""Hub de Server-Sent Events: candles novos/atualizados e mudanças de previsão.
+
+Um único laço de poll por processo atende todos os clientes: a cada
+STREAM_POLL_S segundos, para cada (símbolo, intervalo) com ao menos um
+assinante, o hub lê o watermark do símbolo (app/lake/watermarks.py, gravado
+pelos jobs de ingestão a cada escrita que muda o lake). Só quando a revisão
+avança ele lê as partições que a escrita tocou, compara com os candles que já
+conhece e publica apenas os novos ou alterados (a barra ainda em formação
+chega de novo, com `replaced`). Custo por ciclo: um GET pequeno por tópico,
+independente do número de clientes. O primeiro poll de um tópico parte das
+partições mais recentes do lake (não das que a última escrita tocou, que podem
+ser um reparo de histórico antigo), assim como um poll em que a revisão
+pulou mais de uma escrita; depois disso, barras anteriores à janela conhecida
+são ignoradas.
+
+Previsões: recalculadas quando a revisão do 1d ou a versão (ETag) do modelo
+do símbolo mudam; publicadas só se prob_up/sinal mudaram.
+
+Eventos (text/event-stream):
+    event: candles     data: {"symbol", "interval", "revision", "candles": [...], "replaced": [ts, ...]}
+    event: prediction  data: PredictResponse
+e comentários ": ping" a cada STREAM_HEARTBEAT_S para manter a conexão viva.
+Clientes lentos perdem os eventos mais antigos da própria fila (o cliente faz
+upsert por timestamp e pode se ressincronizar pelo /latest).
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from app.lake.schema import normalize_candles
+from app.lake.watermarks import read_watermark
+from app.lake.writer import latest_partitions, symbol_prefix
+from app.obs.log import get_logger
+
+log = get_logger(__name__)
+
+STREAM_POLL_S = float(os.getenv("STREAM_POLL_S", "5"))
+STREAM_HEARTBEAT_S = float(os.getenv("STREAM_HEARTBEAT_S", "15"))
+# Candles por tópico mantidos em memória para detectar alterações
+STREAM_WINDOW = int(os.getenv("STREAM_WINDOW", "500"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+# Barras por partição (um pregão no 1h, um mês no 1d): quantas partições cobrem a janela
+BARS_PER_PARTITION = {"1h": 7, "1d": 21}
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class Subscription:
+    def __init__(self, symbols: List[str], interval: str, predictions: bool, maxsize: int = STREAM_QUEUE_SIZE):
+        self.symbols = symbols
+        self.interval = interval
+        self.predictions = predictions
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, event: str, data: dict):
+        # Cliente lento: descarta o evento mais antigo em vez de bloquear o hub
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait((event, data))
+
+
+class Topic:
+    """Estado de um (símbolo, intervalo): revisão consumida e últimos candles enviados."""
+
+    def __init__(self):
+        self.revision: Optional[int] = None
+        self.candles: Dict[str, dict] = {}
+
+
+class StreamHub:
+    def __init__(
+        self,
+        storage_factory: Callable,
+        serialize: Callable,
+        predict: Optional[Callable] = None,
+        model_version: Optional[Callable] = None,
+        poll_s: float = STREAM_POLL_S,
+        window: int = STREAM_WINDOW,
+    ):
+        self._storage_factory = storage_factory
+        self._storage = None
+        self.serialize = serialize  # DataFrame -> List[Candle] (mesmo payload do /latest)
+        self.predict = predict  # símbolo -> PredictResponse
+        self.model_version = model_version  # símbolo -> ETag do modelo (ou None)
+        self.poll_s = poll_s
+        self.window = window
+        self.subscribers: Set[Subscription] = set()
+        self.topics: Dict[Tuple[str, str], Topic] = {}
+        self.predictions: Dict[str, dict] = {}
+        self.polls = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def storage(self):
+        # Criado no primeiro poll: importar o app não cria cliente S3
+        if self._storage is None:
+            self._storage = self._storage_factory()
+        return self._storage
+
+    def subscribe(self, symbols: List[str], interval: str, predictions: bool = True) -> Subscription:
+        sub = Subscription(symbols, interval, predictions)
+        self.subscribers.add(sub)
+        # Novo assinante recebe o que o hub já conhece, sem esperar o próximo ciclo
+        for sym in symbols:
+            topic = self.topics.get((sym, interval))
+            if topic and topic.candles:
+                candles = list(topic.candles.values())
+                sub.put("candles", {"symbol": sym, "interval": interval, "revision": topic.revision,
+                                    "candles": candles, "replaced": []})
+            if predictions and sym in self.predictions:
+                sub.put("prediction", self.predictions[sym]["value"])
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        log.info("stream subscribed", symbols=symbols, interval=interval, subscribers=len(self.subscribers))
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self.subscribers.discard(sub)
+        log.info("stream unsubscribed", symbols=sub.symbols, dropped=sub.dropped, subscribers=len(self.subscribers))
+
+    async def _run(self):
+        # Sem assinantes o laço termina; o estado dos tópicos fica para a próxima assinatura
+        while self.subscribers:
+            start = time.monotonic()
+            try:
+                await self.poll_once()
+            except Exception as e:
+                log.warning("stream poll failed", error=str(e))
+            await asyncio.sleep(max(0.0, self.poll_s - (time.monotonic() - start)))
+
+    async def poll_once(self):
+        """Um ciclo: um poll por tópico/símbolo assinado, não por cliente."""
+        topics = sorted({(s, sub.interval) for sub in self.subscribers for s in sub.symbols})
+        symbols = sorted({s for sub in self.subscribers if sub.predictions for s in sub.symbols})
+        # boto3 é bloqueante: cada poll roda numa thread, fora do event loop
+        updates = await asyncio.gather(*(asyncio.to_thread(self._poll_topic, s, iv) for s, iv in topics))
+        for (sym, interval), payload in zip(topics, updates):
+            if payload:
+                self._publish("candles", payload, lambda sub: sub.interval == interval and sym in sub.symbols)
+        if self.predict is not None and symbols:
+            preds = await asyncio.gather(*(asyncio.to_thread(self._poll_prediction, s) for s in symbols))
+            for sym, payload in zip(symbols, preds):
+                if payload:
+                    self._publish("prediction", payload, lambda sub: sub.predictions and sym in sub.symbols)
+        self.polls += 1
+
+    def _publish(self, event: str, data: dict, match: Callable):
+        for sub in list(self.subscribers):
+            if match(sub):
+                sub.put(event, data)
+
+    def _poll_topic(self, symbol: str, interval: str) -> Optional[dict]:
+        topic = self.topics.setdefault((symbol, interval), Topic())
+        watermark = read_watermark(self.storage, interval, symbol)
+        if not watermark or watermark.get("revision") == topic.revision:
+            return None
+
+        revision = watermark.get("revision")
+        if topic.revision is None or revision != topic.revision + 1:
+            # Primeiro poll, ou mais de uma escrita desde o último (ingestão + repair_gaps,
+            # shards): o watermark só lista as partições da última, então relê a janela
+            keys = self.storage.list_keys(symbol_prefix(interval, symbol) + "/")
+            keys = latest_partitions(keys, -(-self.window // BARS_PER_PARTITION.get(interval, 1)) + 1)
+        else:
+            # Exatamente uma escrita: só as partições que ela mudou (um dia no 1h, um mês no 1d)
+            keys = watermark.get("partitions", [])
+        frames = []
+        for key in keys:
+            try:
+                frames.append(self.storage.read_table(key).to_pandas())
+            except Exception as e:
+                log.warning("stream could not read partition", key=key, error=str(e))
+        topic.revision = watermark.get("revision")
+        if not frames:
+            return None
+        df = normalize_candles(pd.concat(frames, ignore_index=True), symbol, interval).sort_values("timestamp")
+
+        known = dict(topic.candles)
+        if known:
+            # Regravação de histórico (repair_gaps, merge) fora da janela não é atualização ao vivo
+            df = df[df["timestamp"] >= pd.Timestamp(min(known))]
+        changed, replaced = [], []
+        for candle in self.serialize(df):
+            c = candle.model_dump()
+            previous = known.get(c["timestamp"])
+            if previous == c:
+                continue
+            if previous is not None:
+                replaced.append(c["timestamp"])
+            known[c["timestamp"]] = c
+            changed.append(c)
+        # Troca atômica: subscribe() pode ler o dicionário a partir do event loop
+        topic.candles = dict(sorted(known.items())[-self.window:])
+        if not changed:
+            return None
+        log.debug("stream candles changed", symbol=symbol, interval=interval,
+                  revision=topic.revision, candles=len(changed), replaced=len(replaced))
+        return {"symbol": symbol, "interval": interval, "revision": topic.revision,
+                "candles": changed, "replaced": replaced}
+
+    def _poll_prediction(self, symbol: str) -> Optional[dict]:
+        watermark = read_watermark(self.storage, "1d", symbol) or {}
+        version = (watermark.get("revision"), self.model_version(symbol) if self.model_version else None)
+        cached = self.predictions.get(symbol)
+        if cached and cached["version"] == version:
+            return None
+        try:
+            value = self.predict(symbol).model_dump()
+        except Exception as e:
+            log.warning("stream prediction failed", symbol=symbol, error=str(e))
+            return None
+        self.predictions[symbol] = {"version": version, "value": value}
+        if cached and (cached["value"]["signal"], round(cached["value"]["prob_up"], 4)) == (
+            value["signal"], round(value["prob_up"], 4)
+        ):
+            return None
+        return value
+
+    async def events(self, sub: Subscription, request=None):
+        """Gerador do corpo text/event-stream de uma assinatura."""
+        try:
+            yield f"retry: {int(self.poll_s * 1000)}\n\n"
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(sub.queue.get(), timeout=STREAM_HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    if request is not None and await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield sse(event, data)
+        finally:
+            self.unsubscribe(sub)
@@ -0,0 +1,180 @@
+"""Fan-out de jobs por shards de símbolos.
+
+Em modo coordenador o dispatcher divide a lista de símbolos em N shards e
+executa cada um como uma sub-invocação paralela do mesmo handler. O tempo
+total passa a ser o do shard mais lento, não a soma de todos os símbolos.
+
+Invokers:
+- LambdaInvoker: invoca a própria função Lambda (RequestResponse) em threads
+- LocalProcessInvoker: pool de processos locais, para dev e testes
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List
+
+from app.obs.log import correlation_id, get_logger
+
+log = get_logger(__name__)
+
+# Jobs cujo trabalho é independente por símbolo e podem ser divididos em shards
+SHARDABLE_JOBS = {"ingest_1d", "ingest_1h", "repair_gaps"}
+
+
+def split_shards(symbols: List[str], shards: int) -> List[List[str]]:
+    """Divide em até `shards` grupos contíguos de tamanho balanceado (sem shards vazios)."""
+    shards = max(1, min(shards, len(symbols)))
+    size, extra = divmod(len(symbols), shards)
+    out, start = [], 0
+    for i in range(shards):
+        end = start + size + (1 if i < extra else 0)
+        out.append(symbols[start:end])
+        start = end
+    return out
+
+
+class LocalContext:
+    """Contexto mínimo compatível com o LambdaContext usado pelos handlers."""
+
+    memory_limit_in_mb = 0
+
+    def __init__(self, timeout_s: int = 600):
+        self._deadline = time.time() + timeout_s
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int(max(0.0, self._deadline - time.time()) * 1000)
+
+
+class Invoker:
+    def invoke_all(self, events: List[dict]) -> List[dict]:
+        raise NotImplementedError
+
+
+def shard_error(e: BaseException) -> dict:
+    """Resposta de um shard que falhou sem responder (timeout, throttle, worker morto)."""
+    return {"statusCode": 500, "body": {"error": f"{type(e).__name__}: {e}"}}
+
+
+def _run_local(event: dict) -> dict:
+    from app.lambda_job_handler import handler
+
+    try:
+        return handler(event, LocalContext())
+    except Exception as e:
+        return shard_error(e)
+
+
+def _collect(futures) -> List[dict]:
+    # Um shard com erro vira resposta 500 só dele: os demais resultados não se perdem
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            log.error("shard failed", error=str(e))
+            results.append(shard_error(e))
+    return results
+
+
+class LocalProcessInvoker(Invoker):
+    def __init__(self, max_workers: int = 0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def invoke_all(self, events: List[dict]) -> List[dict]:
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(events))) as pool:
+            return _collect([pool.submit(_run_local, event) for event in events])
+
+
+class LambdaInvoker(Invoker):
+    def __init__(self, function_name: str, client=None):
+        import boto3
+        from botocore.config import Config
+
+        self.function_name = function_name
+        # Sem retries automáticos (evita rodar um shard duas vezes) e timeout
+        # de leitura maior que o timeout da própria função
+        self.client = client or boto3.client(
+            "lambda", config=Config(read_timeout=900, retries={"max_attempts": 0})
+        )
+
+    def _invoke(self, event: dict) -> dict:
+        try:
+            resp = self.client.invoke(
+                FunctionName=self.function_name,
+                InvocationType="RequestResponse",
+                Payload=json.dumps(event).encode(),
+            )
+            payload = json.loads(resp["Payload"].read() or b"{}")
+        except Exception as e:
+            # Timeout de leitura, throttle (TooManyRequests), payload inválido
+            log.error("shard invoke failed", symbols=event.get("symbols"), error=str(e))
+            return shard_error(e)
+        if resp.get("FunctionError"):
+            return {"statusCode": 500, "body": {"error": payload.get("errorMessage", "shard failed")}}
+        return payload
+
+    def invoke_all(self, events: List[dict]) -> List[dict]:
+        with ThreadPoolExecutor(max_workers=len(events)) as pool:
+            return _collect([pool.submit(self._invoke, event) for event in events])
+
+
+def default_invoker() -> Invoker:
+    """Lambda quando rodando na AWS (ou JOB_FANOUT_INVOKER=lambda), senão processos locais."""
+    function_name = os.getenv("AWS_LAMBDA_FUNCTION_NAME", "")
+    kind = os.getenv("JOB_FANOUT_INVOKER", "lambda" if function_name else "local")
+    if kind == "lambda":
+        return LambdaInvoker(function_name)
+    return LocalProcessInvoker()
+
+
+def aggregate(job_name: str, shard_symbols: List[List[str]], results: List[dict], elapsed: float) -> dict:
+    """Combina as respostas dos shards em um único relatório."""
+    totals, failed, metrics = {}, [], {}
+    for i, res in enumerate(results):
+        body = res.get("body", {}) if isinstance(res, dict) else {}
+        if not isinstance(res, dict) or res.get("statusCode") != 200:
+            failed.append({"shard": i, "symbols": shard_symbols[i], "error": body.get("error", str(body))})
+        for key, value in body.items():
+            if key != "execution_time" and isinstance(value, (int, float)) and not isinstance(value, bool):
+                totals[key] = totals.get(key, 0) + value
+        # Totais das métricas por estágio (app/obs/metrics.py) somados entre shards
+        for key, value in body.get("metrics", {}).get("totals", {}).items():
+            metrics[key] = round(metrics.get(key, 0) + value, 2)
+
+    return {
+        "statusCode": 500 if failed else 200,
+        "body": {
+            "message": f"{job_name} fan-out completed with {len(failed)} failed shard(s)",
+            "shards": len(results),
+            "symbols": [s for shard in shard_symbols for s in shard],
+            "failed_shards": failed,
+            **totals,
+            "execution_time": elapsed,
+            "metrics": {"totals": metrics},
+            "shard_results": [
+                {"shard": i, "symbols": shard_symbols[i], "statusCode": r.get("statusCode"), "body": r.get("body")}
+                for i, r in enumerate(results)
+            ],
+        },
+    }
+
+
+def run_sharded(event: dict, invoker: Invoker = None) -> dict:
+    """Modo coordenador: divide SYMBOLS em `event['shards']` e agrega os resultados."""
+    start_time = time.time()
+    job_name = event["JOB_NAME"]
+    symbols = event.get("symbols", os.getenv("SYMBOLS", "AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA"))
+    symbols = [s.strip() for s in symbols.split(",") if s.strip()]
+    shard_symbols = split_shards(symbols, int(event["shards"]))
+
+    # Cada sub-evento carrega "shard", o que o faz rodar em modo worker (sem recursão),
+    # e o correlation id do coordenador, para os logs dos shards serem agrupáveis
+    cid = correlation_id()
+    events = [
+        {**event, "symbols": ",".join(group), "shard": i, "shards": len(shard_symbols), "correlation_id": cid}
+        for i, group in enumerate(shard_symbols)
+    ]
+    log.info("fan-out started", job_name=job_name, symbols=len(symbols), shards=len(events))
+    results = (invoker or default_invoker()).invoke_all(events)
+    return aggregate(job_name, shard_symbols, results, time.time() - start_time)
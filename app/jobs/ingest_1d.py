@@ -1,136 +1,52 @@
 import argparse
 import os
-import pathlib
 import pandas as pd
-import yfinance as yf
-import pyarrow as pa
-import pyarrow.parquet as pq
-import boto3
 from dotenv import load_dotenv
+from app.lake.storage import storage_from_uri
+from app.lake.writer import write_parquet_partitioned
+from app.market.providers import download_with_retries, provider_from_uri, set_provider
+from app.obs.log import get_logger
+from app.obs.metrics import count, for_symbol, job_metrics, stage
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-
-def write_parquet_partitioned(
-    df: pd.DataFrame, base_path: pathlib.Path, interval: str, symbol: str
-):
-    df = df.copy()
-    
-    # Achatar colunas MultiIndex se necessário - manter apenas o primeiro nível
-    if isinstance(df.columns, pd.MultiIndex):
-        # Para yfinance, queremos manter os nomes padrão (Open, High, Low, Close, Volume)
-        new_columns = []
-        for col in df.columns:
-            if col[0] in ['Open', 'High', 'Low', 'Close', 'Volume']:
-                new_columns.append(col[0].lower())
-            else:
-                new_columns.append(col[0] if col[0] else col[1])
-        df.columns = new_columns
-    
-    # Garantir que timestamp é datetime
-    timestamp_col = 'timestamp' if 'timestamp' in df.columns else [col for col in df.columns if 'timestamp' in col.lower()][0]
-    if not pd.api.types.is_datetime64_any_dtype(df[timestamp_col]):
-        df[timestamp_col] = pd.to_datetime(df[timestamp_col], utc=True)
-    
-    # Renomear para padrão se necessário
-    if timestamp_col != 'timestamp':
-        df = df.rename(columns={timestamp_col: 'timestamp'})
-    
-    # Renomear Date para timestamp se necessário
-    if 'Date' in df.columns:
-        df = df.rename(columns={'Date': 'timestamp'})
-    
-    df["year"] = df["timestamp"].dt.year
-    df["month"] = df["timestamp"].dt.month
-    
-    # Converter para int para evitar problemas com PyArrow
-    df["year"] = df["year"].astype(int)
-    df["month"] = df["month"].astype(int)
-    
-    table = pa.Table.from_pandas(df)
-    out = base_path / f"interval={interval}" / f"symbol={symbol}"
-    out.mkdir(parents=True, exist_ok=True)
-    
-    # Particionar apenas por ano/mês para reduzir número de arquivos
-    pq.write_to_dataset(
-        table,
-        root_path=str(out),
-        partition_cols=["year", "month"],  # Removido "day" para menos arquivos
-        use_dictionary=True,
-    )
-    return out
-
-
-def merge_incremental_data(new_df: pd.DataFrame, base_path: pathlib.Path, symbol: str):
-    """Merge novos dados com dados existentes, removendo duplicatas"""
-    if new_df.empty:
-        return new_df
-    
-    # Tentar ler dados existentes
-    existing_path = base_path / f"symbol={symbol}" / "interval=1d"
-    
-    if existing_path.exists():
-        try:
-            # Ler dados existentes dos últimos 30 dias para merge
-            import glob
-            parquet_files = glob.glob(str(existing_path / "**" / "*.parquet"), recursive=True)
-            
-            if parquet_files:
-                # Ler apenas arquivos recentes para performance
-                recent_files = sorted(parquet_files)[-10:]  # últimos 10 arquivos
-                existing_dfs = []
-                
-                for file in recent_files:
-                    try:
-                        df_existing = pd.read_parquet(file)
-                        existing_dfs.append(df_existing)
-                    except Exception as e:
-                        print(f"⚠️ Warning reading {file}: {e}")
-                        continue
-                
-                if existing_dfs:
-                    existing_df = pd.concat(existing_dfs, ignore_index=True)
-                    
-                    # Combine novos e existentes, removendo duplicatas
-                    combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-                    combined_df = combined_df.drop_duplicates(subset=['timestamp', 'symbol'], keep='last')
-                    combined_df = combined_df.sort_values('timestamp')
-                    
-                    print(f"🔄 Merged {len(new_df)} new rows with {len(existing_df)} existing rows for {symbol}")
-                    return combined_df
-        except Exception as e:
-            print(f"⚠️ Warning merging data for {symbol}: {e}, using new data only")
-    
-    print(f"📊 No existing data found for {symbol}, using new data only")
-    return new_df
+log = get_logger(__name__)
 
 
 def fetch_daily_incremental(symbol: str, days: str = "2d"):
     """Download apenas últimos dias - usado para atualizações incrementais diárias"""
-    print(f"📊 Downloading {days} incremental data for {symbol}...")
-    df = yf.download(
-        tickers=symbol, period=days, interval="1d", progress=False, threads=False, auto_adjust=False
-    )
+    log.debug("downloading incremental daily bars", symbol=symbol, period=days)
+    df = download_with_retries(symbol, "1d", period=days)
     if df.empty:
         return pd.DataFrame()
-    df = df.reset_index().rename(
-        columns={
-            "Date": "timestamp",
-            "Open": "open",
-            "High": "high",
-            "Low": "low",
-            "Close": "close",
-            "Volume": "volume",
-        }
-    )
-    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    df["symbol"] = symbol
-    df["interval"] = "1d"
-    print(f"✅ Downloaded {len(df)} rows for {symbol} (incremental)")
-    return df[
-        ["timestamp", "open", "high", "low", "close", "volume", "symbol", "interval"]
-    ]
+    log.debug("downloaded", symbol=symbol, rows=len(df))
+    return df
+
+
+def ingest_symbols(symbols, storage, dry_run: bool = False):
+    """Baixa os últimos 2 dias de cada símbolo e faz merge nas partições do lake"""
+    written = []
+    for i, sym in enumerate(symbols, 1):
+        # Tempos por estágio (fetch/read/merge/encode/upload) e contadores do símbolo
+        with for_symbol(sym):
+            log.debug("processing symbol", symbol=sym, index=i, total=len(symbols))
+            with stage("fetch"):
+                df_new = fetch_daily_incremental(sym, "2d")
+            count(rows_fetched=len(df_new))
+            if df_new.empty:
+                log.info("no new data", symbol=sym)
+                continue
+
+            if dry_run:
+                log.info("dry run: would write", symbol=sym, rows=len(df_new))
+                continue
+
+            # Merge com dados existentes acontece partição a partição, direto no destino
+            keys = write_parquet_partitioned(df_new, storage, "1d", sym)
+            written.extend(keys)
+            log.info("symbol ingested", symbol=sym, rows=len(df_new), partitions=len(keys))
+    return written
 
 
 def main():
@@ -145,129 +61,65 @@ def main():
     )
     ap.add_argument("--out", default=default_data_dir, help="local output base path")
     ap.add_argument(
-        "--to", default="", help="optional s3://bucket/prefix to copy after write"
+        "--to", default="", help="optional s3://bucket/prefix to write to directly (skips local files)"
     )
     ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument(
+        "--provider", default=os.getenv("MARKET_DATA_PROVIDER", "yfinance"),
+        help='market data source: "yfinance" or "replay://<dir>" (recorded/synthetic bars)',
+    )
     args = ap.parse_args()
-
-    base_path = pathlib.Path(args.out) / "prices_1d"
-    base_path.mkdir(parents=True, exist_ok=True)
+    set_provider(provider_from_uri(args.provider))
 
     symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
-    written_paths = []
+    # Com --to s3://... os parquets vão direto para o bucket, sem cópia local
+    storage = storage_from_uri(args.to if args.to.startswith("s3://") else args.out)
     
-    print(f"🔄 INCREMENTAL DAILY UPDATE - Processing {len(symbols)} symbols")
-    
-    # Download incremental para cada símbolo (apenas últimos 2 dias)
-    for i, sym in enumerate(symbols, 1):
-        print(f"\n[{i}/{len(symbols)}] Processing {sym}...")
-        df_new = fetch_daily_incremental(sym, "2d")
-        if df_new.empty:
-            print(f"⚠️ No new data found for {sym}")
-            continue
-        
-        # Merge com dados existentes
-        df_merged = merge_incremental_data(df_new, base_path, sym)
-        
-        if not args.dry_run:
-            out = write_parquet_partitioned(df_merged, base_path, "1d", sym)
-            written_paths.append(out)
-        else:
-            print(f"📊 Would write {len(df_merged)} rows for {sym} (incremental)")
-
-    if args.to.startswith("s3://") and not args.dry_run:
-        print(f"📤 Uploading files to S3: {args.to}")
-        s3 = boto3.client("s3")
-        bucket = args.to.replace("s3://", "").split("/")[0]
-        prefix = "/".join(args.to.replace("s3://", "").split("/")[1:])
-        
-        # Coletar todos os arquivos primeiro
-        all_files = []
-        for p in written_paths:
-            for file in p.rglob("*.parquet"):
-                key = "/".join([prefix, "prices_1d", str(file.relative_to((base_path)))])
-                all_files.append((str(file), key))
-        
-        print(f"📊 Found {len(all_files)} files to upload")
-        
-        # Upload com progresso
-        for i, (local_file, s3_key) in enumerate(all_files, 1):
-            try:
-                s3.upload_file(local_file, bucket, s3_key)
-                if i % 10 == 0 or i == len(all_files):  # Progresso a cada 10 arquivos
-                    print(f"📤 Uploaded {i}/{len(all_files)} files ({i/len(all_files)*100:.1f}%)")
-            except Exception as e:
-                print(f"❌ Error uploading {s3_key}: {e}")
-        
-        print(f"✅ Upload completed: {len(all_files)} files sent to s3://{bucket}/{prefix}")
+    log.info("incremental daily update started", symbols=len(symbols), target=storage.uri())
+    with job_metrics("ingest_1d"):
+        written = ingest_symbols(symbols, storage, dry_run=args.dry_run)
+    log.info("incremental daily update completed", files_written=len(written))
 
 
 def lambda_handler(event, context):
     """Handler para AWS Lambda"""
     import time
-    from datetime import datetime
     
     start_time = time.time()
     
-    print(f"🚀 Starting daily ingest job at {datetime.now()}")
-    print(f"Event: {event}")
-    print(f"Available memory: {context.memory_limit_in_mb} MB")
-    print(f"Time remaining: {context.get_remaining_time_in_millis()} ms")
+    log.debug("event received", event=event)
     
     # Verificar se é o job correto
     job_name = event.get("JOB_NAME", "ingest_1d")
     if job_name != "ingest_1d":
-        print(f"⚠️ Skipping: This is for {job_name}, not ingest_1d")
+        log.warning("skipping event for another job", job_name=job_name)
         return {"statusCode": 200, "body": {"message": f"Skipped: {job_name}"}}
     
     # Configurar argumentos para o Lambda
     class Args:
-        symbols = os.getenv("SYMBOLS", "AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA")
-        out = "/tmp/data"  # Diretório temporário no Lambda
+        # "symbols" no evento restringe o job a um shard (ver app/jobs/fanout.py)
+        symbols = event.get("symbols", os.getenv("SYMBOLS", "AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA"))
         to = f"s3://{os.getenv('S3_RAW_BUCKET', 'fiap-fase3-finance-raw')}"
-        dry_run = False
     
-    print(f"📦 S3 Bucket: {Args.to}")
-    print(f"🎯 Symbols: {Args.symbols}")
+    log.info(
+        "daily ingest started", target=Args.to, symbols=Args.symbols,
+        memory_mb=context.memory_limit_in_mb, remaining_ms=context.get_remaining_time_in_millis(),
+    )
     
     try:
-        # Executar lógica principal
-        base_path = pathlib.Path(Args.out) / "prices_1d"
-        base_path.mkdir(parents=True, exist_ok=True)
-
+        # Escrita direta no S3 (sem staging em /tmp)
+        storage = storage_from_uri(Args.to)
         symbols = [s.strip() for s in Args.symbols.split(",") if s.strip()]
-        written_paths = []
-        
-        # Download incremental para cada símbolo (apenas últimos 2 dias)
-        for i, sym in enumerate(symbols, 1):
-            print(f"\n[{i}/{len(symbols)}] Processing {sym}...")
-            df_new = fetch_daily_incremental(sym, "2d")
-            if df_new.empty:
-                print(f"⚠️ No new data found for {sym}")
-                continue
-            
-            # Merge com dados existentes
-            df_merged = merge_incremental_data(df_new, base_path, sym)
-            
-            out = write_parquet_partitioned(df_merged, base_path, "1d", sym)
-            written_paths.append(out)
-            print(f"✅ Processed {sym}: {len(df_merged)} rows (incremental)")
-
-        # Upload para S3
-        if Args.to.startswith("s3://"):
-            s3 = boto3.client("s3")
-            bucket = Args.to.replace("s3://", "").split("/")[0]
-            prefix = "/".join(Args.to.replace("s3://", "").split("/")[1:])
-            for p in written_paths:
-                for file in p.rglob("*.parquet"):
-                    key = "/".join([prefix, "prices_1d", str(file.relative_to(base_path))])
-                    s3.upload_file(str(file), bucket, key)
+        with job_metrics("ingest_1d") as metrics:
+            written = ingest_symbols(symbols, storage)
         
         execution_time = time.time() - start_time
-        files_count = len([f for p in written_paths for f in p.rglob("*.parquet")])
+        files_count = len(written)
         
-        print(f"✅ Job completed in {execution_time:.2f}s")
-        print(f"📊 Processed {len(symbols)} symbols, uploaded {files_count} files")
+        log.info(
+            "daily ingest completed", execution_time=round(execution_time, 3),
+            symbols=len(symbols), files_uploaded=files_count,
+        )
         
         return {
             "statusCode": 200,
@@ -275,14 +127,14 @@ def lambda_handler(event, context):
                 "message": "Daily data ingestion completed successfully",
                 "symbols": symbols,
                 "files_uploaded": files_count,
-                "execution_time": execution_time
+                "execution_time": execution_time,
+                "metrics": metrics.summary()
             }
         }
     
     except Exception as e:
         execution_time = time.time() - start_time
-        error_msg = f"❌ Job failed after {execution_time:.2f}s: {str(e)}"
-        print(error_msg)
+        log.exception("daily ingest failed", execution_time=round(execution_time, 3), error=str(e))
         return {
             "statusCode": 500,
             "body": {
@@ -1,105 +1,27 @@
 import argparse
 import os
-import pathlib
 import pandas as pd
-import yfinance as yf
-import pyarrow as pa
-import pyarrow.parquet as pq
-import boto3
 from dotenv import load_dotenv
+from app.lake.storage import storage_from_uri
+from app.lake.writer import write_parquet_partitioned
+from app.market.providers import download_with_retries, provider_from_uri, set_provider
+from app.obs.log import get_logger
+from app.obs.metrics import count, for_symbol, job_metrics, stage
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-
-def write_parquet_partitioned(
-    df: pd.DataFrame, base_path: pathlib.Path, interval: str, symbol: str
-):
-    df = df.copy()
-    
-    # Garantir timestamp
-    if "Datetime" in df.columns:
-        df = df.rename(columns={"Datetime": "timestamp"})
-    
-    if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
-        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    
-    df["year"] = df["timestamp"].dt.year
-    df["month"] = df["timestamp"].dt.month
-    df["day"] = df["timestamp"].dt.day
-    
-    # Converter para int para evitar problemas com PyArrow
-    df["year"] = df["year"].astype(int)
-    df["month"] = df["month"].astype(int)
-    df["day"] = df["day"].astype(int)
-    
-    out = base_path / f"symbol={symbol}" / f"interval={interval}"
-    pq.write_to_dataset(
-        pa.Table.from_pandas(df),
-        root_path=str(out),
-        partition_cols=["year", "month", "day"],
-        compression="snappy",
-        use_dictionary=True,
-    )
-    
-    print(f"✅ Written {len(df)} hourly rows for {symbol} to {base_path}")
-    return out
-
-
-def copy_to_s3(local_path, s3_uri, progress_callback=None):
-    """Copia dados locais para S3 com progresso"""
-    if not s3_uri:
-        return
-    
-    import subprocess
-    import sys
-    
-    s3_bucket = s3_uri.replace("s3://", "").split("/")[0]
-    s3_prefix = "/".join(s3_uri.replace("s3://", "").split("/")[1:])
-    
-    print(f"📤 Uploading hourly data to S3: {s3_uri}")
-    
-    # Usar AWS CLI com progresso
-    cmd = [
-        "aws", "s3", "sync", 
-        str(local_path), 
-        f"s3://{s3_bucket}/{s3_prefix}",
-        "--only-show-errors"
-    ]
-    
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode == 0:
-        print(f"✅ Successfully uploaded hourly data to {s3_uri}")
-    else:
-        print(f"❌ Hourly upload failed: {result.stderr}")
-        sys.exit(1)
+log = get_logger(__name__)
 
 
 def fetch_hourly_historical(symbol: str, period: str = "30d"):
     """Download dados horários históricos - usado apenas na inicialização"""
-    print(f"📊 Downloading {period} historical hourly data for {symbol}...")
-    df = yf.download(
-        tickers=symbol, period=period, interval="1h", progress=False, threads=False, auto_adjust=False
-    )
+    log.debug("downloading hourly historical bars", symbol=symbol, period=period)
+    df = download_with_retries(symbol, "1h", period=period)
     if df.empty:
         return pd.DataFrame()
-    df = df.reset_index().rename(
-        columns={
-            "Datetime": "timestamp",
-            "Open": "open",
-            "High": "high",
-            "Low": "low",
-            "Close": "close",
-            "Volume": "volume",
-        }
-    )
-    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    df["symbol"] = symbol
-    df["interval"] = "1h"
-    print(f"✅ Downloaded {len(df)} hourly rows for {symbol}")
-    return df[
-        ["timestamp", "open", "high", "low", "close", "volume", "symbol", "interval"]
-    ]
+    log.debug("downloaded", symbol=symbol, rows=len(df))
+    return df
 
 
 def main():
@@ -114,45 +36,50 @@ def main():
     )
     ap.add_argument("--out", default=default_data_dir, help="local output base path")
     ap.add_argument(
-        "--to", default="", help="optional s3://bucket/prefix to copy after write"
+        "--to", default="", help="optional s3://bucket/prefix to write to directly (skips local files)"
     )
     ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument(
+        "--provider", default=os.getenv("MARKET_DATA_PROVIDER", "yfinance"),
+        help='market data source: "yfinance" or "replay://<dir>" (recorded/synthetic bars)',
+    )
     ap.add_argument("--period", default="30d", help="historical period for hourly data (7d, 30d, 60d)")
     args = ap.parse_args()
+    set_provider(provider_from_uri(args.provider))
 
     if args.dry_run:
-        print("🚨 DRY RUN MODE - no files will be written")
-
-    base_path = pathlib.Path(args.out) / "prices_1h"
-    base_path.mkdir(parents=True, exist_ok=True)
+        log.info("dry run: no files will be written")
 
     symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
-    written_paths = []
+    # Com --to s3://... os parquets vão direto para o bucket, sem cópia local
+    storage = storage_from_uri(args.to if args.to.startswith("s3://") else args.out)
+    written_symbols = []
+    written_files = []
     
-    print(f"🏗️ HOURLY HISTORICAL INITIALIZATION - Downloading {args.period} data for {len(symbols)} symbols")
+    log.info("hourly historical initialization started", period=args.period, symbols=len(symbols), target=storage.uri())
     
     # Download individual para cada símbolo (mais confiável)
-    for i, sym in enumerate(symbols, 1):
-        print(f"\n[{i}/{len(symbols)}] Processing {sym}...")
-        df = fetch_hourly_historical(sym, args.period)
-        if df.empty:
-            print(f"⚠️ No hourly data found for {sym}")
-            continue
-        
-        if not args.dry_run:
-            out = write_parquet_partitioned(df, base_path, "1h", sym)
-            written_paths.append(out)
-        else:
-            print(f"📊 Would write {len(df)} hourly rows for {sym}")
-
-    total_files = sum(len(list(p.rglob("*.parquet"))) for p in written_paths if p.exists())
-    print("\n✅ Hourly historical initialization complete!")
-    print(f"📊 Total symbols processed: {len(written_paths)}")
-    print(f"📁 Total hourly parquet files: {total_files}")
-
-    # Upload para S3 se especificado
-    if args.to and not args.dry_run:
-        copy_to_s3(base_path, args.to)
+    with job_metrics("ingest_hourly_historical") as metrics:
+        for i, sym in enumerate(symbols, 1):
+            with for_symbol(sym):
+                log.debug("processing symbol", symbol=sym, index=i, total=len(symbols))
+                with stage("fetch"):
+                    df = fetch_hourly_historical(sym, args.period)
+                count(rows_fetched=len(df))
+                if df.empty:
+                    log.info("no data", symbol=sym)
+                    continue
+
+                if not args.dry_run:
+                    keys = write_parquet_partitioned(df, storage, "1h", sym)
+                    written_symbols.append(sym)
+                    written_files.extend(keys)
+                    log.info("symbol written", symbol=sym, rows=len(df), partitions=len(keys))
+                else:
+                    log.info("dry run: would write", symbol=sym, rows=len(df))
+
+    log.info("hourly historical initialization completed", symbols_written=len(written_symbols), files_written=len(written_files))
+    return metrics.summary()
 
 
 def lambda_handler(event, context):
@@ -162,31 +89,34 @@ def lambda_handler(event, context):
     # Configurar argumentos baseado no evento Lambda
     symbols = event.get("symbols", os.getenv("SYMBOLS", "AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA"))
     data_dir = "/tmp/data"  # Lambda temp directory
-    s3_bucket = os.getenv("S3_BUCKET")
-    s3_prefix = "data"
+    # Mesmo bucket/layout dos jobs incrementais, para que merge e API enxerguem o histórico
+    s3_bucket = os.getenv("S3_RAW_BUCKET") or os.getenv("S3_BUCKET")
     period = event.get("period", "30d")
     
     if not s3_bucket:
-        print("❌ S3_BUCKET environment variable not set")
-        return {"statusCode": 500, "body": "S3_BUCKET not configured"}
+        log.error("S3_RAW_BUCKET environment variable not set")
+        return {"statusCode": 500, "body": "S3_RAW_BUCKET not configured"}
     
     # Simular argumentos para main()
     sys.argv = [
         "ingest_hourly_historical.py",
         "--symbols", symbols,
         "--out", data_dir,
-        "--to", f"s3://{s3_bucket}/{s3_prefix}",
+        "--to", f"s3://{s3_bucket}",
         "--period", period
     ]
     
     try:
-        main()
+        metrics = main()
         return {
-            "statusCode": 200, 
-            "body": f"Hourly historical data initialization complete for period {period}"
+            "statusCode": 200,
+            "body": {
+                "message": f"Hourly historical data initialization complete for period {period}",
+                "metrics": metrics,
+            }
         }
     except Exception as e:
-        print(f"❌ Error in hourly historical initialization: {str(e)}")
+        log.exception("hourly historical initialization failed", error=str(e))
         return {"statusCode": 500, "body": f"Error: {str(e)}"}
 
 
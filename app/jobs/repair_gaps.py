@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import pandas as pd
+from dotenv import load_dotenv
+from app.lake.calendar import trading_sessions
+from app.lake.gaps import find_gaps, read_checked_sessions, record_checked_sessions
+from app.lake.storage import storage_from_uri
+from app.lake.writer import write_parquet_partitioned
+from app.market.providers import download_with_retries, provider_from_uri, set_provider
+from app.obs.log import get_logger
+from app.obs.metrics import count, for_symbol, job_metrics, stage
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+log = get_logger(__name__)
+
+# Janela de verificação padrão por intervalo (dias corridos)
+DEFAULT_LOOKBACK_DAYS = {"1d": 90, "1h": 30}
+# yfinance só fornece barras de 1h dos últimos 730 dias
+MAX_LOOKBACK_DAYS = {"1d": 3650, "1h": 729}
+
+
+def fetch_range(symbol: str, interval: str, start: pd.Timestamp, end: pd.Timestamp):
+    """Download apenas da janela de pregões [start, end] - usado para preencher lacunas"""
+    log.debug("downloading gap window", symbol=symbol, interval=interval, start=start.date(), end=end.date())
+    return download_with_retries(symbol, interval, start=start, end=end + pd.Timedelta(days=1))
+
+
+def repair_symbols(symbols, storage, interval: str, days: int, dry_run: bool = False):
+    """Detecta pregões faltantes por símbolo e busca/grava apenas essas janelas.
+
+    Os pregões de cada janela buscada com sucesso são registrados (app.lake.gaps):
+    o que o provedor não devolveu (vazio ou parcial) não é buscado de novo.
+    """
+    today = pd.Timestamp.now(tz="UTC").tz_localize(None).normalize()
+    # O pregão corrente é responsabilidade dos jobs incrementais
+    end = today - pd.Timedelta(days=1)
+    start = today - pd.Timedelta(days=min(days, MAX_LOOKBACK_DAYS[interval]))
+
+    report = {}
+    for sym in symbols:
+        with for_symbol(sym):
+            with stage("scan"):
+                checked = read_checked_sessions(storage, interval, sym)
+                windows = find_gaps(storage, interval, sym, start, end, skip=checked)
+            if not windows:
+                log.debug("no gaps", symbol=sym, interval=interval, since=start.date())
+                continue
+
+            log.info("gaps found", symbol=sym, interval=interval, windows=len(windows))
+            count(gap_windows=len(windows))
+            filled, fetched = [], []
+            for w_start, w_end in windows:
+                entry = {"start": str(w_start.date()), "end": str(w_end.date()), "rows": 0}
+                if not dry_run:
+                    with stage("fetch"):
+                        df = fetch_range(sym, interval, w_start, w_end)
+                    count(rows_fetched=len(df))
+                    if not df.empty:
+                        write_parquet_partitioned(df, storage, interval, sym)
+                    # Busca bem-sucedida: o que o provedor não devolveu (pregão encurtado,
+                    # buraco do provedor) não vai aparecer numa nova tentativa
+                    fetched.extend(trading_sessions(w_start, w_end))
+                    entry["rows"] = len(df)
+                filled.append(entry)
+            if fetched:
+                count(empty_windows=sum(1 for e in filled if e["rows"] == 0))
+                record_checked_sessions(
+                    storage, interval, sym, fetched,
+                    keep_from=today - pd.Timedelta(days=MAX_LOOKBACK_DAYS[interval]),
+                )
+            report[sym] = filled
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Detect and fill gaps in the lake (fetches only missing sessions)")
+
+    # Usar variáveis de ambiente como padrão
+    default_symbols = os.getenv("SYMBOLS", "AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA")
+    default_data_dir = os.getenv("DATA_DIR", "./data")
+
+    ap.add_argument(
+        "--symbols", default=default_symbols, help="comma separated list, e.g. AAPL,MSFT"
+    )
+    ap.add_argument("--out", default=default_data_dir, help="local lake base path")
+    ap.add_argument(
+        "--to", default="", help="optional s3://bucket/prefix lake to repair instead of --out"
+    )
+    ap.add_argument("--intervals", default="1d,1h", help="intervals to check (1d, 1h)")
+    ap.add_argument("--days", type=int, default=0, help="lookback in days (default: 90 for 1d, 30 for 1h)")
+    ap.add_argument("--dry-run", action="store_true", help="only report gaps, do not fetch")
+    ap.add_argument(
+        "--provider", default=os.getenv("MARKET_DATA_PROVIDER", "yfinance"),
+        help='market data source: "yfinance" or "replay://<dir>" (recorded/synthetic bars)',
+    )
+    args = ap.parse_args()
+    set_provider(provider_from_uri(args.provider))
+
+    symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
+    storage = storage_from_uri(args.to if args.to.startswith("s3://") else args.out)
+
+    log.info("gap repair started", symbols=len(symbols), target=storage.uri())
+    report = {}
+    with job_metrics("repair_gaps"):
+        for interval in [i.strip() for i in args.intervals.split(",") if i.strip()]:
+            days = args.days or DEFAULT_LOOKBACK_DAYS[interval]
+            report[interval] = repair_symbols(symbols, storage, interval, days, dry_run=args.dry_run)
+    print(json.dumps(report, indent=2))
+
+
+def lambda_handler(event, context):
+    """Handler para AWS Lambda"""
+    import time
+
+    start_time = time.time()
+    symbols = event.get("symbols", os.getenv("SYMBOLS", "AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA"))
+    intervals = event.get("intervals", "1d,1h")
+    to = f"s3://{os.getenv('S3_RAW_BUCKET', 'fiap-fase3-finance-raw')}"
+
+    log.info("gap repair started", intervals=intervals, target=to)
+
+    try:
+        storage = storage_from_uri(to)
+        symbols = [s.strip() for s in symbols.split(",") if s.strip()]
+        report = {}
+        with job_metrics("repair_gaps") as metrics:
+            for interval in [i.strip() for i in intervals.split(",") if i.strip()]:
+                days = int(event.get("days", DEFAULT_LOOKBACK_DAYS[interval]))
+                report[interval] = repair_symbols(symbols, storage, interval, days)
+
+        execution_time = time.time() - start_time
+        windows = sum(len(w) for r in report.values() for w in r.values())
+        log.info("gap repair completed", execution_time=round(execution_time, 3), windows_filled=windows)
+        return {
+            "statusCode": 200,
+            "body": {
+                "message": "Gap repair completed successfully",
+                "gaps": report,
+                "execution_time": execution_time,
+                "metrics": metrics.summary()
+            }
+        }
+    except Exception as e:
+        execution_time = time.time() - start_time
+        log.exception("gap repair failed", execution_time=round(execution_time, 3), error=str(e))
+        return {
+            "statusCode": 500,
+            "body": {
+                "message": "Gap repair failed",
+                "error": str(e),
+                "execution_time": execution_time
+            }
+        }
+
+
+if __name__ == "__main__":
+    main()
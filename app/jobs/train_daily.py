@@ -6,25 +6,123 @@ import pandas as pd
 from dateutil.relativedelta import relativedelta
 from datetime import datetime, timezone
 from dotenv import load_dotenv
-from app.ml.features import add_basic_features, make_label
-from app.ml.model import train_classifier, evaluate, save_model
+from app.lake.mirror import LakeMirror
+from app.lake.reader import scan_prices
+from app.lake.storage import LocalStorage, storage_from_uri
+from app.lake.watermarks import changed_since, read_watermarks
+from app.lake.writer import symbol_prefix
+from app.ml.model import DEFAULT_MODEL_CONFIG, TRAIN_MODE
+from app.ml.trainer import train_symbols
+from app.obs.log import get_logger
+from app.obs.metrics import count, for_symbol, job_metrics, record, stage
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
+log = get_logger(__name__)
 
-def load_local_prices_1d(data_dir: str, months: int = 12) -> pd.DataFrame:
-    base = pathlib.Path(data_dir) / "prices_1d"
-    if not base.exists():
-        return pd.DataFrame()
-    files = list(base.rglob("*.parquet"))
-    if not files:
-        return pd.DataFrame()
-    dfs = [pd.read_parquet(f) for f in files]
-    df = pd.concat(dfs, ignore_index=True)
+
+# Features e label usam apenas o fechamento; o resto do candle nem é decodificado
+TRAIN_COLUMNS = ["timestamp", "close", "symbol"]
+
+
+def load_local_prices_1d(data_dir: str, months: int = 12, symbols=None) -> pd.DataFrame:
     cutoff = datetime.now(timezone.utc) - relativedelta(months=months)
-    df = df[df["timestamp"] >= cutoff]
-    return df
+    return scan_prices(data_dir, "1d", symbols=symbols, start=cutoff, columns=TRAIN_COLUMNS)
+
+
+TRAINING_STATE_KEY = "_state/trained.json"
+# Persistente entre invocações de um mesmo container Lambda
+MIRROR_DIR = os.getenv("LAKE_MIRROR_DIR", "/tmp/lake-mirror")
+
+
+def load_training_state(models_storage) -> dict:
+    """Revisão do watermark de prices_1d consumida no último treino de cada símbolo"""
+    try:
+        return json.loads(models_storage.read_bytes(TRAINING_STATE_KEY))
+    except Exception:
+        return {}
+
+
+def save_training_state(models_storage, state: dict):
+    models_storage.write_bytes(TRAINING_STATE_KEY, json.dumps(state, indent=2).encode())
+
+
+TRAINING_REPORT_KEY = "training_report.json"
+
+
+def merge_training_report(models_storage, report: dict) -> dict:
+    """Relatório novo sobre o anterior: símbolos pulados mantêm as últimas métricas reais"""
+    try:
+        previous = json.loads(models_storage.read_bytes(TRAINING_REPORT_KEY))
+    except Exception:
+        previous = {}
+    merged = dict(previous)
+    for sym, entry in report.items():
+        if entry.get("status") != "skipped" or sym not in previous:
+            merged[sym] = entry
+    return merged
+
+
+MODEL_CONFIG_KEY = "_state/model_config.json"
+
+
+def load_model_config(models_storage) -> dict:
+    """Configuração do modelo escolhida pelo tune_daily (ou o default)"""
+    try:
+        saved = json.loads(models_storage.read_bytes(MODEL_CONFIG_KEY))
+    except Exception:
+        return dict(DEFAULT_MODEL_CONFIG)
+    return {k: saved.get(k, v) for k, v in DEFAULT_MODEL_CONFIG.items()}
+
+
+def save_model_config(models_storage, config: dict):
+    models_storage.write_bytes(MODEL_CONFIG_KEY, json.dumps(config, indent=2).encode())
+
+
+def select_symbols(raw_storage, models_storage, symbols, force: bool = False):
+    """Separa símbolos cujos dados avançaram desde o último treino dos que não mudaram"""
+    watermarks = read_watermarks(raw_storage, "1d", symbols)
+    state = load_training_state(models_storage)
+    pending = [s for s in symbols if force or changed_since(watermarks[s], state.get(s))]
+    skipped = {
+        s: {"status": "skipped", "reason": "no new data since last training", "revision": state[s]["revision"]}
+        for s in symbols
+        if s not in pending
+    }
+    return pending, skipped, watermarks, state
+
+
+def consumed_watermark(watermark, status: str) -> dict:
+    """Entrada do estado de treino: qual revisão do símbolo já foi processada"""
+    watermark = watermark or {}
+    return {
+        "revision": watermark.get("revision"),
+        "max_timestamp": watermark.get("max_timestamp"),
+        "status": status,
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def train_pending(df, pending, models_dir, dry_run, report, state, watermarks, mode=None, config=None):
+    """Treina os símbolos pendentes em paralelo e registra relatório/estado. Retorna os treinados"""
+    with stage("train"):
+        results = train_symbols(df, pending, models_dir, dry_run=dry_run, mode=mode, config=config)
+    trained = []
+    for sym, res in results.items():
+        if res["status"] == "error":
+            # Worker morreu: a revisão não é consumida e o símbolo volta no próximo treino
+            log.error("symbol training failed", symbol=sym, error=res["error"])
+            report[sym] = {k: v for k, v in res.items() if k != "symbol"}
+            continue
+        state[sym] = consumed_watermark(watermarks[sym], res["status"])
+        if res["status"] == "trained":
+            # Tempos medidos no worker (outro processo): entram nas métricas do símbolo
+            record(sym, rows=res["train_rows"] + res["test_rows"],
+                   **{k[:-2] + "_ms": v * 1000 for k, v in res["timings"].items()})
+            report[sym] = {k: v for k, v in res.items() if k not in ("symbol", "status")}
+            trained.append(sym)
+    return trained
 
 
 def main():
@@ -41,119 +139,144 @@ def main():
     ap.add_argument("--models", default=default_models_dir)
     ap.add_argument("--months", type=int, default=default_train_period)
     ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--force", action="store_true", help="retrain every symbol even without new data")
+    ap.add_argument(
+        "--mode", choices=["full", "incremental"], default=TRAIN_MODE,
+        help="incremental: warm-start yesterday's model with the new rows (full retrain every ML_FULL_RETRAIN_EVERY runs)",
+    )
     args = ap.parse_args()
 
     symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
-    df = load_local_prices_1d(args.data, months=args.months)
-    if df.empty:
-        print("No data found. Run ingest_1d first.")
+    models_storage = LocalStorage(args.models)
+    pending, report, watermarks, state = select_symbols(
+        LocalStorage(args.data), models_storage, symbols, force=args.force
+    )
+    os.makedirs(args.models, exist_ok=True)
+    rep_path = pathlib.Path(args.models) / TRAINING_REPORT_KEY
+    if not pending:
+        # O relatório existente continua valendo: nada foi treinado
+        log.info("no new data since last training, nothing to retrain (no-op)")
         return
 
-    os.makedirs(args.models, exist_ok=True)
-    report = {}
-    for sym in symbols:
-        d = df[df["symbol"] == sym].sort_values("timestamp").rename(columns=str.lower)
-        if d.shape[0] < 200:
-            continue
-        d = add_basic_features(d)
-        d = make_label(d)
-        # simple split: last 90 days as test
-        cutoff = d["timestamp"].max() - pd.Timedelta(days=90)
-        train = d[d["timestamp"] <= cutoff]
-        test = d[d["timestamp"] > cutoff]
-        if train.empty or test.empty:
-            continue
-        clf = train_classifier(train)
-        metrics = evaluate(clf, test)
-        model_path = pathlib.Path(args.models) / f"{sym}_daily_logreg.pkl"
-        if not args.dry_run:
-            save_model(clf, str(model_path))
-        report[sym] = {"metrics": metrics, "model_path": str(model_path)}
-
-    rep_path = pathlib.Path(args.models) / "training_report.json"
-    rep_path.write_text(json.dumps(report, indent=2))
+    with job_metrics("train_daily"):
+        with stage("load"):
+            df = load_local_prices_1d(args.data, months=args.months, symbols=pending)
+        if df.empty:
+            log.warning("no data found, run ingest_1d first", data=args.data)
+            return
+
+        config = load_model_config(models_storage)
+        train_pending(df, pending, args.models, args.dry_run, report, state, watermarks, mode=args.mode, config=config)
+
+    if not args.dry_run:
+        save_training_state(models_storage, state)
+    rep_path.write_text(json.dumps(merge_training_report(models_storage, report), indent=2))
     print(json.dumps(report, indent=2))
 
 
 def lambda_handler(event, context):
     """Handler para AWS Lambda"""
+    # Tempos por estágio (select/sync/load/train/upload) e por símbolo vão na resposta
+    with job_metrics("train_daily") as metrics:
+        response = _train_lambda(event, context)
+        response["body"]["metrics"] = metrics.summary()
+    return response
+
+
+def _train_lambda(event, context):
     import boto3
     
     # Configurar argumentos para o Lambda
     class Args:
         symbols = os.getenv("SYMBOLS", "AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA")
-        data = "/tmp/data"  # Diretório temporário no Lambda
+        data = MIRROR_DIR  # Substituído pela visão do espelho após o sync
         models = "/tmp/models"
         months = int(os.getenv("ML_TRAIN_PERIOD", "12"))
         dry_run = False
+        mode = event.get("mode", TRAIN_MODE)
     
     # Baixar dados do S3 para /tmp
     s3 = boto3.client("s3")
     bucket = os.getenv("S3_RAW_BUCKET", "fiap-fase3-raw")
+    models_bucket = os.getenv("S3_MODELS_BUCKET", "fiap-fase3-models")
     
     # Criar diretórios
-    os.makedirs(Args.data, exist_ok=True)
     os.makedirs(Args.models, exist_ok=True)
     
-    # Baixar arquivos parquet do S3
+    # Consumir watermarks antes de baixar qualquer dado: sem novidades, não há treino
+    symbols = [s.strip() for s in Args.symbols.split(",") if s.strip()]
+    models_storage = storage_from_uri(f"s3://{models_bucket}/daily")
+    with stage("select"):
+        pending, report, watermarks, state = select_symbols(
+            storage_from_uri(f"s3://{bucket}"), models_storage, symbols, force=bool(event.get("force"))
+        )
+    if not pending:
+        log.info("no new data since last training, nothing to retrain (no-op)")
+        return {
+            "statusCode": 200,
+            "body": {
+                "message": "No new data since last training (no-op)",
+                "trained_models": [],
+                "report": report
+            }
+        }
+    
+    # Espelho incremental do lake em /tmp: containers quentes só baixam objetos com ETag novo
     try:
-        paginator = s3.get_paginator('list_objects_v2')
-        for page in paginator.paginate(Bucket=bucket, Prefix="prices_1d/"):
-            for obj in page.get('Contents', []):
-                if obj['Key'].endswith('.parquet'):
-                    local_path = pathlib.Path(Args.data) / obj['Key']
-                    local_path.parent.mkdir(parents=True, exist_ok=True)
-                    s3.download_file(bucket, obj['Key'], str(local_path))
+        mirror = LakeMirror(storage_from_uri(f"s3://{bucket}"), MIRROR_DIR)
+        with stage("sync"):
+            mirror.sync([symbol_prefix("1d", sym) + "/" for sym in pending])
+        Args.data = str(mirror.lake)
     except Exception as e:
         return {
             "statusCode": 500,
             "body": {"error": f"Failed to download data from S3: {str(e)}"}
         }
     
-    # Executar treinamento
-    symbols = [s.strip() for s in Args.symbols.split(",") if s.strip()]
-    df = load_local_prices_1d(Args.data, months=Args.months)
+    # Modo incremental parte do modelo de ontem de cada símbolo
+    if Args.mode == "incremental":
+        for sym in pending:
+            try:
+                with for_symbol(sym), stage("download_model"):
+                    s3.download_file(models_bucket, f"daily/{sym}_daily_logreg.pkl", str(pathlib.Path(Args.models) / f"{sym}_daily_logreg.pkl"))
+            except Exception:
+                log.info("no previous model, starting a full retrain", symbol=sym)
+    
+    # Executar treinamento (apenas símbolos com dados novos)
+    with stage("load"):
+        df = load_local_prices_1d(Args.data, months=Args.months, symbols=pending)
     if df.empty:
         return {
             "statusCode": 400,
             "body": {"error": "No data found for training"}
         }
 
-    report = {}
-    for sym in symbols:
-        d = df[df["symbol"] == sym].sort_values("timestamp").rename(columns=str.lower)
-        if d.shape[0] < 200:
-            continue
-        d = add_basic_features(d)
-        d = make_label(d)
-        cutoff = d["timestamp"].max() - pd.Timedelta(days=90)
-        train = d[d["timestamp"] <= cutoff]
-        test = d[d["timestamp"] > cutoff]
-        if train.empty or test.empty:
-            continue
-        clf = train_classifier(train)
-        metrics = evaluate(clf, test)
-        model_path = pathlib.Path(Args.models) / f"{sym}_daily_logreg.pkl"
-        save_model(clf, str(model_path))
-        report[sym] = {"metrics": metrics, "model_path": str(model_path)}
+    config = load_model_config(models_storage)
+    trained = train_pending(
+        df, pending, Args.models, Args.dry_run, report, state, watermarks, mode=Args.mode, config=config
+    )
 
-    # Upload modelos para S3
-    models_bucket = os.getenv("S3_MODELS_BUCKET", "fiap-fase3-models")
-    for sym in report:
-        model_path = pathlib.Path(Args.models) / f"{sym}_daily_logreg.pkl"
-        if model_path.exists():
-            s3.upload_file(str(model_path), models_bucket, f"daily/{sym}_daily_logreg.pkl")
+    # Upload modelos para S3 (pickle para o treino incremental, .npz para a API)
+    for sym in trained:
+        with for_symbol(sym):
+            for ext in ("pkl", "npz"):
+                model_path = pathlib.Path(Args.models) / f"{sym}_daily_logreg.{ext}"
+                if model_path.exists():
+                    with stage("upload"):
+                        s3.upload_file(str(model_path), models_bucket, f"daily/{sym}_daily_logreg.{ext}")
+                    count(bytes_uploaded=model_path.stat().st_size)
     
-    # Salvar relatório
-    rep_path = pathlib.Path(Args.models) / "training_report.json"
-    rep_path.write_text(json.dumps(report, indent=2))
-    s3.upload_file(str(rep_path), models_bucket, "daily/training_report.json")
+    # Salvar relatório (mesclado ao anterior no S3)
+    rep_path = pathlib.Path(Args.models) / TRAINING_REPORT_KEY
+    rep_path.write_text(json.dumps(merge_training_report(models_storage, report), indent=2))
+    s3.upload_file(str(rep_path), models_bucket, f"daily/{TRAINING_REPORT_KEY}")
+    save_training_state(models_storage, state)
     
     return {
         "statusCode": 200,
         "body": {
             "message": "Model training completed successfully",
-            "trained_models": list(report.keys()),
+            "trained_models": trained,
             "report": report
         }
     }
@@ -0,0 +1,221 @@
+"""Busca de hiperparâmetros com validação cruzada temporal.
+
+Grade: regularização (C) x subconjunto de features x horizonte do label. As
+features de cada símbolo são calculadas uma única vez e gravadas em .npy;
+os workers (um processo por core) abrem esses arquivos com mmap, então
+nenhum candidato recalcula features nem recebe a matriz por pickle.
+
+A melhor configuração (menor log-loss médio fora da amostra) é gravada em
+`_state/model_config.json` no storage de modelos e usada pelo train_daily.
+"""
+import argparse
+import json
+import os
+import pathlib
+import tempfile
+import time
+from datetime import datetime, timezone
+from itertools import product
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from dotenv import load_dotenv
+from sklearn.metrics import accuracy_score, log_loss
+from sklearn.model_selection import TimeSeriesSplit
+
+from app.jobs.train_daily import save_model_config
+from app.lake.reader import scan_prices, split_by_symbol
+from app.lake.storage import storage_from_uri
+from app.ml.features import FEATURE_COLUMNS, WARMUP, feature_kernel
+from app.ml.model import FEATURES, make_classifier
+from app.ml.trainer import ML_SEED, available_cores, run_parallel
+from app.obs.log import get_logger
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+log = get_logger(__name__)
+
+FEATURE_SETS = {
+    "all": FEATURES,
+    "returns": ["ret1", "ret5", "ret10"],
+    "returns_vol": ["ret1", "ret5", "ret10", "vol10"],
+    "trend": ["dist_sma5", "dist_sma10", "dist_sma20"],
+    "trend_vol": ["dist_sma5", "dist_sma10", "dist_sma20", "vol10"],
+}
+
+
+def build_feature_cache(frames, horizons, cache_dir) -> list:
+    """Grava {sym}_X.npy (features) e {sym}_y.npy (label por horizonte, -1 = desconhecido)."""
+    cached = []
+    cols = [FEATURE_COLUMNS.index(f) for f in FEATURES]
+    for sym, d in frames.items():
+        close = d["close"].to_numpy(dtype="float64")
+        if len(close) <= WARMUP:
+            continue
+        X = np.ascontiguousarray(feature_kernel(close)[WARMUP:, cols])
+        close = close[WARMUP:]
+        labels = np.full((len(close), len(horizons)), -1, dtype="int8")
+        for j, h in enumerate(horizons):
+            labels[:-h, j] = close[h:] > close[:-h]
+        np.save(pathlib.Path(cache_dir) / f"{sym}_X.npy", X)
+        np.save(pathlib.Path(cache_dir) / f"{sym}_y.npy", labels)
+        cached.append(sym)
+    return cached
+
+
+def score_candidate(task: tuple) -> dict:
+    """CV temporal de um candidato em todos os símbolos (roda no worker)."""
+    cache_dir, symbols, C, feature_set, h_idx, horizon, n_splits, seed = task
+    cols = [FEATURES.index(c) for c in FEATURE_SETS[feature_set]]
+    losses, accs = [], []
+    for sym in symbols:
+        X = np.load(pathlib.Path(cache_dir) / f"{sym}_X.npy", mmap_mode="r")
+        Y = np.load(pathlib.Path(cache_dir) / f"{sym}_y.npy", mmap_mode="r")
+        y = np.asarray(Y[:, h_idx])
+        known = y >= 0
+        X, y = np.asarray(X[known][:, cols]), y[known]
+        # gap = horizonte: labels do treino não podem olhar para dentro do teste
+        for train, test in TimeSeriesSplit(n_splits=n_splits, gap=horizon).split(X):
+            if np.unique(y[train]).size < 2:
+                continue
+            clf = make_classifier(C, seed).fit(X[train], y[train])
+            prob = clf.predict_proba(X[test])[:, 1]
+            losses.append(log_loss(y[test], prob, labels=[0, 1]))
+            accs.append(accuracy_score(y[test], prob >= 0.5))
+    return {
+        "C": C,
+        "feature_set": feature_set,
+        "horizon": horizon,
+        "folds": len(losses),
+        "log_loss": float(np.mean(losses)) if losses else float("inf"),
+        "accuracy": float(np.mean(accs)) if accs else 0.0,
+    }
+
+
+def failed_candidate(task: tuple, error: str) -> dict:
+    """Resultado de um candidato cujo worker morreu: vai para o fim do ranking."""
+    _, _, C, feature_set, _, horizon, _, _ = task
+    return {"C": C, "feature_set": feature_set, "horizon": horizon, "folds": 0,
+            "log_loss": float("inf"), "accuracy": 0.0, "error": error}
+
+
+def tune(frames, grid_C, feature_sets, horizons, n_splits=5, workers=0, seed=ML_SEED) -> list:
+    """Avalia a grade inteira em paralelo; resultados do melhor para o pior."""
+    with tempfile.TemporaryDirectory(prefix="tune-") as cache_dir:
+        t0 = time.perf_counter()
+        symbols = build_feature_cache(frames, horizons, cache_dir)
+        log.info("feature cache built", symbols=len(symbols), seconds=round(time.perf_counter() - t0, 3))
+
+        tasks = [
+            (cache_dir, symbols, C, fs, j, h, n_splits, seed)
+            for C, fs, (j, h) in product(grid_C, feature_sets, enumerate(horizons))
+        ]
+        workers = max(1, min(workers or available_cores(), len(tasks)))
+        t0 = time.perf_counter()
+        results = run_parallel(tasks, workers, fn=score_candidate, on_error=failed_candidate)
+        log.info("candidates evaluated", candidates=len(tasks), workers=workers, seconds=round(time.perf_counter() - t0, 3))
+    return sorted(results, key=lambda r: (r["log_loss"], -r["accuracy"]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Time-series CV grid search for the daily classifier")
+
+    # Usar variáveis de ambiente como padrão
+    default_symbols = os.getenv("SYMBOLS", "AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA")
+    default_data_dir = os.getenv("DATA_DIR", "./data")
+    default_models_dir = os.getenv("MODELS_DIR", "./models")
+
+    ap.add_argument("--symbols", default=default_symbols, help="comma separated list")
+    ap.add_argument("--data", default=default_data_dir)
+    ap.add_argument(
+        "--models", default=default_models_dir,
+        help="models dir or s3://bucket/daily where the best config is saved",
+    )
+    ap.add_argument("--months", type=int, default=24, help="history used for cross-validation")
+    ap.add_argument("--splits", type=int, default=5)
+    ap.add_argument("--C", default="0.01,0.1,1,10", help="regularization values")
+    ap.add_argument("--feature-sets", default=",".join(FEATURE_SETS), help="names from FEATURE_SETS")
+    ap.add_argument("--horizons", default="1,3,5", help="label horizons in sessions")
+    ap.add_argument("--workers", type=int, default=0, help="processes (default: available cores)")
+    ap.add_argument("--dry-run", action="store_true", help="do not persist the best config")
+    args = ap.parse_args()
+
+    symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
+    start = datetime.now(timezone.utc) - relativedelta(months=args.months)
+    df = scan_prices(args.data, "1d", symbols=symbols, start=start, columns=["timestamp", "close", "symbol"])
+    if df.empty:
+        log.warning("no data found, run ingest_1d first", data=args.data)
+        return
+
+    results = tune(
+        split_by_symbol(df),
+        [float(c) for c in args.C.split(",")],
+        [f.strip() for f in args.feature_sets.split(",") if f.strip()],
+        [int(h) for h in args.horizons.split(",")],
+        n_splits=args.splits,
+        workers=args.workers,
+    )
+    best = results[0]
+    config = {
+        "C": best["C"],
+        "features": FEATURE_SETS[best["feature_set"]],
+        "horizon": best["horizon"],
+        "feature_set": best["feature_set"],
+        "cv": {"log_loss": best["log_loss"], "accuracy": best["accuracy"], "folds": best["folds"]},
+        "symbols": symbols,
+        "tuned_at": datetime.now(timezone.utc).isoformat(),
+    }
+    print(json.dumps({"best": config, "top": results[:5]}, indent=2))
+    if "error" in best:
+        # Todos os candidatos falharam: mantém a configuração salva anteriormente
+        log.error("every candidate failed, config not saved", error=best["error"])
+    elif not args.dry_run:
+        save_model_config(storage_from_uri(args.models), config)
+        log.info("best config saved", target=args.models)
+    return config
+
+
+def lambda_handler(event, context):
+    """Handler para AWS Lambda: espelha o lake 1d em /tmp e salva a melhor config no bucket de modelos"""
+    import sys
+    from app.jobs.train_daily import MIRROR_DIR
+    from app.lake.mirror import LakeMirror
+    from app.lake.writer import symbol_prefix
+
+    symbols = event.get("symbols", os.getenv("SYMBOLS", "AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA"))
+    bucket = os.getenv("S3_RAW_BUCKET", "fiap-fase3-raw")
+    models_bucket = os.getenv("S3_MODELS_BUCKET", "fiap-fase3-models")
+    start_time = time.time()
+
+    try:
+        # Mesmo espelho incremental do train_daily: containers quentes reaproveitam os objetos
+        mirror = LakeMirror(storage_from_uri(f"s3://{bucket}"), MIRROR_DIR)
+        mirror.sync([symbol_prefix("1d", s.strip()) + "/" for s in symbols.split(",") if s.strip()])
+
+        # Simular argumentos para main()
+        sys.argv = [
+            "tune_daily.py",
+            "--symbols", symbols,
+            "--data", str(mirror.lake),
+            "--models", f"s3://{models_bucket}/daily",
+            "--months", str(event.get("months", 24)),
+        ]
+        config = main()
+        if config is None:
+            return {"statusCode": 400, "body": {"error": "No data found for tuning"}}
+        return {
+            "statusCode": 200,
+            "body": {
+                "message": "Hyperparameter search completed",
+                "best": config,
+                "execution_time": time.time() - start_time,
+            },
+        }
+    except Exception as e:
+        log.exception("tuning failed", error=str(e))
+        return {"statusCode": 500, "body": {"error": str(e), "execution_time": time.time() - start_time}}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Calendário de pregões da NYSE e barras esperadas por intervalo.
+
+Usado pelo detector de lacunas para saber quais candles deveriam existir no
+lake. Não cobre pregões encurtados (véspera de feriado), por isso o detector
+de 1h aceita sessões com um número mínimo de barras.
+"""
+import hashlib
+
+import pandas as pd
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar,
+    GoodFriday,
+    Holiday,
+    USLaborDay,
+    USMartinLutherKingJr,
+    USMemorialDay,
+    USPresidentsDay,
+    USThanksgivingDay,
+    nearest_workday,
+    sunday_to_monday,
+)
+from pandas.tseries.offsets import CustomBusinessDay
+
+MARKET_TZ = "America/New_York"
+# yfinance entrega barras de 1h iniciando em 9:30, 10:30, ..., 15:30 (horário de NY)
+HOURLY_BARS_PER_SESSION = 7
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    rules = [
+        Holiday("NewYearsDay", month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-01-01", observance=nearest_workday),
+        Holiday("IndependenceDay", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Christmas", month=12, day=25, observance=nearest_workday),
+    ]
+
+
+_SESSION = CustomBusinessDay(calendar=NYSEHolidayCalendar())
+
+
+def _rule_fields(rule) -> str:
+    # Só campos estáveis entre processos: o repr da regra inclui endereços de função
+    observance = getattr(rule.observance, "__name__", None)
+    return "|".join(str(v) for v in (
+        rule.name, rule.month, rule.day, rule.offset, observance,
+        rule.start_date, rule.end_date, rule.days_of_week,
+    ))
+
+
+def calendar_version() -> str:
+    """Impressão digital das regras de feriado: muda quando o calendário é editado."""
+    rules = "\n".join(_rule_fields(rule) for rule in NYSEHolidayCalendar.rules)
+    return hashlib.sha1(rules.encode()).hexdigest()[:12]
+
+
+def trading_sessions(start, end) -> pd.DatetimeIndex:
+    """Datas (sem fuso) dos pregões entre start e end, inclusive."""
+    start = pd.Timestamp(start).tz_localize(None).normalize()
+    end = pd.Timestamp(end).tz_localize(None).normalize()
+    return pd.date_range(start, end, freq=_SESSION)
+
+
+def session_dates(timestamps: pd.Series, interval: str) -> pd.Series:
+    """Data do pregão de cada candle: 1d usa a data UTC, 1h a data local de NY."""
+    ts = pd.to_datetime(timestamps, utc=True)
+    if interval == "1h":
+        ts = ts.dt.tz_convert(MARKET_TZ)
+    return ts.dt.tz_localize(None).dt.normalize()
@@ -0,0 +1,105 @@
+"""Detecção de lacunas no lake: compara candles gravados com o calendário de pregões.
+
+O resultado são janelas contíguas de pregões faltantes por símbolo, para que o
+job de reparo busque no provedor apenas esses intervalos.
+
+Pregões já buscados no provedor (inclusive os que vieram vazios ou incompletos:
+feriado fora do calendário, pregão encurtado, símbolo deslistado) ficam em
+`_state/gaps_checked/prices_{interval}/symbol={symbol}.json` e não são buscados
+de novo enquanto a versão do calendário for a mesma.
+"""
+import json
+import re
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from app.lake.calendar import HOURLY_BARS_PER_SESSION, calendar_version, session_dates, trading_sessions
+from app.lake.storage import LakeStorage
+from app.lake.writer import symbol_prefix
+
+_PARTITION_RE = re.compile(r"year=(\d+)/month=(\d+)")
+
+
+def stored_timestamps(storage: LakeStorage, interval: str, symbol: str, start) -> pd.Series:
+    """Lê só a coluna timestamp das partições a partir do mês de `start`."""
+    first = (start.year, start.month)
+    frames = []
+    for key in storage.list_keys(symbol_prefix(interval, symbol) + "/"):
+        match = _PARTITION_RE.search(key)
+        if not key.endswith(".parquet") or not match:
+            continue
+        if (int(match.group(1)), int(match.group(2))) < first:
+            continue
+        frames.append(storage.read_table(key, columns=["timestamp"]).column("timestamp").to_pandas())
+    if not frames:
+        return pd.Series([], dtype="datetime64[ns, UTC]")
+    return pd.concat(frames, ignore_index=True)
+
+
+def missing_sessions(
+    timestamps: pd.Series, interval: str, start, end, min_hourly_bars: int = 4
+) -> pd.DatetimeIndex:
+    """Pregões entre start e end sem candle (1d) ou com menos de `min_hourly_bars` barras (1h)."""
+    expected = trading_sessions(start, end)
+    counts = session_dates(timestamps, interval).value_counts()
+    have = counts.reindex(expected, fill_value=0)
+    needed = 1 if interval == "1d" else min(min_hourly_bars, HOURLY_BARS_PER_SESSION)
+    return expected[have.to_numpy() < needed]
+
+
+def coalesce_windows(missing: pd.DatetimeIndex, start, end) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """Agrupa pregões faltantes consecutivos (no calendário) em janelas [primeiro, último]."""
+    if missing.empty:
+        return []
+    position = trading_sessions(start, end).get_indexer(missing)
+    breaks = (position[1:] - position[:-1]) != 1
+    starts = [0] + [i + 1 for i, brk in enumerate(breaks) if brk]
+    ends = [i for i, brk in enumerate(breaks) if brk] + [len(missing) - 1]
+    return [(missing[a], missing[b]) for a, b in zip(starts, ends)]
+
+
+def checked_key(interval: str, symbol: str) -> str:
+    return f"_state/gaps_checked/prices_{interval}/symbol={symbol}.json"
+
+
+def read_checked_sessions(storage: LakeStorage, interval: str, symbol: str) -> pd.DatetimeIndex:
+    """Pregões já buscados no provedor; vazio se o marcador é de outra versão do calendário."""
+    try:
+        marker = json.loads(storage.read_bytes(checked_key(interval, symbol)))
+    except Exception:
+        return pd.DatetimeIndex([])
+    if marker.get("calendar") != calendar_version():
+        return pd.DatetimeIndex([])
+    return pd.DatetimeIndex(pd.to_datetime(marker.get("sessions", [])))
+
+
+def record_checked_sessions(
+    storage: LakeStorage, interval: str, symbol: str, sessions: Iterable[pd.Timestamp], keep_from
+) -> None:
+    """Acrescenta `sessions` ao marcador, descartando pregões anteriores a `keep_from`."""
+    keep_from = pd.Timestamp(keep_from).tz_localize(None).normalize()
+    known = read_checked_sessions(storage, interval, symbol).append(pd.DatetimeIndex(list(sessions)))
+    known = known[known >= keep_from].unique().sort_values()
+    marker = {
+        "symbol": symbol,
+        "interval": interval,
+        "calendar": calendar_version(),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "sessions": [str(d.date()) for d in known],
+    }
+    storage.write_bytes(checked_key(interval, symbol), json.dumps(marker).encode())
+
+
+def find_gaps(
+    storage: LakeStorage, interval: str, symbol: str, start, end, min_hourly_bars: int = 4,
+    skip: Optional[pd.DatetimeIndex] = None,
+) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """Janelas de pregões faltantes para um símbolo entre start e end (menos os de `skip`)."""
+    start = pd.Timestamp(start)
+    timestamps = stored_timestamps(storage, interval, symbol, start)
+    missing = missing_sessions(timestamps, interval, start, end, min_hourly_bars)
+    if skip is not None and len(skip):
+        missing = missing.difference(skip)
+    return coalesce_windows(missing, start, end)
@@ -0,0 +1,151 @@
+"""Espelho local incremental do lake (cache do /tmp em containers Lambda quentes).
+
+Os objetos ficam endereçados por conteúdo em `objects/<etag>` e são expostos
+com o layout original do lake em `lake/<key>` via hardlink, para que
+`app.lake.reader.scan_prices` leia o espelho como se fosse o lake local.
+
+A cada `sync` só objetos com ETag novo são baixados (em paralelo); arquivos
+que sumiram do lake (ex.: compactados pelo writer) saem da visão. O espaço é
+limitado por `max_bytes`: primeiro saem objetos sem referência, depois os
+menos usados recentemente que não fazem parte do sync corrente.
+"""
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from app.lake.storage import LakeStorage
+from app.obs.log import get_logger
+
+log = get_logger(__name__)
+
+MIRROR_MAX_MB = int(os.getenv("LAKE_MIRROR_MAX_MB", "384"))
+MIRROR_WORKERS = int(os.getenv("LAKE_MIRROR_WORKERS", "16"))
+
+
+def _object_id(etag: str) -> str:
+    # ETags de multipart têm "-N"; o hash só normaliza o nome do arquivo
+    return hashlib.sha1(etag.encode()).hexdigest()
+
+
+class LakeMirror:
+    def __init__(self, storage: LakeStorage, root, max_bytes: int = None, workers: int = None):
+        self.storage = storage
+        self.root = pathlib.Path(root)
+        self.objects = self.root / "objects"
+        self.lake = self.root / "lake"
+        self.max_bytes = max_bytes if max_bytes is not None else MIRROR_MAX_MB * 1024 * 1024
+        self.workers = workers or MIRROR_WORKERS
+        self._manifest_path = self.root / "manifest.json"
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> dict:
+        try:
+            return json.loads(self._manifest_path.read_text())
+        except Exception:
+            return {"keys": {}, "objects": {}}
+
+    def _save_manifest(self):
+        tmp = self._manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.manifest))
+        os.replace(tmp, self._manifest_path)
+
+    def _object_path(self, oid: str) -> pathlib.Path:
+        return self.objects / oid[:2] / oid
+
+    def _fetch(self, key: str, oid: str):
+        path = self._object_path(oid)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{oid}.{os.getpid()}.part")
+        self.storage.download(key, tmp)
+        os.replace(tmp, path)
+
+    def _link(self, key: str, oid: str):
+        view = self.lake / key
+        obj = self._object_path(oid)
+        if view.exists() and os.path.samefile(view, obj):
+            return
+        view.parent.mkdir(parents=True, exist_ok=True)
+        view.unlink(missing_ok=True)
+        try:
+            os.link(obj, view)
+        except OSError:
+            shutil.copyfile(obj, view)
+
+    def _drop_key(self, key: str):
+        self.manifest["keys"].pop(key, None)
+        (self.lake / key).unlink(missing_ok=True)
+
+    def sync(self, prefixes: List[str]) -> Dict[str, int]:
+        """Espelha os objetos sob `prefixes`. Retorna contadores da transferência."""
+        start = time.time()
+        remote = {}
+        for prefix in prefixes:
+            remote.update(self.storage.stat_keys(prefix))
+
+        objects = self.manifest["objects"]
+        wanted, missing = {}, {}
+        for key, (etag, size) in remote.items():
+            oid = _object_id(etag)
+            wanted[key] = oid
+            if oid not in missing and not self._object_path(oid).exists():
+                missing[oid] = (key, size)
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as pool:
+                list(pool.map(lambda item: self._fetch(item[1][0], item[0]), missing.items()))
+
+        now = time.time()
+        for key, oid in wanted.items():
+            self._link(key, oid)
+            self.manifest["keys"][key] = oid
+            objects[oid] = {"size": remote[key][1], "last_used": now}
+
+        # Arquivos que não existem mais no lake não podem continuar visíveis ao reader
+        removed = [
+            k for k in list(self.manifest["keys"])
+            if k not in wanted and any(k.startswith(p) for p in prefixes)
+        ]
+        for key in removed:
+            self._drop_key(key)
+
+        evicted = self._evict(protected=set(wanted.values()))
+        self._save_manifest()
+
+        stats = {
+            "listed": len(remote),
+            "downloaded": len(missing),
+            "bytes_downloaded": sum(size for _, size in missing.values()),
+            "reused": len(remote) - len(missing),
+            "removed": len(removed),
+            "evicted": evicted,
+        }
+        log.info("mirror synced", seconds=round(time.time() - start, 3), **stats)
+        return stats
+
+    def _evict(self, protected) -> int:
+        objects = self.manifest["objects"]
+        total = sum(o["size"] for o in objects.values())
+        if total <= self.max_bytes:
+            return 0
+
+        referenced = set(self.manifest["keys"].values())
+        # Sem referência primeiro, depois LRU; nunca o que o sync atual acabou de pedir
+        candidates = sorted(
+            (oid for oid in objects if oid not in protected),
+            key=lambda oid: (oid in referenced, objects[oid]["last_used"]),
+        )
+        evicted = 0
+        for oid in candidates:
+            if total <= self.max_bytes:
+                break
+            for key in [k for k, o in self.manifest["keys"].items() if o == oid]:
+                self._drop_key(key)
+            self._object_path(oid).unlink(missing_ok=True)
+            total -= objects.pop(oid)["size"]
+            evicted += 1
+        return evicted
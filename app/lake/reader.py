@@ -0,0 +1,68 @@
+"""Leitura do lake com filtros e projeção empurrados para os arquivos.
+
+Em vez de ler todo parquet e filtrar depois, a leitura monta um dataset
+pyarrow por símbolo (podando diretórios de outros símbolos), descarta
+partições year= anteriores ao corte e usa as estatísticas de timestamp para
+pular row groups. Só as colunas pedidas são decodificadas.
+"""
+import pathlib
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from app.lake.schema import candle_schema
+
+_PARTITION_FIELDS = [("year", pa.int32()), ("month", pa.int32()), ("day", pa.int32())]
+
+
+def _symbol_dirs(base: pathlib.Path, symbols: Optional[List[str]]) -> List[pathlib.Path]:
+    # Cobre o layout atual (interval=/symbol=) e o antigo (symbol=/interval=)
+    dirs = [p for p in base.rglob("symbol=*") if p.is_dir()]
+    if symbols is not None:
+        wanted = {f"symbol={s}" for s in symbols}
+        dirs = [p for p in dirs if p.name in wanted]
+    return sorted(dirs)
+
+
+def scan_prices(
+    data_dir,
+    interval: str = "1d",
+    symbols: Optional[List[str]] = None,
+    start=None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Candles de `prices_{interval}` a partir de `start`, só com `columns`."""
+    base = pathlib.Path(data_dir) / f"prices_{interval}"
+    dirs = _symbol_dirs(base, symbols) if base.exists() else []
+    columns = columns or list(candle_schema().names)
+    if not dirs:
+        return pd.DataFrame(columns=columns)
+
+    schema = candle_schema()
+    partitioning = ds.partitioning(pa.schema(_PARTITION_FIELDS), flavor="hive")
+    for name, type_ in _PARTITION_FIELDS:
+        schema = schema.append(pa.field(name, type_))
+    dataset = ds.dataset(
+        [ds.dataset(str(d), format="parquet", partitioning=partitioning, schema=schema) for d in dirs]
+    )
+
+    flt = None
+    if start is not None:
+        start = pd.Timestamp(start)
+        start = start.tz_localize("UTC") if start.tzinfo is None else start.tz_convert("UTC")
+        # Poda por diretório (year=) + estatísticas de timestamp por row group
+        flt = (ds.field("year") >= start.year) & (
+            ds.field("timestamp") >= pa.scalar(start, type=pa.timestamp("ns", tz="UTC"))
+        )
+    return dataset.to_table(columns=columns, filter=flt).to_pandas()
+
+
+def split_by_symbol(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Ordena uma vez por (symbol, timestamp), remove duplicatas e separa em um único groupby."""
+    if df.empty:
+        return {}
+    df = df.sort_values(["symbol", "timestamp"], kind="stable")
+    df = df.drop_duplicates(subset=["symbol", "timestamp"], keep="last")
+    return {str(sym): part.reset_index(drop=True) for sym, part in df.groupby("symbol", observed=True, sort=False)}
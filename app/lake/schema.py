@@ -0,0 +1,72 @@
+"""Schema compacto e normalização única dos candles armazenados no lake.
+
+Todas as fontes (yfinance em formato MultiIndex ou plano, índice Date/Datetime,
+arquivos antigos do lake) passam por `normalize_candles`, que produz sempre:
+
+    timestamp  timestamp[ns, UTC]
+    open/high/low/close  float32 (ou float64 via LAKE_PRICE_DTYPE)
+    volume     int64
+    symbol/interval  dictionary<int8, string> (categorical no pandas)
+"""
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+PRICE_COLS = ["open", "high", "low", "close"]
+CANDLE_COLS = ["timestamp"] + PRICE_COLS + ["volume", "symbol", "interval"]
+
+
+def price_dtype(name: Optional[str] = None) -> np.dtype:
+    return np.dtype(name or os.getenv("LAKE_PRICE_DTYPE", "float32"))
+
+
+def candle_schema(prices: Optional[str] = None) -> pa.Schema:
+    price_type = pa.from_numpy_dtype(price_dtype(prices))
+    label_type = pa.dictionary(pa.int8(), pa.string())
+    return pa.schema(
+        [("timestamp", pa.timestamp("ns", tz="UTC"))]
+        + [(col, price_type) for col in PRICE_COLS]
+        + [("volume", pa.int64()), ("symbol", label_type), ("interval", label_type)]
+    )
+
+
+def normalize_candles(
+    df: pd.DataFrame, symbol: str, interval: str, prices: Optional[str] = None
+) -> pd.DataFrame:
+    """Converte qualquer frame OHLCV (yfinance ou lake) para o schema compacto."""
+    if df.empty:
+        return pd.DataFrame(columns=CANDLE_COLS)
+
+    # yfinance retorna o timestamp no índice (Date/Datetime) e às vezes colunas MultiIndex
+    if isinstance(df.index, pd.DatetimeIndex):
+        df = df.reset_index()
+    names = df.columns.get_level_values(0) if isinstance(df.columns, pd.MultiIndex) else df.columns
+    cols = {str(name).lower(): df.columns[i] for i, name in enumerate(names)}
+    for alias in ("date", "datetime", "index"):
+        if alias in cols:
+            cols.setdefault("timestamp", cols[alias])
+
+    dtype = price_dtype(prices)
+    out = pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(df[cols["timestamp"]], utc=True).astype("datetime64[ns, UTC]"),
+            **{col: df[cols[col]].astype(dtype) for col in PRICE_COLS},
+            "volume": df[cols["volume"]].fillna(0).astype("int64"),
+        }
+    )
+    out = out[out["close"].notna()].reset_index(drop=True)
+    codes = np.zeros(len(out), dtype=np.int8)
+    out["symbol"] = pd.Categorical.from_codes(codes, categories=[symbol])
+    out["interval"] = pd.Categorical.from_codes(codes, categories=[interval])
+    return out
+
+
+def to_arrow(df: pd.DataFrame, prices: Optional[str] = None) -> pa.Table:
+    """Frame normalizado -> tabela Arrow com o schema compacto (sem índice)."""
+    table = pa.Table.from_pandas(df[CANDLE_COLS], schema=candle_schema(prices), preserve_index=False)
+    # O schema Arrow já descreve tudo (tz, dictionary -> categorical); o JSON de
+    # metadados do pandas custaria ~1KB em cada arquivo pequeno de partição
+    return table.replace_schema_metadata(None)
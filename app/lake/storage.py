@@ -0,0 +1,169 @@
+"""Camada de armazenamento do data lake: S3 em produção, disco local em dev.
+
+Os jobs escrevem tabelas Arrow direto no destino final, sem staging em /tmp:
+no S3 o parquet é serializado em memória e enviado com multipart upload
+(boto3 divide automaticamente acima do threshold), então o pico de memória e
+disco fica limitado ao tamanho de uma partição.
+"""
+import io
+import os
+import pathlib
+import shutil
+from typing import Dict, List, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.obs.metrics import stage
+
+
+class LakeStorage:
+    """Interface mínima de objetos usada pelos jobs (chaves relativas ao lake)."""
+
+    def write_bytes(self, key: str, data: bytes) -> int:
+        raise NotImplementedError
+
+    def read_bytes(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def list_keys(self, prefix: str) -> List[str]:
+        raise NotImplementedError
+
+    def stat_keys(self, prefix: str) -> Dict[str, Tuple[str, int]]:
+        """Chave relativa -> (etag, tamanho em bytes) de cada objeto sob `prefix`."""
+        raise NotImplementedError
+
+    def download(self, key: str, path) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def uri(self, key: str = "") -> str:
+        raise NotImplementedError
+
+    def write_table(self, table: pa.Table, key: str, **parquet_kwargs) -> int:
+        """Serializa `table` como parquet em memória e grava em `key`. Retorna bytes."""
+        with stage("encode"):
+            sink = pa.BufferOutputStream()
+            pq.write_table(table, sink, **parquet_kwargs)
+            data = sink.getvalue().to_pybytes()
+        with stage("upload"):
+            return self.write_bytes(key, data)
+
+    def read_table(self, key: str, columns=None) -> pa.Table:
+        return pq.read_table(pa.BufferReader(self.read_bytes(key)), columns=columns)
+
+
+class LocalStorage(LakeStorage):
+    """Lake em um diretório local (desenvolvimento e testes)."""
+
+    def __init__(self, root):
+        self.root = pathlib.Path(root)
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.root / key.lstrip("/")
+
+    def write_bytes(self, key: str, data: bytes) -> int:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return len(data)
+
+    def write_table(self, table: pa.Table, key: str, **parquet_kwargs) -> int:
+        # Localmente não há ganho em bufferizar: escreve direto no arquivo
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with stage("encode"):
+            pq.write_table(table, str(path), **parquet_kwargs)
+        return path.stat().st_size
+
+    def read_bytes(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    def read_table(self, key: str, columns=None) -> pa.Table:
+        # partitioning=None: o caminho hive (interval=/symbol=) não deve virar coluna
+        return pq.read_table(str(self._path(key)), columns=columns, partitioning=None)
+
+    def list_keys(self, prefix: str) -> List[str]:
+        base = self._path(prefix)
+        if not base.exists():
+            return []
+        return sorted(
+            str(p.relative_to(self.root)).replace(os.sep, "/")
+            for p in base.rglob("*")
+            if p.is_file()
+        )
+
+    def stat_keys(self, prefix: str) -> Dict[str, Tuple[str, int]]:
+        # Sem ETag no disco: mtime + tamanho identificam a versão do arquivo
+        out = {}
+        for key in self.list_keys(prefix):
+            st = self._path(key).stat()
+            out[key] = (f"{st.st_mtime_ns:x}-{st.st_size:x}", st.st_size)
+        return out
+
+    def download(self, key: str, path) -> None:
+        shutil.copyfile(self._path(key), path)
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def uri(self, key: str = "") -> str:
+        return str(self._path(key))
+
+
+class S3Storage(LakeStorage):
+    """Lake em um bucket S3, sem arquivos temporários locais."""
+
+    def __init__(self, bucket: str, prefix: str = "", client=None):
+        import boto3
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.s3 = client or boto3.client("s3")
+
+    def _key(self, key: str) -> str:
+        # Mantém o layout histórico do bucket: "/".join([prefix, ...]) com prefixo
+        # vazio gera chaves iniciadas por "/" (ex.: "/prices_1d/interval=1d/..."),
+        # que é o formato que a API já lê.
+        return "/".join([self.prefix, key])
+
+    def write_bytes(self, key: str, data: bytes) -> int:
+        # upload_fileobj usa multipart upload automaticamente para buffers grandes
+        self.s3.upload_fileobj(io.BytesIO(data), self.bucket, self._key(key))
+        return len(data)
+
+    def read_bytes(self, key: str) -> bytes:
+        obj = self.s3.get_object(Bucket=self.bucket, Key=self._key(key))
+        return obj["Body"].read()
+
+    def list_keys(self, prefix: str) -> List[str]:
+        return sorted(self.stat_keys(prefix))
+
+    def stat_keys(self, prefix: str) -> Dict[str, Tuple[str, int]]:
+        full_prefix = self._key(prefix)
+        strip = len(self._key(""))
+        out = {}
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=full_prefix):
+            for obj in page.get("Contents", []):
+                out[obj["Key"][strip:]] = (obj["ETag"].strip('"'), obj["Size"])
+        return out
+
+    def download(self, key: str, path) -> None:
+        self.s3.download_file(self.bucket, self._key(key), str(path))
+
+    def delete(self, key: str) -> None:
+        self.s3.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def uri(self, key: str = "") -> str:
+        return f"s3://{self.bucket}/{self._key(key)}"
+
+
+def storage_from_uri(uri: str) -> LakeStorage:
+    """`s3://bucket/prefix` -> S3Storage; qualquer outro valor -> LocalStorage."""
+    if uri.startswith("s3://"):
+        bucket, _, prefix = uri[len("s3://"):].partition("/")
+        return S3Storage(bucket, prefix)
+    return LocalStorage(uri)
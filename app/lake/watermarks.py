@@ -0,0 +1,57 @@
+"""Watermarks por símbolo: o registro do que cada escrita no lake mudou.
+
+Toda escrita que altera alguma partição grava
+`_state/watermarks/prices_{interval}/symbol={symbol}.json` com o maior
+timestamp armazenado, uma revisão incremental e as partições tocadas. Um
+arquivo por símbolo evita conflitos entre shards paralelos. O treino consome
+esses registros para retreinar apenas símbolos cujos dados avançaram.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from app.lake.storage import LakeStorage
+
+
+def watermark_key(interval: str, symbol: str) -> str:
+    return f"_state/watermarks/prices_{interval}/symbol={symbol}.json"
+
+
+def read_watermark(storage: LakeStorage, interval: str, symbol: str) -> Optional[dict]:
+    try:
+        return json.loads(storage.read_bytes(watermark_key(interval, symbol)))
+    except Exception:
+        return None
+
+
+def read_watermarks(storage: LakeStorage, interval: str, symbols: List[str]) -> Dict[str, Optional[dict]]:
+    return {sym: read_watermark(storage, interval, sym) for sym in symbols}
+
+
+def record_watermark(
+    storage: LakeStorage, interval: str, symbol: str, timestamps: pd.Series, partitions: List[str]
+) -> dict:
+    """Avança a revisão do símbolo após uma escrita que mudou `partitions`."""
+    previous = read_watermark(storage, interval, symbol) or {}
+    max_ts = pd.Timestamp(timestamps.max())
+    if previous.get("max_timestamp"):
+        max_ts = max(max_ts, pd.Timestamp(previous["max_timestamp"]))
+    watermark = {
+        "symbol": symbol,
+        "interval": interval,
+        "max_timestamp": max_ts.isoformat(),
+        "revision": int(previous.get("revision", 0)) + 1,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "partitions": partitions,
+    }
+    storage.write_bytes(watermark_key(interval, symbol), json.dumps(watermark).encode())
+    return watermark
+
+
+def changed_since(watermark: Optional[dict], consumed: Optional[dict]) -> bool:
+    """True se o símbolo mudou desde a revisão `consumed` (ou se não há como saber)."""
+    if not watermark or not consumed:
+        return True
+    return int(watermark.get("revision", 0)) != int(consumed.get("revision", -1))
@@ -0,0 +1,139 @@
+"""Escrita particionada de candles no lake.
+
+Layout: prices_{interval}/interval={interval}/symbol={symbol}/year=/month=[/day=]/part-0.parquet
+
+Cada partição tocada pelos dados novos é lida, combinada (sem duplicatas) e
+regravada inteira em um único arquivo, então o custo de uma escrita é limitado
+ao tamanho da partição e reprocessar o mesmo período não acumula arquivos.
+
+Partições cujo conteúdo não mudou não são regravadas; quando alguma muda, o
+watermark do símbolo avança (ver app/lake/watermarks.py).
+
+Os arquivos saem ordenados por timestamp, com estatísticas de coluna e page
+index, para que leituras por intervalo pulem row groups/páginas.
+
+Codec: lz4 (benchmarks/parquet_layout.py, mediana de várias rodadas) gera o
+menor lake nas partições pequenas (~1% abaixo do snappy; zstd comprime melhor
+só arquivos grandes) e empata com o snappy no range-scan dentro do ruído.
+Row group: uma partição tem ~7 (1h, um pregão) a ~21 linhas (1d, um mês), ou
+seja, sempre um único row group; LAKE_ROW_GROUP_ROWS só faz diferença em
+arquivos maiores (compactados, exportações) gravados com parquet_options.
+"""
+import os
+import re
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from app.lake.schema import normalize_candles, to_arrow
+from app.lake.storage import LakeStorage
+from app.lake.watermarks import record_watermark
+from app.obs.log import get_logger
+from app.obs.metrics import count, stage
+
+log = get_logger(__name__)
+
+PARTITION_COLS = {
+    "1d": ["year", "month"],  # Particionar apenas por ano/mês para reduzir número de arquivos
+    "1h": ["year", "month", "day"],  # Dados horários: ano/mês/dia
+}
+PART_FILE = "part-0.parquet"
+
+PARQUET_CODEC = os.getenv("LAKE_PARQUET_CODEC", "lz4")
+# Sem efeito nas partições do lake (bem menores que isso); ver docstring do módulo
+ROW_GROUP_ROWS = int(os.getenv("LAKE_ROW_GROUP_ROWS", "16384"))
+
+
+def parquet_options(codec: Optional[str] = None, row_group_size: Optional[int] = None) -> dict:
+    """Parâmetros de pq.write_table usados em todo o lake (codec: zstd, snappy ou lz4)."""
+    return {
+        "compression": codec or PARQUET_CODEC,
+        "row_group_size": row_group_size or ROW_GROUP_ROWS,
+        "write_statistics": True,
+        "write_page_index": True,
+        "use_dictionary": ["symbol", "interval"],
+    }
+
+
+def symbol_prefix(interval: str, symbol: str) -> str:
+    return f"prices_{interval}/interval={interval}/symbol={symbol}"
+
+
+_PARTITION_RE = re.compile(r"year=(\d+)/month=(\d+)(?:/day=(\d+))?")
+
+
+def partition_date(key: str) -> Optional[Tuple[int, int, int]]:
+    """(ano, mês, dia) da partição de uma chave do lake (dia 0 no 1d); None fora do layout."""
+    m = _PARTITION_RE.search(key)
+    return (int(m.group(1)), int(m.group(2)), int(m.group(3) or 0)) if m else None
+
+
+def latest_partitions(keys: List[str], n: int) -> List[str]:
+    """As `n` chaves .parquet das partições mais recentes pelo valor de year/month/day.
+
+    LastModified não serve: o merge do writer e o repair_gaps regravam partições antigas.
+    """
+    parts = [k for k in keys if k.endswith(".parquet") and partition_date(k)]
+    return sorted(parts, key=lambda k: (partition_date(k), k), reverse=True)[:n]
+
+
+def _read_partition(storage: LakeStorage, keys: List[str]) -> List[pd.DataFrame]:
+    frames = []
+    for key in keys:
+        try:
+            frames.append(storage.read_table(key).to_pandas())
+        except Exception as e:
+            log.warning("could not read partition file", key=key, error=str(e))
+    return frames
+
+
+def write_parquet_partitioned(
+    df: pd.DataFrame,
+    storage: LakeStorage,
+    interval: str,
+    symbol: str,
+    codec: Optional[str] = None,
+    row_group_size: Optional[int] = None,
+) -> List[str]:
+    """Faz merge de `df` com as partições existentes e regrava as que mudaram. Retorna as chaves escritas."""
+    df = normalize_candles(df, symbol, interval)
+    parts = PARTITION_COLS[interval]
+    ts = df["timestamp"].dt
+    part_values = pd.DataFrame({"year": ts.year, "month": ts.month, "day": ts.day})[parts]
+
+    written = []
+    for values, chunk in df.groupby([part_values[c] for c in parts]):
+        part_prefix = "/".join(
+            [symbol_prefix(interval, symbol)]
+            + [f"{col}={int(val)}" for col, val in zip(parts, values)]
+        )
+        target = f"{part_prefix}/{PART_FILE}"
+        with stage("read"):
+            existing = [k for k in storage.list_keys(part_prefix + "/") if k.endswith(".parquet")]
+            frames = _read_partition(storage, existing)
+
+        with stage("merge"):
+            # Arquivos antigos (float64, symbol string, colunas extras) voltam ao schema compacto
+            previous = [normalize_candles(f, symbol, interval) for f in frames]
+            merged = pd.concat(previous + [chunk], ignore_index=True)
+            merged = merged.drop_duplicates(subset=["timestamp"], keep="last").sort_values("timestamp")
+            merged = merged.reset_index(drop=True)
+            unchanged = existing == [target] and len(previous) == 1 and previous[0].equals(merged)
+
+        # Refetch sem novidade (ex.: últimos 2 dias já gravados): nada a escrever
+        if unchanged:
+            continue
+
+        # Tempo de encode/upload é medido no storage (write_table)
+        size = storage.write_table(to_arrow(merged), target, **parquet_options(codec, row_group_size))
+        count(partitions_written=1, rows_written=len(merged), bytes_written=size)
+        # Arquivos antigos da partição (ex.: nomes uuid do write_to_dataset) foram incorporados
+        for key in existing:
+            if key != target:
+                storage.delete(key)
+        written.append(target)
+
+    if written:
+        with stage("watermark"):
+            record_watermark(storage, interval, symbol, df["timestamp"], written)
+    return written
@@ -1,25 +1,83 @@
 # Generic Lambda entry for jobs: dispatch by JOB_NAME from event
-from app.jobs import ingest_1d as j1d
-from app.jobs import ingest_1h as j1h
-from app.jobs import train_daily as jtrain
+#
+# Os módulos de job são importados sob demanda (só o selecionado), para que uma
+# invocação de ingest_1h não pague os imports do treino (sklearn) e vice-versa.
+import importlib
+import time
+
+_INIT_START = time.perf_counter()
+
+from app.jobs import fanout
+from app.obs.log import get_logger, job_context
+from app.obs.profiling import profiled
+
+log = get_logger(__name__)
+
+# JOB_NAME -> módulo com lambda_handler(event, context)
+JOBS = {
+    "ingest_1d": "app.jobs.ingest_1d",
+    "ingest_1h": "app.jobs.ingest_1h",
+    "train_daily": "app.jobs.train_daily",
+    "tune_daily": "app.jobs.tune_daily",
+    "repair_gaps": "app.jobs.repair_gaps",
+    "ingest_historical": "app.jobs.ingest_historical",
+    "ingest_hourly_historical": "app.jobs.ingest_hourly_historical",
+}
+
+# Tempo de init do próprio dispatcher (fase INIT do Lambda) e se já houve invocação neste container
+INIT_MS = (time.perf_counter() - _INIT_START) * 1000
+_cold = True
+_handlers = {}
+
+
+def load_job(job_name):
+    """Importa o módulo do job (uma vez por container); devolve (handler, import_ms)."""
+    if job_name in _handlers:
+        return _handlers[job_name], 0.0
+    start = time.perf_counter()
+    module = importlib.import_module(JOBS[job_name])
+    _handlers[job_name] = module.lambda_handler
+    return _handlers[job_name], (time.perf_counter() - start) * 1000
+
 
 def handler(event, context):
     """
     Generic Lambda handler that routes to specific job handlers based on JOB_NAME in event
     """
+    global _cold
     # Get job name from event (sent by EventBridge)
     job_name = event.get("JOB_NAME", "")
-    
-    print(f"🚀 Generic job handler received: {job_name}")
-    print(f"Event: {event}")
-    
-    # Route to appropriate job handler
-    if job_name == "ingest_1d":
-        return j1d.lambda_handler(event, context)
-    elif job_name == "ingest_1h":
-        return j1h.lambda_handler(event, context)
-    elif job_name == "train_daily":
-        return jtrain.lambda_handler(event, context)
-    else:
-        print(f"⚠️ Unknown JOB_NAME: {job_name}")
+    cold, _cold = _cold, False
+
+    # Correlation id e amostragem de logs valem para todo o job (inclusive shards)
+    with job_context(job_name, event, context):
+        log.info("job received", shards=event.get("shards", 1), cold_start=cold)
+        log.debug("event received", event=event)
+        # Profiling opt-in: {"profile": true} no evento ou sorteio por PROFILE_SAMPLE_RATE
+        with profiled(job_name or "unknown", force=bool(event.get("profile"))):
+            return _dispatch(job_name, event, context, cold)
+
+
+def _dispatch(job_name, event, context, cold=False):
+    # Modo coordenador: {"JOB_NAME": "ingest_1h", "shards": 4} divide SYMBOLS em
+    # sub-invocações paralelas; sub-eventos já trazem "shard" e rodam como worker
+    if job_name in fanout.SHARDABLE_JOBS and int(event.get("shards", 1)) > 1 and "shard" not in event:
+        return fanout.run_sharded(event)
+
+    if job_name not in JOBS:
+        log.warning("unknown JOB_NAME", job_name=job_name)
         return {"statusCode": 400, "body": {"error": f"Unknown JOB_NAME: {job_name}"}}
+
+    # Import do job conta como init: num container quente é 0
+    job_handler, import_ms = load_job(job_name)
+    start = time.perf_counter()
+    response = job_handler(event, context)
+    timings = {
+        "cold_start": cold,
+        "init_ms": round((INIT_MS if cold else 0.0) + import_ms, 2),
+        "handler_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+    log.info("job timings", **timings)
+    if isinstance(response, dict):
+        response["timings"] = timings
+    return response
@@ -0,0 +1,182 @@
+"""Fontes de dados de mercado usadas pelos jobs de ingestão e pela API.
+
+Todos os downloads de candles passam por um MarketDataProvider, que devolve
+o frame já no schema compacto do lake (normalize_candles):
+- YFinanceProvider (padrão): yfinance.download, como antes;
+- ReplayProvider: barras gravadas ou sintéticas em arquivos locais
+  (`{root}/{interval}/{SYMBOL}.parquet`), mantidas em memória depois da
+  primeira leitura. Sem rede nem rate limit, com relógio fixo (`asof`), então
+  execuções repetidas devolvem exatamente as mesmas barras.
+
+Seleção por `MARKET_DATA_PROVIDER`: "yfinance" ou "replay://<dir>"
+(`MARKET_REPLAY_ASOF` fixa o relógio do replay; padrão: última barra de cada arquivo).
+
+Os jobs baixam via `download_with_retries`: exceções do provider (rede, rate
+limit) são repetidas MARKET_DATA_RETRIES vezes com backoff exponencial e cada
+nova tentativa conta como `retries` nas métricas do job (app/obs/metrics.py).
+"""
+import os
+import pathlib
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.lake.schema import CANDLE_COLS, normalize_candles
+from app.obs.log import get_logger
+from app.obs.metrics import count
+
+log = get_logger(__name__)
+
+MARKET_DATA_RETRIES = int(os.getenv("MARKET_DATA_RETRIES", "2"))
+MARKET_DATA_RETRY_BACKOFF_S = float(os.getenv("MARKET_DATA_RETRY_BACKOFF_S", "0.5"))
+
+
+class MarketDataProvider:
+    """Interface mínima: candles de um símbolo por período (ex.: "2d", "2mo", "2y") ou janela [start, end)."""
+
+    name = "base"
+
+    def download(
+        self, symbol: str, interval: str, period: Optional[str] = None, start=None, end=None
+    ) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    name = "yfinance"
+
+    def download(self, symbol, interval, period=None, start=None, end=None):
+        # Import tardio: quem usa o replay não paga o import do yfinance
+        import yfinance as yf
+
+        if start is not None or end is not None:
+            window = {
+                "start": None if start is None else pd.Timestamp(start).strftime("%Y-%m-%d"),
+                "end": None if end is None else pd.Timestamp(end).strftime("%Y-%m-%d"),
+            }
+        else:
+            window = {"period": period or "1mo"}
+        df = yf.download(
+            tickers=symbol,
+            interval=interval,
+            progress=False,
+            threads=False,
+            auto_adjust=False,
+            **window,
+        )
+        if df is None or df.empty:
+            return pd.DataFrame(columns=CANDLE_COLS)
+        return normalize_candles(df, symbol, interval)
+
+
+_PERIOD = re.compile(r"^(\d+)(d|wk|mo|y)$")
+_PERIOD_DAYS = {"d": 1, "wk": 7, "mo": 31, "y": 366}
+
+
+def period_to_timedelta(period: str) -> Optional[pd.Timedelta]:
+    """"2d" -> 2 dias corridos, "2mo" -> 62, ...; "max" -> None (tudo)."""
+    if period in (None, "max"):
+        return None
+    m = _PERIOD.match(period)
+    if not m:
+        raise ValueError(f"unsupported period: {period}")
+    return pd.Timedelta(days=int(m.group(1)) * _PERIOD_DAYS[m.group(2)])
+
+
+def _utc(value) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def replay_path(root, interval: str, symbol: str) -> pathlib.Path:
+    return pathlib.Path(root) / interval / f"{symbol}.parquet"
+
+
+class ReplayProvider(MarketDataProvider):
+    """Serve barras de `{root}/{interval}/{SYMBOL}.parquet` (ver benchmarks/replay_data.py)."""
+
+    name = "replay"
+
+    def __init__(self, root, asof=None):
+        self.root = pathlib.Path(root)
+        self.asof = None if asof in (None, "") else _utc(asof)
+        self._frames: Dict[Tuple[str, str], pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    def _frame(self, symbol: str, interval: str) -> pd.DataFrame:
+        key = (interval, symbol)
+        df = self._frames.get(key)
+        if df is None:
+            path = replay_path(self.root, interval, symbol)
+            if path.exists():
+                df = normalize_candles(pd.read_parquet(path), symbol, interval)
+                df = df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+            else:
+                df = pd.DataFrame(columns=CANDLE_COLS)
+            if self.asof is not None and not df.empty:
+                df = df[df["timestamp"] <= self.asof].reset_index(drop=True)
+            with self._lock:
+                df = self._frames.setdefault(key, df)
+        return df
+
+    def download(self, symbol, interval, period=None, start=None, end=None):
+        df = self._frame(symbol, interval)
+        if df.empty:
+            return df.copy()
+        ts = df["timestamp"]
+        if start is not None or end is not None:
+            lo = 0 if start is None else ts.searchsorted(_utc(start), side="left")
+            hi = len(df) if end is None else ts.searchsorted(_utc(end), side="left")
+        else:
+            span = period_to_timedelta(period or "1mo")
+            now = self.asof if self.asof is not None else ts.iloc[-1]
+            lo = 0 if span is None else ts.searchsorted(now - span, side="right")
+            hi = len(df)
+        return df.iloc[lo:hi].reset_index(drop=True)
+
+
+def provider_from_uri(uri: str) -> MarketDataProvider:
+    """"yfinance" (ou vazio) -> YFinanceProvider; "replay://<dir>" -> ReplayProvider."""
+    if uri.startswith("replay://"):
+        return ReplayProvider(uri[len("replay://"):], asof=os.getenv("MARKET_REPLAY_ASOF"))
+    if uri in ("", "yfinance"):
+        return YFinanceProvider()
+    raise ValueError(f"unknown market data provider: {uri}")
+
+
+_default: Optional[MarketDataProvider] = None
+
+
+def get_provider() -> MarketDataProvider:
+    """Provider do processo (MARKET_DATA_PROVIDER), criado uma vez e reaproveitado entre invocações."""
+    global _default
+    if _default is None:
+        _default = provider_from_uri(os.getenv("MARKET_DATA_PROVIDER", "yfinance"))
+    return _default
+
+
+def set_provider(provider: MarketDataProvider) -> MarketDataProvider:
+    """Troca o provider do processo (CLI --provider, harness de carga)."""
+    global _default
+    _default = provider
+    return provider
+
+
+def download_with_retries(symbol: str, interval: str, retries: Optional[int] = None, **kwargs) -> pd.DataFrame:
+    """get_provider().download com novas tentativas em caso de exceção (a última é propagada)."""
+    retries = MARKET_DATA_RETRIES if retries is None else retries
+    count(retries=0)  # série sem buracos: símbolos sem falha reportam 0
+    for attempt in range(retries + 1):
+        try:
+            return get_provider().download(symbol, interval, **kwargs)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            count(retries=1)
+            delay = MARKET_DATA_RETRY_BACKOFF_S * 2**attempt
+            log.warning("market data download failed, retrying", symbol=symbol, interval=interval,
+                        attempt=attempt + 1, delay_s=delay, error=str(e))
+            time.sleep(delay)
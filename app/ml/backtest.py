@@ -0,0 +1,180 @@
+"""Backtest walk-forward dos sinais buy/sell/hold do /predict.
+
+Para cada símbolo o modelo é retreinado em janelas móveis (`train_days`
+pregões, a cada `step` pregões) e pontua os pregões seguintes de uma vez.
+Sinais, PnL e métricas são calculados com NumPy sobre a série inteira: o
+único laço em Python é por janela de retreino, nunca por dia.
+
+Posição decidida no fechamento de t, mantida até o fechamento de t+1 (mesmo
+horizonte do label); custo de transação em bps por unidade de giro.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from app.lake.reader import scan_prices, split_by_symbol
+from app.ml.features import add_basic_features, make_label
+from app.ml.model import (
+    BUY_THRESHOLD,
+    FEATURES,
+    SELL_THRESHOLD,
+    positions_from_probs,
+    train_classifier,
+)
+
+TRADING_DAYS = 252
+
+
+def walk_forward_probs(d: pd.DataFrame, train_days: int = TRADING_DAYS, step: int = 21, seed: int = 42) -> np.ndarray:
+    """prob_up fora da amostra para cada linha (NaN antes da primeira janela completa)."""
+    probs = np.full(len(d), np.nan)
+    labels = d["label"].to_numpy()
+    for start in range(train_days, len(d), step):
+        train = d.iloc[start - train_days:start]
+        if np.unique(labels[start - train_days:start]).size < 2:
+            continue
+        clf = train_classifier(train, random_state=seed)
+        probs[start:start + step] = clf.predict_proba(d.iloc[start:start + step][FEATURES])[:, 1]
+    return probs
+
+
+def max_drawdown(pnl: np.ndarray) -> float:
+    equity = np.cumprod(1.0 + pnl)
+    return float(np.min(equity / np.maximum.accumulate(equity) - 1.0)) if equity.size else 0.0
+
+
+def summarize(pos: np.ndarray, fwd_ret: np.ndarray, cost_bps: float = 1.0) -> Tuple[dict, np.ndarray]:
+    """Métricas da estratégia a partir de posições e retornos t->t+1 (arrays alinhados)."""
+    turnover = np.abs(np.diff(pos, prepend=0.0))
+    pnl = pos * fwd_ret - turnover * cost_bps / 1e4
+    n = pnl.size
+    active = pos != 0
+    total = float(np.prod(1.0 + pnl) - 1.0) if n else 0.0
+    std = float(pnl.std()) if n else 0.0
+    return {
+        "days": int(n),
+        "trades": int(np.count_nonzero(turnover)),
+        "exposure": float(active.mean()) if n else 0.0,
+        "hit_rate": float((np.sign(fwd_ret[active]) == pos[active]).mean()) if active.any() else None,
+        "total_return": total,
+        "annualized_return": float((1.0 + total) ** (TRADING_DAYS / n) - 1.0) if n else 0.0,
+        "sharpe": float(pnl.mean() / std * np.sqrt(TRADING_DAYS)) if std > 0 else 0.0,
+        "max_drawdown": max_drawdown(pnl),
+        "turnover": float(turnover.mean()) if n else 0.0,
+        "buy_and_hold_return": float(np.prod(1.0 + fwd_ret) - 1.0) if n else 0.0,
+    }, pnl
+
+
+def backtest_symbol(
+    d: pd.DataFrame, train_days: int, step: int, thresholds: List[Tuple[float, float]],
+    cost_bps: float, long_only: bool, seed: int,
+) -> Tuple[Dict[str, dict], Dict[str, pd.Series]]:
+    d = make_label(add_basic_features(d))
+    probs = walk_forward_probs(d, train_days, step, seed)
+    scored = ~np.isnan(probs)
+    fwd_ret = (d["close_t1"].to_numpy() / d["close"].to_numpy() - 1.0)[scored]
+    index = d["timestamp"].to_numpy()[scored]
+
+    # As probabilidades são calculadas uma vez; cada par de limiares é só um np.where
+    metrics, pnls = {}, {}
+    for buy, sell in thresholds:
+        pos = positions_from_probs(probs[scored], buy, sell, long_only)
+        name = f"{buy:g}/{sell:g}"
+        metrics[name], pnl = summarize(pos, fwd_ret, cost_bps)
+        pnls[name] = pd.Series(pnl, index=index)
+    return metrics, pnls
+
+
+def run_backtest(
+    frames: Dict[str, pd.DataFrame],
+    train_days: int = TRADING_DAYS,
+    step: int = 21,
+    thresholds: List[Tuple[float, float]] = None,
+    cost_bps: float = 1.0,
+    long_only: bool = False,
+    seed: int = 42,
+) -> dict:
+    """Backtest por símbolo e de uma carteira equal-weight entre os símbolos."""
+    thresholds = thresholds or [(BUY_THRESHOLD, SELL_THRESHOLD)]
+    report, pnls = {"symbols": {}, "portfolio": {}}, {}
+    for sym, d in frames.items():
+        if len(d) <= train_days + 30:
+            report["symbols"][sym] = {"status": "insufficient_data", "rows": int(len(d))}
+            continue
+        report["symbols"][sym], pnls[sym] = backtest_symbol(d, train_days, step, thresholds, cost_bps, long_only, seed)
+
+    for buy, sell in thresholds:
+        name = f"{buy:g}/{sell:g}"
+        panel = pd.DataFrame({sym: p[name] for sym, p in pnls.items()})
+        if panel.empty:
+            continue
+        pnl = panel.mean(axis=1, skipna=True).to_numpy()
+        equity = np.cumprod(1.0 + pnl)
+        std = pnl.std()
+        report["portfolio"][name] = {
+            "days": int(pnl.size),
+            "total_return": float(equity[-1] - 1.0),
+            "sharpe": float(pnl.mean() / std * np.sqrt(TRADING_DAYS)) if std > 0 else 0.0,
+            "max_drawdown": max_drawdown(pnl),
+        }
+    return report
+
+
+def parse_thresholds(value: str) -> List[Tuple[float, float]]:
+    """"0.6:0.4,0.55:0.45" -> [(0.6, 0.4), (0.55, 0.45)]"""
+    pairs = []
+    for item in value.split(","):
+        buy, _, sell = item.partition(":")
+        pairs.append((float(buy), float(sell)))
+    return pairs
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Walk-forward backtest of the /predict buy/sell/hold signals")
+
+    # Usar variáveis de ambiente como padrão
+    default_symbols = os.getenv("SYMBOLS", "AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA")
+    default_data_dir = os.getenv("DATA_DIR", "./data")
+
+    ap.add_argument("--symbols", default=default_symbols, help="comma separated list")
+    ap.add_argument("--data", default=default_data_dir)
+    ap.add_argument("--years", type=int, default=2, help="history to load")
+    ap.add_argument("--train-days", type=int, default=TRADING_DAYS, help="rolling training window (sessions)")
+    ap.add_argument("--step", type=int, default=21, help="retrain every N sessions")
+    ap.add_argument(
+        "--thresholds", default=f"{BUY_THRESHOLD}:{SELL_THRESHOLD}",
+        help="buy:sell prob_up thresholds, comma separated to compare several",
+    )
+    ap.add_argument("--cost-bps", type=float, default=1.0, help="transaction cost per unit of turnover")
+    ap.add_argument("--long-only", action="store_true", help="sell signal goes flat instead of short")
+    ap.add_argument("--out", default="", help="optional path for the JSON report")
+    args = ap.parse_args()
+
+    symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
+    start = datetime.now(timezone.utc) - relativedelta(years=args.years)
+    df = scan_prices(args.data, "1d", symbols=symbols, start=start, columns=["timestamp", "close", "symbol"])
+    if df.empty:
+        print("No data found. Run ingest_1d first.")
+        return
+
+    t0 = time.perf_counter()
+    report = run_backtest(
+        split_by_symbol(df), args.train_days, args.step, parse_thresholds(args.thresholds),
+        args.cost_bps, args.long_only,
+    )
+    report["execution_time"] = time.perf_counter() - t0
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
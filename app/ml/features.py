@@ -18,9 +18,162 @@ def add_basic_features(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def make_label(df: pd.DataFrame) -> pd.DataFrame:
+def make_label(df: pd.DataFrame, horizon: int = 1) -> pd.DataFrame:
+    """label = 1 se o fechamento daqui a `horizon` pregões for maior que o atual."""
     df = df.copy()
-    df["close_t1"] = df["close"].shift(-1)
-    df["label"] = (df["close_t1"] > df["close"]).astype(int)
+    future = f"close_t{horizon}"
+    df[future] = df["close"].shift(-horizon)
+    df["label"] = (df[future] > df["close"]).astype(int)
     df = df.dropna()
     return df
+
+
+# ==================== KERNEL NUMPY ====================
+# Mesmo resultado de add_basic_features (+ make_label), calculado a partir do
+# array de fechamentos em uma passada, com saída pré-alocada e médias/desvios
+# móveis via soma acumulada. As funções pandas acima seguem como referência.
+
+FEATURE_COLUMNS = ["ret1", "ret5", "ret10", "sma5", "sma10", "sma20", "dist_sma5", "dist_sma10", "dist_sma20", "vol10"]
+RET_LAGS = (1, 5, 10)
+SMA_WINDOWS = (5, 10, 20)
+VOL_WINDOW = 10
+WARMUP = max(SMA_WINDOWS) - 1  # linhas iniciais sem todas as features
+
+
+def feature_kernel(close, dtype=np.float64, starts=None) -> np.ndarray:
+    """Matriz (n, len(FEATURE_COLUMNS)) em ordem Fortran; linhas de aquecimento ficam NaN.
+
+    As somas acumuladas são sempre em float64 (e centradas no primeiro
+    fechamento para reduzir cancelamento); `dtype=np.float32` só reduz a saída.
+
+    `starts`: início de cada série quando `close` concatena vários símbolos
+    (modo painel). Cada série é calculada à parte (centragem, somas acumuladas
+    e retorno da fronteira), então nenhum valor depende de outro símbolo.
+    """
+    c = np.asarray(close, dtype=np.float64)
+    n = c.size
+    out = np.full((n, len(FEATURE_COLUMNS)), np.nan, dtype=dtype, order="F")
+    if n == 0:
+        return out
+    bounds = np.r_[starts, n] if starts is not None and len(starts) else np.array([0, n])
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        if b > a:
+            _fill_features(c[a:b], out[a:b])
+    return out
+
+
+def _fill_features(c: np.ndarray, out: np.ndarray):
+    """Preenche `out` (linhas de uma única série) a partir dos fechamentos `c`."""
+    n = c.size
+    col = {name: out[:, j] for j, name in enumerate(FEATURE_COLUMNS)}
+
+    for lag in RET_LAGS:
+        if n > lag:
+            dst = col[f"ret{lag}"][lag:]
+            np.divide(c[lag:], c[:-lag], out=dst, casting="same_kind")
+            dst -= 1.0
+
+    # cs[i] = soma de (c - c0) nas i primeiras linhas
+    cs = np.empty(n + 1)
+    cs[0] = 0.0
+    np.subtract(c, c[0], out=cs[1:])
+    np.cumsum(cs[1:], out=cs[1:])
+    for w in SMA_WINDOWS:
+        if n >= w:
+            sma = col[f"sma{w}"][w - 1:]
+            np.subtract(cs[w:], cs[:-w], out=sma, casting="same_kind")
+            sma /= w
+            sma += c[0]
+            dist = col[f"dist_sma{w}"]
+            np.divide(c, col[f"sma{w}"], out=dist, casting="same_kind")
+            dist -= 1.0
+
+    # vol10: desvio padrão amostral (ddof=1) dos últimos 10 retornos de 1 período
+    k = VOL_WINDOW
+    if n > k:
+        r = cs[1:]  # reaproveita o buffer: r[0] = 0, r[i] = c[i]/c[i-1] - 1
+        r[0] = 0.0
+        np.divide(c[1:], c[:-1], out=r[1:])
+        r[1:] -= 1.0
+        r2 = r * r
+        s1 = np.cumsum(r)
+        s2 = np.cumsum(r2, out=r2)
+        s1 = s1[k:] - s1[:-k]  # janela r[i-9..i] para i >= 10
+        var = s2[k:] - s2[:-k]
+        var -= s1 * s1 / k
+        var /= k - 1
+        np.maximum(var, 0.0, out=var)
+        np.sqrt(var, out=col["vol10"][k:], casting="same_kind")
+
+
+def basic_features_fast(df: pd.DataFrame, horizon: int = None, dtype=np.float64) -> pd.DataFrame:
+    """Equivalente a add_basic_features(df) (e make_label(..., horizon) se informado).
+
+    O label sai como int8. Espera um único símbolo ordenado por timestamp.
+    """
+    close = df["close"].to_numpy(dtype=np.float64)
+    feats = feature_kernel(close, dtype)
+    stop = len(df)
+    if horizon is not None:
+        stop = max(len(df) - horizon, 0)
+    start = min(WARMUP, stop)
+
+    # .array preserva categóricas e timestamps com fuso
+    data = {c: df[c].array[start:stop] for c in df.columns}
+    for j, name in enumerate(FEATURE_COLUMNS):
+        data[name] = feats[start:stop, j]
+    if horizon is not None:
+        future = close[start + horizon:stop + horizon]
+        data[f"close_t{horizon}"] = future.astype(dtype, copy=False)
+        data["label"] = (future > close[start:stop]).astype(np.int8)
+    return pd.DataFrame(data, index=df.index[start:stop], copy=False)
+
+
+# ==================== MODO PAINEL ====================
+# Todas as séries de um frame longo (vários símbolos) de uma vez: ordena uma
+# vez por (symbol, timestamp), roda o kernel com o início de cada símbolo (as
+# somas acumuladas recomeçam em cada série, sem cancelamento entre escalas de
+# preço diferentes) e descarta as linhas de aquecimento de cada símbolo e as sem
+# `horizon` barras à frente para o label. Nenhum valor usa dados de outro símbolo.
+
+
+def _segments(keys: np.ndarray):
+    """Início e tamanho de cada bloco contíguo de chaves iguais."""
+    n = keys.size
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if n else np.array([], dtype=np.int64)
+    sizes = np.diff(np.r_[starts, n])
+    return starts, sizes
+
+
+def panel_features(df: pd.DataFrame, horizon: int = None, dtype=np.float64, by: str = "symbol") -> pd.DataFrame:
+    """Features (e label, se `horizon`) de todos os símbolos, ordenadas por (symbol, timestamp).
+
+    Por símbolo, o resultado é igual a basic_features_fast(frame_do_símbolo, horizon).
+    """
+    df = df.sort_values([by, "timestamp"], kind="stable")
+    df = df.drop_duplicates(subset=[by, "timestamp"], keep="last")
+    keys = df[by].cat.codes.to_numpy() if isinstance(df[by].dtype, pd.CategoricalDtype) else pd.factorize(df[by])[0]
+    starts, sizes = _segments(keys)
+    pos = np.arange(len(df)) - np.repeat(starts, sizes)
+    keep = pos >= WARMUP
+    if horizon is not None:
+        keep &= np.repeat(sizes, sizes) - pos > horizon
+    rows = np.flatnonzero(keep)
+
+    close = df["close"].to_numpy(dtype=np.float64)
+    feats = feature_kernel(close, dtype, starts=starts)
+    data = {c: df[c].array[rows] for c in df.columns}
+    for j, name in enumerate(FEATURE_COLUMNS):
+        data[name] = feats[rows, j]
+    if horizon is not None:
+        future = close[rows + horizon]
+        data[f"close_t{horizon}"] = future.astype(dtype, copy=False)
+        data["label"] = (future > close[rows]).astype(np.int8)
+    return pd.DataFrame(data, copy=False)
+
+
+def split_panel(panel: pd.DataFrame, by: str = "symbol") -> dict:
+    """Fatias contíguas por símbolo de um painel ordenado (sem groupby nem cópias por máscara)."""
+    keys = panel[by].to_numpy()
+    starts, sizes = _segments(keys)
+    return {str(keys[a]): panel.iloc[a:a + s] for a, s in zip(starts, sizes)}
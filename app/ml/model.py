@@ -1,21 +1,111 @@
+import os
+import numpy as np
 import pandas as pd
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.metrics import accuracy_score, f1_score
+from sklearn.preprocessing import StandardScaler
 import joblib
+from app.ml.scorer import (  # noqa: F401 - reexportados para treino/backtest
+    BUY_THRESHOLD,
+    SELL_THRESHOLD,
+    CompactModel,
+    compact_path,
+    positions_from_probs,
+    signal_from_prob,
+)
 
 FEATURES = ["ret1", "ret5", "ret10", "dist_sma5", "dist_sma10", "dist_sma20", "vol10"]
 
+# Configuração usada quando não há resultado de tuning (app/jobs/tune_daily.py)
+DEFAULT_MODEL_CONFIG = {"C": 1.0, "features": FEATURES, "horizon": 1}
 
-def train_classifier(df: pd.DataFrame):
-    X = df[FEATURES]
+# Modo de treino: "full" (LogisticRegression do zero) ou "incremental" (warm-start diário)
+TRAIN_MODE = os.getenv("ML_TRAIN_MODE", "full")
+# No modo incremental, retreino completo a cada N atualizações (proteção contra drift)
+FULL_RETRAIN_EVERY = int(os.getenv("ML_FULL_RETRAIN_EVERY", "7"))
+
+
+def make_classifier(C: float = 1.0, random_state=None) -> LogisticRegression:
+    return LogisticRegression(C=C, max_iter=200, random_state=random_state)
+
+
+def model_features(clf) -> list:
+    """Colunas na ordem em que o modelo foi treinado (FEATURES para modelos antigos)."""
+    names = getattr(clf, "feature_names_in_", None)
+    return list(names) if names is not None else FEATURES
+
+
+def train_classifier(df: pd.DataFrame, random_state=None, C: float = 1.0, features=None):
+    X = df[features or FEATURES]
     y = df["label"]
-    clf = LogisticRegression(max_iter=200)
+    clf = make_classifier(C, random_state)
     clf.fit(X, y)
     return clf
 
 
+class IncrementalLogit:
+    """Regressão logística atualizável com partial_fit (StandardScaler + SGD log-loss).
+
+    O scaler é ajustado só no treino completo e fica congelado nas atualizações,
+    para que os pesos aprendidos continuem na mesma escala.
+    """
+
+    # Default ~ 1/(C * n) da LogisticRegression(C=1) com ~1 ano de pregões; também
+    # limita o passo do SGD nas atualizações de poucas linhas
+    def __init__(self, alpha: float = 2.5e-3, random_state=None):
+        self.alpha = alpha
+        self.random_state = random_state
+        self.scaler = StandardScaler()
+        self.clf = SGDClassifier(loss="log_loss", alpha=alpha, random_state=random_state)
+        self.trained_through_ = None  # último timestamp de treino já visto
+        self.n_updates_ = 0  # atualizações incrementais desde o último treino completo
+
+    @property
+    def classes_(self):
+        return self.clf.classes_
+
+    @property
+    def feature_names_in_(self):
+        return getattr(self.scaler, "feature_names_in_", None)
+
+    def fit(self, X, y):
+        self.clf.fit(self.scaler.fit_transform(X), y)
+        self.n_updates_ = 0
+        return self
+
+    def partial_fit(self, X, y):
+        self.clf.partial_fit(self.scaler.transform(X), y, classes=np.array([0, 1]))
+        self.n_updates_ += 1
+        return self
+
+    def predict_proba(self, X):
+        return self.clf.predict_proba(self.scaler.transform(X))
+
+    def predict(self, X):
+        return self.clf.predict(self.scaler.transform(X))
+
+
+def train_full_incremental(df: pd.DataFrame, random_state=None, C: float = 1.0, features=None) -> IncrementalLogit:
+    """Treino completo da família incremental (ponto de partida das atualizações)."""
+    # Mesma regularização da LogisticRegression(C): alpha = 1 / (C * n)
+    model = IncrementalLogit(alpha=1.0 / (C * len(df)), random_state=random_state)
+    model.fit(df[features or FEATURES], df["label"])
+    model.trained_through_ = df["timestamp"].max()
+    return model
+
+
+def update_incremental(model: IncrementalLogit, df: pd.DataFrame) -> int:
+    """Aplica partial_fit apenas nas linhas posteriores a `trained_through_`. Retorna quantas."""
+    new = df[df["timestamp"] > model.trained_through_]
+    if new.empty:
+        return 0
+    model.partial_fit(new[model_features(model)], new["label"])
+    model.trained_through_ = new["timestamp"].max()
+    return len(new)
+
+
 def evaluate(clf, df: pd.DataFrame):
-    X = df[FEATURES]
+    X = df[model_features(clf)]
     y = df["label"]
     p = clf.predict(X)
     return {
@@ -24,8 +114,34 @@ def evaluate(clf, df: pd.DataFrame):
     }
 
 
-def save_model(clf, path: str):
+def to_compact(clf, train: pd.DataFrame = None, **meta) -> CompactModel:
+    """Coeficientes no espaço original das features (scaler incorporado) + estatísticas de treino."""
+    if list(clf.classes_) != [0, 1]:
+        raise ValueError(f"expected binary classes [0, 1], got {list(clf.classes_)}")
+    features = model_features(clf)
+    if isinstance(clf, IncrementalLogit):
+        # w·(x - mean)/scale + b = (w/scale)·x + (b - Σ w·mean/scale)
+        w = clf.clf.coef_[0]
+        coef = w / clf.scaler.scale_
+        intercept = clf.clf.intercept_[0] - np.dot(w, clf.scaler.mean_ / clf.scaler.scale_)
+    else:
+        coef, intercept = clf.coef_[0], clf.intercept_[0]
+    meta = {"model": type(clf).__name__, "created_at": pd.Timestamp.now(tz="UTC").isoformat(), **meta}
+    if train is not None:
+        meta.update(
+            n_train=int(len(train)),
+            label_rate=float(train["label"].mean()),
+            trained_through=str(train["timestamp"].max()),
+            feature_mean=[float(v) for v in train[features].mean()],
+            feature_std=[float(v) for v in train[features].std()],
+        )
+    return CompactModel(coef, intercept, features, meta)
+
+
+def save_model(clf, path: str, compact: CompactModel = None):
+    """Grava o pickle e, ao lado, o artefato compacto (.npz) usado pela API."""
     joblib.dump(clf, path)
+    (compact or to_compact(clf)).save(compact_path(path))
 
 
 def load_model(path: str):
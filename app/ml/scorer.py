@@ -0,0 +1,67 @@
+"""Formato compacto do modelo e scorer em NumPy puro (sem sklearn/joblib).
+
+O treino exporta, ao lado do .pkl, um `.npz` versionado com coeficientes,
+intercepto, ordem das features e estatísticas de treino. Para os modelos
+incrementais o StandardScaler é incorporado aos coeficientes, então a API só
+calcula sigmoid(x · coef + intercept).
+"""
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# Limiares de prob_up usados pelo /predict (e avaliados em app/ml/backtest.py)
+BUY_THRESHOLD = float(os.getenv("ML_BUY_THRESHOLD", "0.6"))
+SELL_THRESHOLD = float(os.getenv("ML_SELL_THRESHOLD", "0.4"))
+
+
+def signal_from_prob(prob_up: float, buy: float = BUY_THRESHOLD, sell: float = SELL_THRESHOLD) -> str:
+    return "buy" if prob_up >= buy else ("sell" if prob_up <= sell else "hold")
+
+
+def positions_from_probs(probs, buy: float = BUY_THRESHOLD, sell: float = SELL_THRESHOLD, long_only: bool = False):
+    """Versão vetorizada de signal_from_prob: +1 buy, -1 sell (0 se long_only), 0 hold/NaN."""
+    probs = np.asarray(probs, dtype="float64")
+    short = 0.0 if long_only else -1.0
+    return np.where(probs >= buy, 1.0, np.where(probs <= sell, short, 0.0))
+
+
+def compact_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + ".npz"
+
+
+class CompactModel:
+    def __init__(self, coef, intercept: float, features, meta: dict = None):
+        self.coef = np.asarray(coef, dtype="float64")
+        self.intercept = float(intercept)
+        self.features = list(features)
+        self.meta = meta or {}
+
+    def predict_proba_up(self, X) -> np.ndarray:
+        """P(label=1) para cada linha; aceita DataFrame (reordena colunas) ou array."""
+        if hasattr(X, "columns"):
+            X = X[self.features]
+        z = np.asarray(X, dtype="float64") @ self.coef + self.intercept
+        # sigmoid estável: 1 / (1 + e^-z) sem overflow para |z| grande
+        return np.exp(-np.logaddexp(0.0, -z))
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                version=np.int32(FORMAT_VERSION),
+                coef=self.coef,
+                intercept=np.float64(self.intercept),
+                features=np.array(self.features),
+                meta=np.array(json.dumps(self.meta)),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "CompactModel":
+        with np.load(path, allow_pickle=False) as z:
+            version = int(z["version"])
+            if version > FORMAT_VERSION:
+                raise ValueError(f"unsupported compact model version {version}")
+            return cls(z["coef"], float(z["intercept"]), [str(f) for f in z["features"]], json.loads(str(z["meta"])))
@@ -0,0 +1,114 @@
+"""Cálculo incremental das features de add_basic_features, barra a barra, em O(1).
+
+Cada símbolo mantém um ring buffer dos últimos fechamentos e retornos e somas
+móveis (e soma dos quadrados para a volatilidade). Uma barra nova atualiza as
+somas com o valor que entra e o que sai da janela, sem reler o histórico. As
+somas são recalculadas a partir dos buffers a cada RESYNC_EVERY barras para
+não acumular erro de arredondamento.
+
+O estado é serializável em JSON (to_dict/from_dict), para ser persistido entre
+execuções de jobs ou invocações da API.
+"""
+import math
+from typing import Dict, Optional
+
+import pandas as pd
+
+from app.ml.features import FEATURE_COLUMNS
+
+WINDOWS = (5, 10, 20)
+RET_LAGS = (1, 5, 10)
+VOL_WINDOW = 10
+HISTORY = max(WINDOWS + RET_LAGS) + 1  # fechamentos guardados (t-20 .. t)
+RESYNC_EVERY = 1024
+
+
+class StreamingFeatures:
+    """Estado de features de um símbolo."""
+
+    def __init__(self):
+        self.closes = [0.0] * HISTORY
+        self.returns = [0.0] * VOL_WINDOW
+        self.count = 0  # barras vistas
+        self.sums = {w: 0.0 for w in WINDOWS}
+        self.ret_sum = 0.0
+        self.ret_sumsq = 0.0
+        self.last_timestamp = None
+
+    def _close(self, lag: int) -> float:
+        return self.closes[(self.count - 1 - lag) % HISTORY]
+
+    def _resync(self):
+        n = self.count
+        for w in WINDOWS:
+            self.sums[w] = sum(self._close(k) for k in range(min(w, n)))
+        rets = [self.returns[(n - 2 - k) % VOL_WINDOW] for k in range(min(VOL_WINDOW, max(n - 1, 0)))]
+        self.ret_sum = sum(rets)
+        self.ret_sumsq = sum(r * r for r in rets)
+
+    def update(self, timestamp, close: float) -> Optional[Dict[str, float]]:
+        """Adiciona uma barra e devolve as features dela (None até a janela de 20 encher)."""
+        timestamp = pd.Timestamp(timestamp)
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            raise ValueError(f"bar {timestamp} is not after {self.last_timestamp}")
+        close = float(close)
+        n = self.count
+        for w in WINDOWS:
+            self.sums[w] += close - (self._close(w - 1) if n >= w else 0.0)
+        if n >= 1:
+            ret = close / self._close(0) - 1.0
+            r_pos = (n - 1) % VOL_WINDOW
+            if n - 1 >= VOL_WINDOW:
+                old = self.returns[r_pos]
+                self.ret_sum -= old
+                self.ret_sumsq -= old * old
+            self.returns[r_pos] = ret
+            self.ret_sum += ret
+            self.ret_sumsq += ret * ret
+        self.closes[n % HISTORY] = close
+        self.count = n + 1
+        self.last_timestamp = timestamp
+        if self.count % RESYNC_EVERY == 0:
+            self._resync()
+
+        if self.count < max(WINDOWS):
+            return None
+        out = {f"ret{lag}": close / self._close(lag) - 1.0 for lag in RET_LAGS}
+        for w in WINDOWS:
+            sma = self.sums[w] / w
+            out[f"sma{w}"] = sma
+            out[f"dist_sma{w}"] = close / sma - 1.0
+        k = VOL_WINDOW
+        var = (self.ret_sumsq - self.ret_sum * self.ret_sum / k) / (k - 1)
+        out["vol10"] = math.sqrt(max(var, 0.0))
+        return out
+
+    def update_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Aplica `update` a cada linha (timestamp, close) e devolve as linhas já aquecidas."""
+        rows = []
+        for ts, close in zip(df["timestamp"], df["close"]):
+            feats = self.update(ts, close)
+            if feats is not None:
+                rows.append({"timestamp": ts, "close": float(close), **feats})
+        return pd.DataFrame(rows, columns=["timestamp", "close"] + FEATURE_COLUMNS)
+
+    def to_dict(self) -> dict:
+        return {
+            "version": 1,
+            "closes": self.closes,
+            "returns": self.returns,
+            "count": self.count,
+            "last_timestamp": self.last_timestamp.isoformat() if self.last_timestamp is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "StreamingFeatures":
+        engine = cls()
+        engine.closes = [float(v) for v in state["closes"]]
+        engine.returns = [float(v) for v in state["returns"]]
+        engine.count = int(state["count"])
+        if state.get("last_timestamp"):
+            engine.last_timestamp = pd.Timestamp(state["last_timestamp"])
+        # Somas são derivadas dos buffers: não precisam ir para o estado
+        engine._resync()
+        return engine
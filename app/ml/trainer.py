@@ -0,0 +1,267 @@
+"""Treino por símbolo em paralelo (um processo por core disponível).
+
+Features e labels de todos os símbolos saem de uma única passada em modo
+painel (app.ml.features.panel_features); depois cada símbolo é uma tarefa
+independente: split, fit, avaliação e gravação do modelo rodam no worker, que
+devolve só métricas e tempos. A
+semente de cada símbolo deriva de ML_SEED + nome do símbolo, então o
+resultado não depende da ordem de execução nem do número de workers.
+"""
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.ml.features import WARMUP, panel_features, split_panel
+from app.ml.model import (
+    DEFAULT_MODEL_CONFIG,
+    FULL_RETRAIN_EVERY,
+    TRAIN_MODE,
+    IncrementalLogit,
+    evaluate,
+    load_model,
+    model_features,
+    save_model,
+    to_compact,
+    train_classifier,
+    train_full_incremental,
+    update_incremental,
+)
+from app.obs.log import get_logger
+
+log = get_logger(__name__)
+
+ML_SEED = int(os.getenv("ML_SEED", "42"))
+MIN_TRAIN_ROWS = 200
+TEST_DAYS = 90
+# Diferença máxima aceitável entre o scorer NumPy e o predict_proba do sklearn
+PARITY_TOL = 1e-9
+
+
+def available_cores() -> int:
+    # Respeita cpuset/afinidade (containers), não só o total da máquina
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def symbol_seed(symbol: str, base: int = ML_SEED) -> int:
+    return (base + zlib.crc32(symbol.encode())) % (2**32)
+
+
+def _load_previous(model_path: str) -> Optional[IncrementalLogit]:
+    if not os.path.exists(model_path):
+        return None
+    try:
+        model = load_model(model_path)
+    except Exception as e:
+        log.warning("could not load previous model", model_path=model_path, error=str(e))
+        return None
+    # Modelos do modo full (LogisticRegression) não têm partial_fit: começa nova cadeia
+    return model if isinstance(model, IncrementalLogit) else None
+
+
+def fit_incremental(train: pd.DataFrame, test: pd.DataFrame, model_path: str, seed: int, config: dict):
+    """Atualiza o modelo de ontem com as linhas novas ou, a cada FULL_RETRAIN_EVERY
+    atualizações, retreina do zero e compara com o que a cadeia incremental daria."""
+    prev = _load_previous(model_path)
+    if prev is not None and getattr(prev, "config_", None) != config:
+        prev = None  # configuração mudou (ex.: novo tuning): a cadeia antiga não serve
+    if prev is not None and prev.n_updates_ < FULL_RETRAIN_EVERY:
+        new_rows = update_incremental(prev, train)
+        return prev, {"mode": "incremental", "new_rows": new_rows, "updates_since_full": prev.n_updates_}
+
+    full = train_full_incremental(train, random_state=seed, C=config["C"], features=config["features"])
+    full.config_ = config
+    info = {"mode": "full", "new_rows": int(len(train)), "updates_since_full": 0}
+    if prev is not None:
+        update_incremental(prev, train)
+        info["comparison"] = {"incremental": evaluate(prev, test), "full": evaluate(full, test)}
+    return full, info
+
+
+def fit_symbol(
+    symbol: str, d: pd.DataFrame, model_path: str, seed: int, save: bool = True, mode: str = "full",
+    config: dict = None,
+) -> dict:
+    """Treina e avalia um símbolo a partir das linhas dele em panel_features (já com label).
+    `save=False` não grava o modelo (dry-run).
+
+    config: {"C", "features", "horizon"} (DEFAULT_MODEL_CONFIG ou o salvo pelo tuning).
+    """
+    config = config or DEFAULT_MODEL_CONFIG
+    np.random.seed(seed)
+    timings = {}
+    # Histórico bruto = linhas com features + aquecimento das janelas + horizonte do label
+    if d is None or d.shape[0] + WARMUP + config["horizon"] < MIN_TRAIN_ROWS:
+        return {"symbol": symbol, "status": "insufficient_data"}
+    # simple split: last 90 days as test
+    cutoff = d["timestamp"].max() - pd.Timedelta(days=TEST_DAYS)
+    train = d[d["timestamp"] <= cutoff]
+    test = d[d["timestamp"] > cutoff]
+    if train.empty or test.empty:
+        return {"symbol": symbol, "status": "insufficient_data"}
+
+    t = time.perf_counter()
+    info = {"mode": mode}
+    if mode == "incremental":
+        clf, info = fit_incremental(train, test, model_path, seed, config)
+    else:
+        clf = train_classifier(train, random_state=seed, C=config["C"], features=config["features"])
+    timings["fit_s"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    metrics = evaluate(clf, test)
+    timings["eval_s"] = time.perf_counter() - t
+
+    # O artefato compacto precisa reproduzir o predict_proba do modelo treinado
+    compact = to_compact(clf, train, horizon=config["horizon"], seed=seed)
+    reference = clf.predict_proba(test[model_features(clf)])[:, 1]
+    parity = float(np.max(np.abs(compact.predict_proba_up(test) - reference)))
+    if parity > PARITY_TOL:
+        log.warning("compact model differs from predict_proba", symbol=symbol, parity=parity)
+
+    if save:
+        t = time.perf_counter()
+        save_model(clf, model_path, compact)
+        timings["save_s"] = time.perf_counter() - t
+
+    return {
+        "symbol": symbol,
+        "status": "trained",
+        "metrics": metrics,
+        **info,
+        "config": config,
+        "compact_parity": {"max_abs_diff": parity, "ok": parity <= PARITY_TOL},
+        "seed": seed,
+        "train_rows": int(len(train)),
+        "test_rows": int(len(test)),
+        "timings": {k: round(v, 4) for k, v in timings.items()},
+    }
+
+
+def _fit_task(task: tuple) -> dict:
+    return fit_symbol(*task)
+
+
+def _fit_error(task: tuple, error: str) -> dict:
+    return {"symbol": task[0], "status": "error", "error": error}
+
+
+def _call(fn, task: tuple, on_error) -> dict:
+    # Exceção de uma tarefa (ex.: erro de IO de um símbolo) falha só essa tarefa
+    try:
+        return fn(task)
+    except Exception as e:
+        log.error("parallel task failed", task=str(task[0]), error=str(e))
+        return on_error(task, f"{type(e).__name__}: {e}")
+
+
+def _run_chunk(fn, chunk: List[tuple], conn, on_error=_fit_error):
+    conn.send([_call(fn, task, on_error) for task in chunk])
+    conn.close()
+
+
+def _run_pipes(fn, tasks: List[tuple], workers: int, on_error=_fit_error) -> List[dict]:
+    # AWS Lambda não tem /dev/shm: sem semáforos, ProcessPoolExecutor não sobe.
+    # Processos com Pipe funcionam; as tarefas são repartidas em round-robin.
+    from multiprocessing import Pipe, Process
+
+    procs = []
+    for i in range(workers):
+        parent, child = Pipe(duplex=False)
+        proc = Process(target=_run_chunk, args=(fn, tasks[i::workers], child, on_error))
+        proc.start()
+        child.close()  # só o worker escreve: se ele morrer, recv() recebe EOF em vez de travar
+        procs.append((proc, parent))
+    results = [None] * len(tasks)
+    try:
+        for i, (proc, parent) in enumerate(procs):
+            try:
+                results[i::workers] = parent.recv()  # mantém a ordem das tarefas
+            except (EOFError, OSError) as e:
+                # Worker morreu (OOM, falha em biblioteca nativa): só as tarefas dele falham
+                proc.join()
+                error = f"worker died (exitcode={proc.exitcode}): {type(e).__name__}"
+                log.error("training worker died", worker=i, exitcode=proc.exitcode, tasks=len(tasks[i::workers]))
+                results[i::workers] = [on_error(task, error) for task in tasks[i::workers]]
+    finally:
+        for proc, parent in procs:
+            parent.close()
+            proc.join()
+    return results
+
+
+def run_parallel(tasks: List[tuple], workers: int, fn=_fit_task, on_error=_fit_error) -> List[dict]:
+    """Aplica `fn` (função de módulo) a cada tarefa em `workers` processos.
+
+    `on_error(task, error)` gera o resultado de uma tarefa que levantou exceção
+    ou cujo worker morreu (OOM, falha nativa); as demais seguem normalmente.
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        return [_call(fn, task, on_error) for task in tasks]
+    try:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    except OSError:
+        # Só a criação do pool (sem /dev/shm no Lambda) cai no runner por Pipe
+        return _run_pipes(fn, tasks, workers, on_error)
+
+    results = [None] * len(tasks)
+    with pool:
+        futures = {pool.submit(fn, task): i for i, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                # BrokenProcessPool (worker morto) ou exceção da própria tarefa
+                log.error("parallel task failed", task=str(tasks[i][0]), error=str(e))
+                results[i] = on_error(tasks[i], f"{type(e).__name__}: {e}")
+    return results
+
+
+def train_symbols(
+    df: pd.DataFrame,
+    symbols: List[str],
+    models_dir: str,
+    dry_run: bool = False,
+    workers: int = 0,
+    mode: str = None,
+    config: dict = None,
+) -> Dict[str, dict]:
+    """Treina `symbols` em paralelo e devolve o resultado de cada um, na ordem de entrada.
+
+    `df` é o frame longo (timestamp, close, symbol): features e labels de todos
+    os símbolos são calculados uma vez, em modo painel, antes de distribuir.
+
+    mode: "full" ou "incremental" (default ML_TRAIN_MODE); no incremental o modelo
+    anterior de cada símbolo é lido de `models_dir`. config: ver fit_symbol.
+    """
+    mode = mode or TRAIN_MODE
+    config = config or DEFAULT_MODEL_CONFIG
+    t0 = time.perf_counter()
+    frames = split_panel(panel_features(df, horizon=config["horizon"])) if not df.empty else {}
+    log.info("panel features built", symbols=len(frames), seconds=round(time.perf_counter() - t0, 3))
+    workers = workers or int(os.getenv("ML_TRAIN_WORKERS", "0")) or available_cores()
+    workers = max(1, min(workers, len(symbols)))
+    tasks = []
+    for sym in symbols:
+        model_path = os.path.join(models_dir, f"{sym}_daily_logreg.pkl")
+        tasks.append((sym, frames.get(sym), model_path, symbol_seed(sym), not dry_run, mode, config))
+
+    start = time.perf_counter()
+    results = run_parallel(tasks, workers)
+    elapsed = time.perf_counter() - start
+    log.info("symbols trained", symbols=len(symbols), mode=mode, workers=workers, seconds=round(elapsed, 3))
+
+    paths = {task[0]: task[2] for task in tasks}
+    out = {}
+    for res in results:
+        if res["status"] == "trained":
+            res["model_path"] = paths[res["symbol"]]
+        out[res["symbol"]] = res
+    return {sym: out[sym] for sym in symbols}
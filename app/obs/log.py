@@ -0,0 +1,193 @@
+"""Logging estruturado de baixo custo para a API e os jobs.
+
+- Uma linha por evento: JSON no Lambda (ou LOG_FORMAT=json), texto legível no
+  terminal; campos estruturados vêm como kwargs: log.info("partition written", key=k, rows=n).
+- Nível por LOG_LEVEL (padrão INFO). Chamadas abaixo do nível retornam antes
+  de formatar qualquer coisa; argumentos %-style e campos "callable" só são
+  avaliados se a linha for de fato emitida (ex.: keys=lambda: [...]).
+- Amostragem por rota/job: LOG_SAMPLE_RATES="/latest=0.05,ingest_1h=0.2" (padrão
+  LOG_SAMPLE_RATE=1). A decisão é tomada uma vez por request/job em log_context;
+  WARNING e acima são sempre emitidos.
+- exc_info=True em qualquer nível anexa o traceback (só se a linha for emitida).
+- Correlation id por request/job (header x-request-id, id do Lambda ou o
+  repassado pelo coordenador do fan-out) presente em todas as linhas.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+ROOT_LOGGER = "app"
+
+_context = contextvars.ContextVar("log_context", default={})
+_sampled = contextvars.ContextVar("log_sampled", default=True)
+
+
+def _parse_rates(spec: str) -> dict:
+    rates = {}
+    for part in spec.split(","):
+        key, _, rate = part.strip().rpartition("=")
+        if key:
+            rates[key] = float(rate)
+    return rates
+
+
+SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+SAMPLE_RATES = _parse_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+
+def sample_rate(key: Optional[str]) -> float:
+    return SAMPLE_RATES.get(key, SAMPLE_RATE) if key else SAMPLE_RATE
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_context.get(),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato de terminal: mensagem + campos em key=value."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = {**_context.get(), **getattr(record, "fields", {})}
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+def _formatter() -> logging.Formatter:
+    fmt = os.getenv("LOG_FORMAT", "json" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "text")
+    if fmt == "json":
+        return JsonFormatter()
+    # LOG_FORMAT também aceita um formato do logging padrão (ver .env.example)
+    return TextFormatter(fmt if "%(" in fmt else "%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Escreve no sys.stdout corrente (respeita redirect_stdout de CLIs e benchmarks)."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, _):
+        pass
+
+
+def configure(level: Optional[str] = None) -> logging.Logger:
+    """Handler único em stdout para a árvore "app" (sem propagar para o root do Lambda)."""
+    root = logging.getLogger(ROOT_LOGGER)
+    if not root.handlers:
+        handler = _StdoutHandler()
+        handler.setFormatter(_formatter())
+        root.addHandler(handler)
+        root.propagate = False
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    return root
+
+
+class StructLogger:
+    """Fachada fina sobre logging.Logger com campos estruturados e checagem barata de nível."""
+
+    __slots__ = ("_logger",)
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    def enabled(self, level: int = logging.DEBUG) -> bool:
+        return self._logger.isEnabledFor(level) and (level >= logging.WARNING or _sampled.get())
+
+    def _log(self, level: int, msg: str, args: tuple, fields: dict, exc_info=False):
+        if not self._logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING and not _sampled.get():
+            return
+        exc_info = fields.pop("exc_info", exc_info)
+        if fields:
+            fields = {k: v() if callable(v) else v for k, v in fields.items()}
+        self._logger.log(level, msg, *args, exc_info=exc_info, extra={"fields": fields}, stacklevel=3)
+
+    # debug/info checam o nível antes de qualquer outra chamada: desligados custam ~1 lookup
+    def debug(self, msg: str, *args, **fields):
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._log(logging.DEBUG, msg, args, fields)
+
+    def info(self, msg: str, *args, **fields):
+        if self._logger.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, msg, args, fields)
+
+    def warning(self, msg: str, *args, **fields):
+        self._log(logging.WARNING, msg, args, fields)
+
+    def error(self, msg: str, *args, **fields):
+        self._log(logging.ERROR, msg, args, fields)
+
+    def exception(self, msg: str, *args, **fields):
+        """ERROR com traceback (uma vez por falha, não em laços)."""
+        self._log(logging.ERROR, msg, args, fields, exc_info=True)
+
+
+configure()
+
+
+def get_logger(name: str) -> StructLogger:
+    if not name.startswith(ROOT_LOGGER + ".") and name != ROOT_LOGGER:
+        name = f"{ROOT_LOGGER}.{name}"  # ex.: "__main__" quando o job roda como script
+    return StructLogger(logging.getLogger(name))
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex
+
+
+def correlation_id() -> Optional[str]:
+    return _context.get().get("cid")
+
+
+@contextlib.contextmanager
+def log_context(cid: Optional[str] = None, sample_key: Optional[str] = None, **fields):
+    """Associa correlation id e campos às linhas emitidas dentro do bloco e sorteia a amostragem."""
+    cid = cid or new_correlation_id()
+    rate = sample_rate(sample_key)
+    ctx_token = _context.set({**_context.get(), "cid": cid, **fields})
+    sampled_token = _sampled.set(rate >= 1 or random.random() < rate)
+    try:
+        yield cid
+    finally:
+        _sampled.reset(sampled_token)
+        _context.reset(ctx_token)
+
+
+@contextlib.contextmanager
+def job_context(job_name: str, event: dict = None, context=None):
+    """log_context de um job: reaproveita o correlation id do coordenador (fan-out) ou do Lambda."""
+    event = event or {}
+    cid = event.get("correlation_id") or getattr(context, "aws_request_id", None)
+    fields = {"job": job_name}
+    if "shard" in event:
+        fields["shard"] = event["shard"]
+    with log_context(cid, sample_key=job_name, **fields) as cid:
+        yield cid
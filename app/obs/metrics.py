@@ -0,0 +1,172 @@
+"""Métricas por símbolo e por estágio dos jobs, em CloudWatch Embedded Metric Format.
+
+Um job abre `job_metrics(job_name)`; dentro dele cada símbolo roda em
+`for_symbol(sym)` e as camadas de baixo (writer, storage, provider) marcam
+estágios e contadores sem receber nada por parâmetro (contextvar, como o log_context):
+
+    with job_metrics("ingest_1h") as m:
+        for sym in symbols:
+            with for_symbol(sym):
+                with stage("fetch"):
+                    df = ...
+                count(rows=len(df))
+
+Estágios viram `{stage}_ms` (somados se repetidos); contadores são somados.
+Fora de um job_metrics, stage() e count() não fazem nada (benchmarks, API).
+
+Ao sair do bloco é emitida uma linha por símbolo e uma do job em stdout:
+EMF no Lambda (METRICS_FORMAT=emf, o CloudWatch extrai as métricas do log sem
+chamadas de API), JSON simples localmente (METRICS_FORMAT=json) ou nada
+(METRICS_FORMAT=off). `m.summary()` vai na resposta do handler.
+Namespace: METRICS_NAMESPACE; dimensões Job e Level ("symbol" ou "job", para
+valores por símbolo e totais não caírem na mesma série). O símbolo vai como
+propriedade, consultável no Logs Insights sem multiplicar séries de métricas.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import time
+from typing import Dict, Optional
+
+from app.obs.log import correlation_id
+
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "FinanceJobs")
+JOB_SCOPE = "_job"
+
+_current = contextvars.ContextVar("job_metrics", default=None)
+_null = contextlib.nullcontext()
+
+
+def metrics_format() -> str:
+    return os.getenv("METRICS_FORMAT", "emf" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "json")
+
+
+def _unit(name: str) -> str:
+    if name.endswith("_ms"):
+        return "Milliseconds"
+    if name.startswith("bytes"):
+        return "Bytes"
+    return "Count"
+
+
+class JobMetrics:
+    def __init__(self, job: str, namespace: str = METRICS_NAMESPACE):
+        self.job = job
+        self.namespace = namespace
+        self.values: Dict[str, Dict[str, float]] = {}
+        self.start = time.perf_counter()
+        self.scope = JOB_SCOPE
+
+    def add(self, scope: str, name: str, value: float):
+        values = self.values.setdefault(scope, {})
+        values[name] = values.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def symbol(self, symbol: str):
+        previous, self.scope = self.scope, symbol
+        try:
+            yield self
+        finally:
+            self.scope = previous
+
+    def summary(self) -> dict:
+        symbols = {s: v for s, v in self.values.items() if s != JOB_SCOPE}
+        totals = dict(self.values.get(JOB_SCOPE, {}))
+        for values in symbols.values():
+            for name, value in values.items():
+                totals[name] = totals.get(name, 0) + value
+        totals["duration_ms"] = (time.perf_counter() - self.start) * 1000
+        totals["symbols"] = len(symbols)
+        return {
+            "totals": {k: round(v, 2) for k, v in totals.items()},
+            "symbols": {s: {k: round(x, 2) for k, x in v.items()} for s, v in symbols.items()},
+        }
+
+    def records(self):
+        """Uma entrada por símbolo e uma do job (totais), no formato de emissão."""
+        summary = self.summary()
+        for sym, values in summary["symbols"].items():
+            yield {"symbol": sym, **values}
+        yield {"symbol": None, **summary["totals"]}
+
+    def emit(self, fmt: Optional[str] = None, stream=None):
+        fmt = fmt or metrics_format()
+        if fmt == "off":
+            return
+        stream = stream or sys.stdout
+        cid = correlation_id()
+        timestamp = int(time.time() * 1000)
+        for record in self.records():
+            values = {k: v for k, v in record.items() if k != "symbol"}
+            level = "job" if record["symbol"] is None else "symbol"
+            line = {"Job": self.job, "Level": level, "symbol": record["symbol"], "cid": cid, **values}
+            if fmt == "emf":
+                line["_aws"] = {
+                    "Timestamp": timestamp,
+                    "CloudWatchMetrics": [{
+                        "Namespace": self.namespace,
+                        "Dimensions": [["Job", "Level"]],
+                        "Metrics": [{"Name": k, "Unit": _unit(k)} for k in values],
+                    }],
+                }
+            else:
+                line = {"type": "metrics", **line}
+            stream.write(json.dumps(line, default=str) + "\n")
+        stream.flush()
+
+
+@contextlib.contextmanager
+def job_metrics(job: str, emit: bool = True):
+    """Ativa a coleta para o bloco e emite as linhas ao final (inclusive se o job falhar)."""
+    metrics = JobMetrics(job)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+        if emit:
+            metrics.emit()
+
+
+def current() -> Optional[JobMetrics]:
+    return _current.get()
+
+
+@contextlib.contextmanager
+def _timed(metrics: JobMetrics, name: str):
+    scope = metrics.scope
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(scope, f"{name}_ms", (time.perf_counter() - start) * 1000)
+
+
+def stage(name: str):
+    """Cronometra o bloco como `{name}_ms` do símbolo corrente (no-op fora de job_metrics)."""
+    metrics = _current.get()
+    return _null if metrics is None else _timed(metrics, name)
+
+
+def for_symbol(symbol: str):
+    """Escopo de um símbolo no job corrente (no-op fora de job_metrics)."""
+    metrics = _current.get()
+    return _null if metrics is None else metrics.symbol(symbol)
+
+
+def count(**values):
+    """Soma contadores ao símbolo corrente, ex.: count(rows=120, bytes_written=4096)."""
+    metrics = _current.get()
+    if metrics is not None:
+        for name, value in values.items():
+            metrics.add(metrics.scope, name, value)
+
+
+def record(symbol: str, **values):
+    """Soma valores a um símbolo explícito (ex.: tempos devolvidos por workers de outro processo)."""
+    metrics = _current.get()
+    if metrics is not None:
+        for name, value in values.items():
+            metrics.add(symbol, name, value)
@@ -0,0 +1,180 @@
+"""Profiling sob demanda de rotas da API e handlers de jobs.
+
+Desligado por padrão. Uma chamada é perfilada quando:
+- sorteada por PROFILE_SAMPLE_RATE (fração das chamadas, ex.: 0.01);
+- a request traz `x-profile: 1` e PROFILE_HEADER_ENABLED=true;
+- o evento do job traz `"profile": true`.
+
+A chamada roda sob cProfile (CPU) e, com PROFILE_MEMORY=true, tracemalloc
+(alocações). Ao final:
+- `{PROFILE_DIR}/profiles/{name}/{data}/{cid}.prof.gz`: stats do cProfile
+  (formato pstats, gzip); `... .mem.json.gz`: top alocações e pico;
+- uma linha de log "profile hotspots" com as N funções de maior tempo acumulado.
+PROFILE_DIR é um diretório local ou s3://bucket/prefix (padrão /tmp/profiles).
+
+Só um profile por vez no processo (cProfile e tracemalloc são globais);
+chamadas sorteadas enquanto outro está ativo seguem sem profiling.
+
+Inspecionar um artefato:
+    python -m app.obs.profiling show /tmp/profiles/profiles/latest/2025-10-01/<cid>.prof.gz
+"""
+import contextlib
+import contextvars
+import cProfile
+import functools
+import gzip
+import io
+import json
+import marshal
+import os
+import pstats
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from app.obs.log import correlation_id, get_logger, new_correlation_id
+
+log = get_logger(__name__)
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER_ENABLED = os.getenv("PROFILE_HEADER_ENABLED", "false").lower() == "true"
+PROFILE_HEADER = "x-profile"
+PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "true").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/profiles")
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "15"))
+
+_active = threading.Lock()
+# Pedido de profiling vindo do header; a decisão é tomada no middleware e lida na rota
+_requested = contextvars.ContextVar("profile_requested", default=False)
+
+
+def should_profile(force: bool = False) -> bool:
+    return force or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+
+
+def request_profile(headers) -> contextvars.Token:
+    """Chamado pelo middleware HTTP: marca a request se o header de profiling for aceito."""
+    wanted = PROFILE_HEADER_ENABLED and headers.get(PROFILE_HEADER, "") in ("1", "true")
+    return _requested.set(wanted)
+
+
+def hotspots(prof: cProfile.Profile, top_n: int = PROFILE_TOP_N) -> list:
+    stats = pstats.Stats(prof).sort_stats("cumulative")
+    out = []
+    for func in stats.fcn_list[:top_n]:
+        cc, nc, tt, ct, _ = stats.stats[func]
+        filename, line, name = func
+        out.append({
+            "func": f"{os.path.basename(filename)}:{line}({name})",
+            "ncalls": nc,
+            "tottime_ms": round(tt * 1000, 3),
+            "cumtime_ms": round(ct * 1000, 3),
+        })
+    return out
+
+
+def memory_top(snapshot: tracemalloc.Snapshot, peak: int, top_n: int = PROFILE_TOP_N) -> dict:
+    stats = snapshot.statistics("lineno")[:top_n]
+    return {
+        "peak_kb": round(peak / 1024, 1),
+        "top": [
+            {"where": str(s.traceback[0]), "size_kb": round(s.size / 1024, 1), "count": s.count}
+            for s in stats
+        ],
+    }
+
+
+def write_artifacts(name: str, cid: str, prof: cProfile.Profile, memory: dict = None, target: str = None) -> list:
+    """Grava os artefatos comprimidos em PROFILE_DIR; devolve as URIs."""
+    from app.lake.storage import storage_from_uri
+
+    storage = storage_from_uri(target or PROFILE_DIR)
+    day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    base = f"profiles/{name.strip('/').replace('/', '_') or 'root'}/{day}/{cid}"
+    prof.create_stats()
+    keys = [f"{base}.prof.gz"]
+    storage.write_bytes(keys[0], gzip.compress(marshal.dumps(prof.stats)))
+    if memory is not None:
+        keys.append(f"{base}.mem.json.gz")
+        storage.write_bytes(keys[1], gzip.compress(json.dumps(memory).encode()))
+    return [storage.uri(k) for k in keys]
+
+
+@contextlib.contextmanager
+def profiled(name: str, force: bool = False, memory: bool = None):
+    """Perfila o bloco se sorteado/forçado e não houver outro profile ativo no processo."""
+    if not should_profile(force) or not _active.acquire(blocking=False):
+        yield False
+        return
+    memory = PROFILE_MEMORY if memory is None else memory
+    # tracemalloc já ligado por outro código (ex.: benchmarks): não mexer
+    memory = memory and not tracemalloc.is_tracing()
+    prof = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        if memory:
+            tracemalloc.start()
+        prof.enable()
+        try:
+            yield True
+        finally:
+            prof.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            mem = None
+            if memory:
+                _, peak = tracemalloc.get_traced_memory()
+                mem = memory_top(tracemalloc.take_snapshot(), peak)
+                tracemalloc.stop()
+            _report(name, prof, mem, elapsed_ms)
+    finally:
+        _active.release()
+
+
+def _report(name: str, prof: cProfile.Profile, mem: dict, elapsed_ms: float):
+    top = hotspots(prof)
+    try:
+        uris = write_artifacts(name, correlation_id() or new_correlation_id(), prof, mem)
+    except Exception as e:
+        # Profiling nunca derruba a chamada perfilada
+        uris = []
+        log.warning("could not write profile artifacts", target=PROFILE_DIR, error=str(e))
+    log.info(
+        "profile hotspots", profile=name, elapsed_ms=round(elapsed_ms, 2), artifacts=uris,
+        hotspots=top, peak_kb=mem["peak_kb"] if mem else None,
+    )
+
+
+def profile_route(name: str):
+    """Decorator para rotas síncronas: roda dentro da thread do endpoint (onde o cProfile enxerga o trabalho)."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with profiled(name, force=_requested.get()):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def show(path: str, top_n: int = 30, sort: str = "cumulative"):
+    """Imprime as stats de um .prof.gz (local)."""
+    with open(path, "rb") as f:
+        data = gzip.decompress(f.read())
+    with tempfile.NamedTemporaryFile(suffix=".prof") as tmp:
+        tmp.write(data)
+        tmp.flush()
+        out = io.StringIO()
+        pstats.Stats(tmp.name, stream=out).sort_stats(sort).print_stats(top_n)
+    print(out.getvalue())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "show":
+        raise SystemExit("usage: python -m app.obs.profiling show <file.prof.gz> [top_n] [sort]")
+    show(sys.argv[2], *(int(a) if a.isdigit() else a for a in sys.argv[3:5]))
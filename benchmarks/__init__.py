@@ -0,0 +1 @@
+"""Benchmarks de performance do pipeline (fora do pacote instalado `app`)."""
@@ -0,0 +1,94 @@
+"""Benchmark do kernel NumPy de features contra add_basic_features + make_label.
+
+Para cada símbolo sintético (1h por padrão, vários anos) mede o tempo
+(melhor de N) e o pico de memória alocada (tracemalloc) de:
+- reference: make_label(add_basic_features(df)) em pandas
+- kernel_f64 / kernel_f32: basic_features_fast(df, horizon=1)
+e confere que o kernel float64 reproduz a referência.
+
+Uso:
+    python -m benchmarks.feature_kernel --interval 1h --years 5 --symbols 7
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.ml.features import FEATURE_COLUMNS, add_basic_features, basic_features_fast, make_label
+from benchmarks.fixtures import SYMBOLS, make_candles
+
+TOLERANCE = 1e-9
+
+CASES = {
+    "reference": lambda df: make_label(add_basic_features(df)),
+    "kernel_f64": lambda df: basic_features_fast(df, horizon=1),
+    "kernel_f32": lambda df: basic_features_fast(df, horizon=1, dtype=np.float32),
+}
+
+
+def measure(fn, frames, repeat: int) -> dict:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for df in frames:
+            fn(df)
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    peak = 0
+    for df in frames:
+        tracemalloc.reset_peak()
+        fn(df)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return {"time_ms": best * 1000, "peak_mb_per_symbol": peak / 2**20}
+
+
+def check(frames) -> dict:
+    worst = 0.0
+    for df in frames:
+        ref, fast = CASES["reference"](df), CASES["kernel_f64"](df)
+        if len(ref) != len(fast) or not (ref.index == fast.index).all():
+            raise AssertionError("kernel returned different rows than the reference")
+        cols = FEATURE_COLUMNS + ["label"]
+        worst = max(worst, float(np.max(np.abs(ref[cols].to_numpy(float) - fast[cols].to_numpy(float)))))
+    return {"max_abs_diff": worst, "ok": worst <= TOLERANCE}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--interval", default="1h", choices=["1h", "1d"])
+    ap.add_argument("--years", type=float, default=5)
+    ap.add_argument("--symbols", type=int, default=len(SYMBOLS))
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", default="", help="optional path for the JSON results")
+    args = ap.parse_args()
+
+    frames = [make_candles(s, args.interval, args.years, seed=i) for i, s in enumerate(SYMBOLS[: args.symbols])]
+    # A referência em pandas herda o float32 do lake; para comparar valores usa-se float64
+    for df in frames:
+        df["close"] = df["close"].astype("float64")
+
+    results = {
+        "rows_per_symbol": len(frames[0]),
+        "symbols": len(frames),
+        "check": check(frames),
+        "cases": {name: measure(fn, frames, args.repeat) for name, fn in CASES.items()},
+    }
+    ref = results["cases"]["reference"]
+    for case in results["cases"].values():
+        case["speedup"] = ref["time_ms"] / case["time_ms"]
+        case["memory_ratio"] = case["peak_mb_per_symbol"] / ref["peak_mb_per_symbol"]
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if not results["check"]["ok"]:
+        raise SystemExit("❌ feature kernel diverges from add_basic_features")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Fixtures OHLCV sintéticas e realistas para os benchmarks.
+
+Preços seguem um passeio aleatório geométrico por símbolo (semente fixa), em
+pregões de segunda a sexta: 1 barra por dia no 1d e 7 barras por pregão no 1h
+(13:30-19:30 UTC, como o yfinance entrega para ações americanas).
+"""
+import zlib
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.lake.schema import normalize_candles
+
+SYMBOLS = ["AAPL", "MSFT", "AMZN", "GOOGL", "META", "NVDA", "TSLA"]
+BARS_PER_SESSION = {"1d": 1, "1h": 7}
+
+
+def trading_index(interval: str, years: float, end: str = "2025-10-01") -> pd.DatetimeIndex:
+    sessions = pd.bdate_range(end=end, periods=int(252 * years), tz="UTC")
+    if interval == "1d":
+        return sessions
+    offsets = pd.to_timedelta(13.5 + np.arange(BARS_PER_SESSION["1h"]), unit="h")
+    return pd.DatetimeIndex((sessions.values[:, None] + offsets.values[None, :]).ravel(), tz="UTC")
+
+
+def make_candles(
+    symbol: str, interval: str = "1d", years: float = 2, seed: Optional[int] = None
+) -> pd.DataFrame:
+    """Candles de um símbolo já no schema compacto do lake."""
+    idx = trading_index(interval, years)
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()) if seed is None else seed)
+    sigma = 0.02 / np.sqrt(BARS_PER_SESSION[interval])
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0003, sigma, len(idx))))
+    open_ = close * np.exp(rng.normal(0, sigma / 2, len(idx)))
+    spread = np.abs(rng.normal(0, sigma, len(idx))) * close
+    raw = pd.DataFrame(
+        {
+            "timestamp": idx,
+            "open": open_,
+            "high": np.maximum(open_, close) + spread,
+            "low": np.minimum(open_, close) - spread,
+            "close": close,
+            "volume": rng.lognormal(15, 0.5, len(idx)).astype("int64"),
+        }
+    )
+    return normalize_candles(raw, symbol, interval)
+
+
+def make_panel(
+    symbols: Optional[List[str]] = None, interval: str = "1d", years: float = 2
+) -> pd.DataFrame:
+    """Frame longo multi-símbolo (formato lido pelo treino)."""
+    frames = [make_candles(sym, interval, years) for sym in (symbols or SYMBOLS)]
+    panel = pd.concat(frames, ignore_index=True)
+    panel["symbol"] = panel["symbol"].astype("category")
+    return panel
@@ -0,0 +1,277 @@
+"""Teste de carga offline da API (app.fastapi_app.main:app).
+
+Sobe a API em processo (transporte ASGI do httpx) ou sob uvicorn em uma
+thread, com:
+- S3 em memória (LocalS3Client) semeado com um lake sintético no layout real
+  (bucket raw) e modelos compactos .npz por símbolo (bucket de modelos);
+- yfinance.download substituído por fixtures (sem rede).
+
+Dispara uma mistura configurável de /latest, /latest delta (`since` algumas
+barras antes do fim do lake, o polling do dashboard), /predict e /symbols com N
+clientes concorrentes e reporta throughput e p50/p95/p99 por rota.
+
+Uso:
+    python -m benchmarks.load_test --requests 2000 --concurrency 32 --mix latest=6,predict=2,symbols=1
+    python -m benchmarks.load_test --server uvicorn --s3-latency-ms 20
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import pathlib
+import random
+import socket
+import threading
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from app.lake.storage import S3Storage
+from app.lake.writer import write_parquet_partitioned
+from app.ml.features import add_basic_features, make_label
+from app.ml.model import to_compact, train_classifier
+from benchmarks.fixtures import SYMBOLS, make_candles
+from benchmarks.local_s3 import LocalS3Client, patched_boto3
+
+RAW_BUCKET = os.getenv("S3_RAW_BUCKET", "fiap-fase3-finance-raw")
+MODELS_BUCKET = os.getenv("MODELS_BUCKET", "fiap-fase3-finance-models")
+# Cache local de modelos do /predict (ver app.fastapi_app.main.predict)
+MODEL_CACHE_DIR = pathlib.Path("/tmp/models")
+INTERVALS = ("1h", "1d")
+
+
+def seed_lake(symbols, years: float, latency_s: float) -> tuple:
+    """S3 em memória com o lake 1h/1d e um modelo .npz por símbolo; devolve (client, candles)."""
+    s3 = LocalS3Client()
+    raw = S3Storage(RAW_BUCKET, client=s3)
+    candles = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for i, sym in enumerate(symbols):
+            for iv in INTERVALS:
+                df = make_candles(sym, iv, years, seed=i)
+                write_parquet_partitioned(df, raw, iv, sym)
+                candles[(sym, iv)] = df
+            model = to_compact(train_classifier(make_label(add_basic_features(candles[(sym, "1d")])), random_state=0))
+            path = MODEL_CACHE_DIR / f"seed-{sym}.npz"
+            model.save(str(path))
+            s3.upload_file(str(path), MODELS_BUCKET, f"daily/{sym}_daily_logreg.npz")
+            path.unlink()
+            # Começa sem cache local: a primeira chamada de cada símbolo baixa o modelo
+            (MODEL_CACHE_DIR / f"{sym}_daily_logreg.npz").unlink(missing_ok=True)
+    s3.latency_s = latency_s
+    return s3, candles
+
+
+def _period_days(period: str) -> int:
+    if period.endswith("mo"):
+        return int(period[:-2]) * 31
+    if period.endswith("y"):
+        return int(period[:-1]) * 366
+    return int(period.rstrip("d") or 1)
+
+
+def make_yf_stub(candles, latency_s: float):
+    """yfinance.download falso: últimas barras das fixtures no formato do yfinance."""
+
+    def download(tickers, period="1mo", interval="1d", **_):
+        if latency_s:
+            time.sleep(latency_s)
+        df = candles.get((tickers, interval))
+        if df is None:
+            return pd.DataFrame()
+        start = df["timestamp"].iloc[-1] - pd.Timedelta(days=_period_days(period))
+        df = df[df["timestamp"] > start]
+        out = df[["open", "high", "low", "close", "volume"]].astype({"volume": "int64"})
+        out.columns = ["Open", "High", "Low", "Close", "Volume"]
+        out.index = pd.DatetimeIndex(df["timestamp"], name="Datetime" if interval == "1h" else "Date")
+        return out
+
+    return download
+
+
+@contextlib.contextmanager
+def patched_yfinance(download):
+    import yfinance
+
+    original = yfinance.download
+    yfinance.download = download
+    try:
+        yield
+    finally:
+        yfinance.download = original
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        route, _, weight = part.partition("=")
+        if route.strip() not in ("latest", "delta", "predict", "symbols"):
+            raise SystemExit(f"Unknown route in mix: {route}")
+        mix[route.strip()] = float(weight or 1)
+    return mix
+
+
+def build_request(route: str, symbols, rng: random.Random, candles=None) -> tuple:
+    if route == "latest":
+        params = {"symbol": rng.choice(symbols), "interval": rng.choice(INTERVALS), "limit": 120}
+        return "GET", "/latest", params
+    if route == "delta":
+        sym, iv = rng.choice(symbols), rng.choice(INTERVALS)
+        since = candles[(sym, iv)]["timestamp"].iloc[-rng.randint(1, 3)]
+        return "GET", "/latest", {"symbol": sym, "interval": iv, "limit": 120, "since": since.isoformat()}
+    if route == "predict":
+        return "POST", "/predict", {"symbol": rng.choice(symbols)}
+    return "GET", "/symbols", None
+
+
+async def drive(client: httpx.AsyncClient, plan, concurrency: int) -> dict:
+    """Executa o plano com `concurrency` clientes; devolve latências (s) e erros por rota."""
+    latencies = {route: [] for route, *_ in plan}
+    errors = {route: 0 for route, *_ in plan}
+    queue = iter(plan)
+
+    async def worker():
+        for route, method, path, params in queue:
+            t0 = time.perf_counter()
+            try:
+                resp = await client.request(method, path, params=params)
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies[route].append(time.perf_counter() - t0)
+            if not ok:
+                errors[route] += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"elapsed": time.perf_counter() - t0, "latencies": latencies, "errors": errors}
+
+
+def summarize(run: dict) -> dict:
+    routes = {}
+    for route, lat in run["latencies"].items():
+        if not lat:
+            continue
+        ms = np.asarray(lat) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        routes[route] = {
+            "requests": len(ms),
+            "errors": run["errors"][route],
+            "rps": len(ms) / run["elapsed"],
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(ms.max()),
+        }
+    total = sum(r["requests"] for r in routes.values())
+    return {
+        "elapsed_s": run["elapsed"],
+        "requests": total,
+        "errors": sum(r["errors"] for r in routes.values()),
+        "throughput_rps": total / run["elapsed"],
+        "routes": routes,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def open_client(app, server: str, concurrency: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if server == "asgi":
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            yield client
+        return
+
+    import uvicorn
+
+    # uvicorn em uma thread do mesmo processo: os patches de boto3/yfinance continuam valendo
+    port = _free_port()
+    srv = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=srv.run, daemon=True)
+    thread.start()
+    while not srv.started:
+        await asyncio.sleep(0.05)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            yield client
+    finally:
+        srv.should_exit = True
+        thread.join(timeout=10)
+
+
+async def run_load(app, plan, warmup, concurrency: int, server: str) -> dict:
+    async with open_client(app, server, concurrency) as client:
+        if warmup:
+            await drive(client, warmup, concurrency)
+        return await drive(client, plan, concurrency)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--server", default="asgi", choices=["asgi", "uvicorn"])
+    ap.add_argument("--symbols", type=int, default=len(SYMBOLS))
+    ap.add_argument("--years", type=float, default=1, help="history in the synthetic lake")
+    ap.add_argument("--requests", type=int, default=1000)
+    ap.add_argument("--warmup", type=int, default=50, help="requests before measuring")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--mix", default="latest=6,predict=2,symbols=1", help="route=weight pairs")
+    ap.add_argument("--s3-latency-ms", type=float, default=0, help="artificial delay per S3 read call")
+    ap.add_argument("--yf-latency-ms", type=float, default=0, help="artificial delay per yfinance download")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--verbose", action="store_true", help="keep the API's own prints")
+    ap.add_argument("--json", default="", help="optional path for the JSON results")
+    args = ap.parse_args()
+
+    symbols = SYMBOLS[: args.symbols]
+    # A API só aceita símbolos de SYMBOLS, lido no import
+    os.environ["SYMBOLS"] = ",".join(symbols)
+    MODEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    s3, candles = seed_lake(symbols, args.years, args.s3_latency_ms / 1000)
+    print(f"🧪 Seeded {len(symbols)} symbols ({len(s3._objects)} objects) in {time.perf_counter() - t0:.2f}s")
+
+    from app.fastapi_app.main import app
+
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    routes, weights = list(mix), list(mix.values())
+
+    def make_plan(n):
+        return [(r, *build_request(r, symbols, rng, candles)) for r in rng.choices(routes, weights, k=n)]
+
+    warmup, plan = make_plan(args.warmup), make_plan(args.requests)
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with patched_boto3(s3), patched_yfinance(make_yf_stub(candles, args.yf_latency_ms / 1000)), quiet:
+        run = asyncio.run(run_load(app, plan, warmup, args.concurrency, args.server))
+
+    result = summarize(run)
+    result["params"] = {k: v for k, v in vars(args).items() if k not in ("json", "verbose")}
+    result["s3_calls"] = dict(s3.calls)
+
+    print(f"🚀 {result['requests']} requests in {result['elapsed_s']:.2f}s: {result['throughput_rps']:.1f} req/s")
+    print(f"{'route':<10} {'reqs':>6} {'errs':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, r in result["routes"].items():
+        print(
+            f"{route:<10} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} "
+            f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    if result["errors"]:
+        raise SystemExit(f"❌ {result['errors']} request(s) failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Cliente S3 em memória para benchmarks e testes de carga offline.
+
+Implementa só a parte da API do boto3 usada pelo repo (list_objects_v2,
+paginator, get_object, download_file, upload_fileobj/upload_file,
+delete_object). Preenchido com S3Storage(bucket, client=LocalS3Client()) e
+write_parquet_partitioned, as chaves ficam exatamente no layout de produção
+(inclusive a "/" inicial que a API lê).
+"""
+import contextlib
+import hashlib
+import io
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class _NoSuchKey(Exception):
+    pass
+
+
+class _Paginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, Bucket, Prefix="", PageSize=1000):
+        token = None
+        while True:
+            page = self.client.list_objects_v2(Bucket=Bucket, Prefix=Prefix, MaxKeys=PageSize, ContinuationToken=token)
+            yield page
+            token = page.get("NextContinuationToken")
+            if not token:
+                return
+
+
+class LocalS3Client:
+    class exceptions:
+        NoSuchKey = _NoSuchKey
+
+    def __init__(self, latency_s: float = 0.0):
+        self._objects = {}  # (bucket, key) -> (bytes, last_modified)
+        self._lock = threading.Lock()
+        self.calls = {}
+        # Atraso artificial por chamada de leitura (simula a ida e volta ao S3)
+        self.latency_s = latency_s
+
+    def _count(self, op: str):
+        with self._lock:
+            self.calls[op] = self.calls.get(op, 0) + 1
+        if self.latency_s and op in ("get_object", "list_objects_v2"):
+            time.sleep(self.latency_s)
+
+    def put_object(self, Bucket, Key, Body=b"", **_):
+        data = Body.read() if hasattr(Body, "read") else bytes(Body)
+        self._count("put_object")
+        with self._lock:
+            self._objects[(Bucket, Key)] = (data, datetime.now(timezone.utc))
+        return {"ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, **_):
+        self.put_object(Bucket=Bucket, Key=Key, Body=Fileobj)
+
+    def upload_file(self, Filename, Bucket, Key, **_):
+        with open(Filename, "rb") as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f)
+
+    def get_object(self, Bucket, Key, **_):
+        self._count("get_object")
+        try:
+            data, modified = self._objects[(Bucket, Key)]
+        except KeyError:
+            raise _NoSuchKey(Key) from None
+        return {"Body": io.BytesIO(data), "ContentLength": len(data), "LastModified": modified}
+
+    def download_file(self, Bucket, Key, Filename, **_):
+        body = self.get_object(Bucket=Bucket, Key=Key)["Body"]
+        with open(Filename, "wb") as f:
+            f.write(body.read())
+
+    def delete_object(self, Bucket, Key, **_):
+        self._count("delete_object")
+        with self._lock:
+            self._objects.pop((Bucket, Key), None)
+
+    def list_objects_v2(self, Bucket, Prefix="", MaxKeys=1000, ContinuationToken=None, **_):
+        self._count("list_objects_v2")
+        with self._lock:
+            keys = sorted(k for b, k in self._objects if b == Bucket and k.startswith(Prefix))
+        if ContinuationToken:
+            keys = [k for k in keys if k > ContinuationToken]
+        page, rest = keys[:MaxKeys], keys[MaxKeys:]
+        out = {"KeyCount": len(page), "IsTruncated": bool(rest)}
+        if page:
+            out["Contents"] = [
+                {
+                    "Key": k,
+                    "Size": len(self._objects[(Bucket, k)][0]),
+                    "ETag": f'"{hashlib.md5(self._objects[(Bucket, k)][0]).hexdigest()}"',
+                    "LastModified": self._objects[(Bucket, k)][1],
+                }
+                for k in page
+            ]
+        if rest:
+            out["NextContinuationToken"] = page[-1]
+        return out
+
+    def get_paginator(self, operation: str):
+        if operation != "list_objects_v2":
+            raise NotImplementedError(operation)
+        return _Paginator(self)
+
+
+@contextlib.contextmanager
+def patched_boto3(client):
+    """Faz boto3.client("s3") devolver `client` dentro do bloco (código que cria o próprio client)."""
+    import boto3
+
+    original = boto3.client
+    boto3.client = lambda service, *args, **kwargs: client if service == "s3" else original(service, *args, **kwargs)
+    try:
+        yield client
+    finally:
+        boto3.client = original
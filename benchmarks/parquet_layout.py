@@ -0,0 +1,212 @@
+"""Benchmark de layout parquet: codec x tamanho de row group.
+
+Para cada combinação grava um lake sintético (1h e 1d) com
+write_parquet_partitioned e mede tamanho em disco, tempo de escrita, tempo
+de decode completo e latência de uma leitura por intervalo (últimos pregões),
+tanto no layout particionado quanto em um arquivo compactado por símbolo.
+
+Cada tempo é medido `--repeat` vezes (mediana e faixa p25-p75); a ordem das
+combinações é embaralhada a cada rodada para diluir aquecimento de cache.
+
+O row group só tem efeito no arquivo compactado: as partições do lake têm
+~7 (1h, um pregão) a ~21 linhas (1d, um mês), sempre um único row group. Por
+isso o codec é escolhido pelo lake (tamanho + range-scan) e o row group pelo
+range-scan do compactado, separadamente. Um vencedor cuja vantagem de
+latência fica dentro da faixa p25-p75 é reportado como empate de ruído.
+
+Uso:
+    python -m benchmarks.parquet_layout --symbols 7 --years 2
+"""
+import argparse
+import itertools
+import json
+import pathlib
+import random
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from app.lake.schema import to_arrow
+from app.lake.storage import LocalStorage
+from app.lake.writer import parquet_options, write_parquet_partitioned
+from benchmarks.fixtures import SYMBOLS, make_candles
+
+RANGE_SESSIONS = 5
+
+
+def _time_ms(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+def _summary(samples) -> dict:
+    """Mediana e faixa p25-p75 (ms) de uma lista de tempos."""
+    q = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {"median": round(q[1], 3), "p25": round(q[0], 3), "p75": round(q[2], 3)}
+
+
+def _range_filter(frames) -> ds.Expression:
+    last = max(f["timestamp"].max() for f in frames)
+    cutoff = pa.scalar(last - pd.Timedelta(days=RANGE_SESSIONS + 2), type=pa.timestamp("ns", tz="UTC"))
+    return ds.field("timestamp") >= cutoff
+
+
+class Setting:
+    """Lake particionado e arquivos compactados de uma combinação codec x row group."""
+
+    def __init__(self, frames, interval: str, codec: str, row_group: int, root: pathlib.Path):
+        self.interval, self.codec, self.row_group = interval, codec, row_group
+        self.frames = frames
+        self.root = root
+        self.samples = {k: [] for k in ("write", "lake_decode", "lake_range", "compact_decode", "compact_range")}
+        self.write()
+        lake_files = [str(p) for p in (root / "lake").rglob("*.parquet")]
+        self.lake_files = len(lake_files)
+        self.lake_bytes = sum(pathlib.Path(f).stat().st_size for f in lake_files)
+        self.lake = ds.dataset(lake_files, format="parquet")
+
+        compact_dir = root / "compact"
+        compact_dir.mkdir()
+        for frame in frames:
+            path = compact_dir / f"{frame['symbol'].iloc[0]}.parquet"
+            pq.write_table(to_arrow(frame), str(path), **parquet_options(codec, row_group))
+        self.compact_bytes = sum(p.stat().st_size for p in compact_dir.iterdir())
+        self.compact = ds.dataset(str(compact_dir), format="parquet")
+
+    def write(self):
+        # Lake novo a cada rodada: mede a escrita completa, não o caminho "sem mudança"
+        lake = self.root / "lake"
+        if lake.exists():
+            import shutil
+            shutil.rmtree(lake)
+        storage = LocalStorage(lake)
+        t0 = time.perf_counter()
+        for frame in self.frames:
+            symbol = str(frame["symbol"].iloc[0])
+            write_parquet_partitioned(frame, storage, self.interval, symbol,
+                                      codec=self.codec, row_group_size=self.row_group)
+        self.samples["write"].append((time.perf_counter() - t0) * 1000)
+
+    def measure(self, flt, write: bool):
+        if write:
+            self.write()
+        self.samples["lake_decode"].append(_time_ms(lambda: self.lake.to_table()))
+        self.samples["lake_range"].append(_time_ms(lambda: self.lake.to_table(filter=flt)))
+        self.samples["compact_decode"].append(_time_ms(lambda: self.compact.to_table()))
+        self.samples["compact_range"].append(_time_ms(lambda: self.compact.to_table(filter=flt)))
+
+    def result(self) -> dict:
+        return {
+            "interval": self.interval,
+            "codec": self.codec,
+            "row_group": self.row_group,
+            "files": self.lake_files,
+            "lake_bytes": self.lake_bytes,
+            "compact_bytes": self.compact_bytes,
+            **{f"{k}_ms": _summary(v) for k, v in self.samples.items()},
+        }
+
+
+def bench_interval(frames, interval: str, codecs, row_groups, repeat: int, write_repeat: int, seed: int) -> list:
+    flt = _range_filter(frames)
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = [
+            Setting(frames, interval, codec, rg, pathlib.Path(tmp) / f"{codec}-{rg}")
+            for codec, rg in itertools.product(codecs, row_groups)
+        ]
+        for i in range(repeat):
+            order = list(settings)
+            rng.shuffle(order)
+            for setting in order:
+                setting.measure(flt, write=i < write_repeat - 1)
+        return [s.result() for s in settings]
+
+
+def _fmt(t: dict) -> str:
+    return f"{t['median']:7.2f} [{t['p25']:.2f}-{t['p75']:.2f}]"
+
+
+def pick(table: pd.DataFrame, by: str, bytes_col: str, range_col: str):
+    """Menor soma normalizada de tamanho e mediana do range-scan, com o teste de ruído.
+
+    Retorna (vencedor, vice, empate): empate quando a diferença de mediana do
+    range-scan entre os dois é menor que a faixa p25-p75 do vencedor.
+    """
+    rows = []
+    for interval, group in table.groupby("interval"):
+        agg = group.groupby(by).agg(
+            size=(bytes_col, "mean"),
+            median=(range_col, lambda s: statistics.median(t["median"] for t in s)),
+            iqr=(range_col, lambda s: statistics.median(t["p75"] - t["p25"] for t in s)),
+        )
+        agg["score"] = agg["size"] / agg["size"].min() + agg["median"] / agg["median"].min()
+        agg["interval"] = interval
+        rows.append(agg.reset_index())
+    scored = pd.concat(rows)
+    ranking = scored.groupby(by)["score"].mean().sort_values()
+    best, runner = ranking.index[0], ranking.index[1] if len(ranking) > 1 else None
+    tie = False
+    if runner is not None:
+        b, r = scored[scored[by] == best], scored[scored[by] == runner]
+        tie = bool(
+            ((r["median"].to_numpy() - b["median"].to_numpy()) < b["iqr"].to_numpy()).all()
+            and (abs(r["size"].to_numpy() / b["size"].to_numpy() - 1) < 0.02).all()
+        )
+    return best, runner, tie
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare parquet codecs/row-group sizes on synthetic lake data")
+    ap.add_argument("--symbols", type=int, default=len(SYMBOLS), help="number of symbols (max 7)")
+    ap.add_argument("--years", type=float, default=2)
+    ap.add_argument("--intervals", default="1d,1h")
+    ap.add_argument("--codecs", default="zstd,snappy,lz4")
+    ap.add_argument("--row-groups", default="4096,16384,131072")
+    ap.add_argument("--repeat", type=int, default=15, help="timed rounds per setting (median, p25-p75)")
+    ap.add_argument("--write-repeat", type=int, default=3, help="rounds that also rewrite the lake")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", default="", help="optional path to save raw results")
+    args = ap.parse_args()
+
+    symbols = SYMBOLS[: args.symbols]
+    codecs = [c.strip() for c in args.codecs.split(",") if c.strip()]
+    row_groups = [int(r) for r in args.row_groups.split(",") if r.strip()]
+
+    results = []
+    for interval in [i.strip() for i in args.intervals.split(",") if i.strip()]:
+        frames = [make_candles(sym, interval, args.years) for sym in symbols]
+        rows = sum(len(f) for f in frames)
+        print(f"\n📊 {interval}: {len(symbols)} symbols x {args.years}y = {rows} rows, "
+              f"{args.repeat} rounds (median [p25-p75] ms)")
+        for res in bench_interval(frames, interval, codecs, row_groups, args.repeat, args.write_repeat, args.seed):
+            results.append(res)
+            print(
+                f"  {res['codec']:>6} rg={res['row_group']:<7} files={res['files']:<5} "
+                f"lake={res['lake_bytes'] / 1024:8.1f}KB compact={res['compact_bytes'] / 1024:8.1f}KB "
+                f"write={_fmt(res['write_ms'])} range={_fmt(res['lake_range_ms'])} "
+                f"compact range={_fmt(res['compact_range_ms'])}"
+            )
+
+    table = pd.DataFrame(results)
+    codec, runner, tie = pick(table, "codec", "lake_bytes", "lake_range_ms")
+    print(f"\n🏆 Codec (lake size + range scan): {codec}"
+          + (f" (tie with {runner} within p25-p75 noise)" if tie else f" (runner-up {runner})"))
+    row_group, runner, tie = pick(table[table["codec"] == codec], "row_group", "compact_bytes", "compact_range_ms")
+    print(f"🏆 Row group (compacted files only): {row_group}"
+          + (f" (tie with {runner} within p25-p75 noise)" if tie else f" (runner-up {runner})"))
+
+    if args.json:
+        best = {"codec": codec, "row_group": int(row_group)}
+        pathlib.Path(args.json).write_text(json.dumps({"results": results, "best": best}, indent=2, default=int))
+        print(f"💾 Saved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
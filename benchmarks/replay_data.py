@@ -0,0 +1,77 @@
+"""Gera ou grava os arquivos servidos pelo ReplayProvider.
+
+Layout: `{root}/{interval}/{SYMBOL}.parquet` no schema compacto do lake.
+
+Uso:
+    # N símbolos sintéticos (os 7 padrão e depois S0007, S0008, ...)
+    python -m benchmarks.replay_data synthetic --root ./data/replay --symbols 500 --years 2
+    # Barras reais do yfinance, para replays repetíveis
+    python -m benchmarks.replay_data record --root ./data/replay --symbols AAPL,MSFT --period 2y
+
+Depois: MARKET_DATA_PROVIDER=replay://./data/replay ou `--provider replay://./data/replay` nos jobs.
+"""
+import argparse
+import time
+
+from app.lake.schema import to_arrow
+from app.market.providers import YFinanceProvider, replay_path
+from benchmarks.fixtures import SYMBOLS, make_candles
+
+import pyarrow.parquet as pq
+
+# yfinance só fornece barras de 1h dos últimos 730 dias
+RECORD_PERIOD_1H = "730d"
+
+
+def synthetic_symbols(n: int):
+    return SYMBOLS[:n] + [f"S{i:04d}" for i in range(len(SYMBOLS), n)]
+
+
+def write_replay(df, root, interval: str, symbol: str) -> int:
+    path = replay_path(root, interval, symbol)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(to_arrow(df), path, compression="lz4")
+    return path.stat().st_size
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    syn = sub.add_parser("synthetic", help="write synthetic bars")
+    syn.add_argument("--root", required=True)
+    syn.add_argument("--symbols", type=int, default=500)
+    syn.add_argument("--years", type=float, default=2)
+    syn.add_argument("--intervals", default="1d,1h")
+
+    rec = sub.add_parser("record", help="record real bars from yfinance")
+    rec.add_argument("--root", required=True)
+    rec.add_argument("--symbols", default="AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA")
+    rec.add_argument("--period", default="2y", help="daily history (1h is capped at 730 days)")
+    rec.add_argument("--intervals", default="1d,1h")
+    args = ap.parse_args()
+
+    intervals = [i.strip() for i in args.intervals.split(",") if i.strip()]
+    t0 = time.perf_counter()
+    files = size = 0
+    if args.command == "synthetic":
+        for i, sym in enumerate(synthetic_symbols(args.symbols)):
+            for interval in intervals:
+                size += write_replay(make_candles(sym, interval, args.years, seed=i), args.root, interval, sym)
+                files += 1
+    else:
+        provider = YFinanceProvider()
+        for sym in [s.strip() for s in args.symbols.split(",") if s.strip()]:
+            for interval in intervals:
+                period = RECORD_PERIOD_1H if interval == "1h" else args.period
+                df = provider.download(sym, interval, period=period)
+                if df.empty:
+                    print(f"⚠️ No data for {sym} {interval}")
+                    continue
+                size += write_replay(df, args.root, interval, sym)
+                files += 1
+    print(f"✅ {files} replay files ({size / 2**20:.1f} MB) in {args.root} in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
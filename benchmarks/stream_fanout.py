@@ -0,0 +1,88 @@
+"""Fan-out do /stream: N clientes SSE, uma escrita no lake, quanto custa entregar.
+
+Sobe a API com uvicorn numa thread (S3 em memória, ver load_test.py), abre N
+assinaturas do mesmo símbolo, grava uma barra nova + a barra corrente
+atualizada e mede o tempo até todos os clientes receberem o evento, além das
+chamadas ao S3 por ciclo de poll (devem independer de N).
+
+Uso:
+    python -m benchmarks.stream_fanout --clients 50 --poll-s 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import pandas as pd
+
+from app.lake.storage import S3Storage
+from app.lake.writer import write_parquet_partitioned
+from benchmarks.load_test import RAW_BUCKET, make_yf_stub, open_client, patched_boto3, patched_yfinance, seed_lake
+
+
+async def subscriber(client, symbol: str, interval: str, ready: asyncio.Event, got: dict, key: int, stop: asyncio.Event):
+    async with client.stream("GET", "/stream", params={"symbols": symbol, "interval": interval, "predictions": "false"}) as r:
+        event = None
+        async for line in r.aiter_lines():
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:") and event == "candles":
+                data = json.loads(line[5:])
+                if data["replaced"]:
+                    got[key] = (time.perf_counter(), len(data["candles"]), len(data["replaced"]))
+                    return
+                ready.set()
+            if stop.is_set():
+                return
+
+
+async def run(args, s3, candles):
+    from app.fastapi_app.main import app, hub
+
+    async with open_client(app, "uvicorn", args.clients + 2) as client:
+        ready, stop, got = asyncio.Event(), asyncio.Event(), {}
+        tasks = [
+            asyncio.create_task(subscriber(client, args.symbol, args.interval, ready, got, i, stop))
+            for i in range(args.clients)
+        ]
+        await asyncio.wait_for(ready.wait(), 30)
+        await asyncio.sleep(args.poll_s * 2)
+
+        polls0, calls0 = hub.polls, dict(s3.calls)
+        await asyncio.sleep(args.poll_s * 4)
+        polls, calls = hub.polls - polls0, {k: v - calls0.get(k, 0) for k, v in s3.calls.items()}
+
+        df = candles[(args.symbol, args.interval)]
+        last = df.tail(1).copy()
+        updated = last.assign(close=last["close"] * 1.01)
+        new = last.assign(timestamp=last["timestamp"] + pd.Timedelta(args.interval))
+        t0 = time.perf_counter()
+        write_parquet_partitioned(pd.concat([updated, new]), S3Storage(RAW_BUCKET, client=s3), args.interval, args.symbol)
+        await asyncio.wait_for(asyncio.gather(*tasks), 30)
+        stop.set()
+
+    lat = sorted((t - t0) * 1000 for t, _, _ in got.values())
+    print(f"📡 {args.clients} clients, poll {args.poll_s}s: {polls} polls, S3 calls per poll "
+          + ", ".join(f"{k}={v / max(polls, 1):.1f}" for k, v in sorted(calls.items()) if v))
+    print(f"⏱️ write -> delivered: p50 {lat[len(lat) // 2]:.0f} ms, max {lat[-1]:.0f} ms "
+          f"({next(iter(got.values()))[1]} candles, {next(iter(got.values()))[2]} replaced per event)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--clients", type=int, default=50)
+    ap.add_argument("--symbol", default="AAPL")
+    ap.add_argument("--interval", default="1h", choices=["1h", "1d"])
+    ap.add_argument("--poll-s", type=float, default=0.5)
+    args = ap.parse_args()
+
+    # O hub lê STREAM_POLL_S no import de app.fastapi_app.stream
+    os.environ["STREAM_POLL_S"] = str(args.poll_s)
+    s3, candles = seed_lake([args.symbol], 0.2, 0)
+    with patched_boto3(s3), patched_yfinance(make_yf_stub(candles, 0)):
+        asyncio.run(run(args, s3, candles))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""Suíte de benchmarks dos caminhos quentes: lake, features, treino e API.
+
+Gera fixtures OHLCV sintéticas (1h/1d, símbolos e anos configuráveis), grava
+um lake local e um bucket S3 em memória (LocalS3Client) no layout real e mede
+cada estágio: tempo (melhor de N, por chamada) e pico de memória alocada
+(tracemalloc, em uma execução separada; buffers internos do Arrow não entram).
+
+Uso:
+    python -m benchmarks.suite run --out benchmarks/baselines/main.json
+    python -m benchmarks.suite run --out /tmp/current.json
+    python -m benchmarks.suite compare benchmarks/baselines/main.json /tmp/current.json --threshold 0.2
+
+O compare sai com código 1 se algum estágio regrediu além do limite.
+"""
+import argparse
+import contextlib
+import json
+import os
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.lake.reader import scan_prices
+from app.lake.storage import LocalStorage, S3Storage
+from app.lake.writer import write_parquet_partitioned
+from app.ml.features import add_basic_features, basic_features_fast, make_label, panel_features
+from app.ml.model import DEFAULT_MODEL_CONFIG, to_compact, train_classifier
+from app.ml.trainer import train_symbols
+from benchmarks.fixtures import SYMBOLS, make_candles
+from benchmarks.local_s3 import LocalS3Client, patched_boto3
+
+# Mesmo bucket que a API lê, para o fetch_from_s3 encontrar o lake em memória
+BUCKET = os.getenv("S3_RAW_BUCKET", "fiap-fase3-finance-raw")
+LATEST_LIMIT = 120
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Silencia os prints do código medido (o custo de formatação continua contando)."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+class Fixtures:
+    """Dados e lakes compartilhados pelos estágios (montados uma vez)."""
+
+    def __init__(self, symbols, years: float, workdir: pathlib.Path):
+        self.symbols = symbols
+        self.years = years
+        self.frames = {
+            iv: {s: make_candles(s, iv, years, seed=i) for i, s in enumerate(symbols)} for iv in ("1d", "1h")
+        }
+        self.lake_dir = workdir / "lake"
+        self.s3 = LocalS3Client()
+        local, remote = LocalStorage(self.lake_dir), S3Storage(BUCKET, client=self.s3)
+        with _quiet():
+            for iv, frames in self.frames.items():
+                for sym, df in frames.items():
+                    write_parquet_partitioned(df, local, iv, sym)
+                    write_parquet_partitioned(df, remote, iv, sym)
+        self.workdir = workdir
+
+        first = symbols[0]
+        self.series_1h = self.frames["1h"][first][["timestamp", "close"]].copy()
+        self.series_1h["close"] = self.series_1h["close"].astype("float64")
+        self.panel_1d = scan_prices(self.lake_dir, "1d", columns=["timestamp", "close", "symbol"])
+        self.window = self.frames["1h"][first].tail(LATEST_LIMIT)
+
+        train = make_label(add_basic_features(self.frames["1d"][first]))
+        self.compact = to_compact(train_classifier(train, random_state=0))
+        self.score_rows = basic_features_fast(self.frames["1d"][first])
+
+    def rows(self, interval: str) -> int:
+        return sum(len(df) for df in self.frames[interval].values())
+
+
+# ==================== ESTÁGIOS ====================
+# Cada estágio recebe as fixtures e devolve (função sem argumentos, linhas processadas).
+
+
+def stage_write_parquet(interval: str):
+    def build(fx: Fixtures):
+        def run():
+            with tempfile.TemporaryDirectory(dir=fx.workdir) as tmp, _quiet():
+                storage = LocalStorage(tmp)
+                for sym, df in fx.frames[interval].items():
+                    write_parquet_partitioned(df, storage, interval, sym)
+
+        return run, fx.rows(interval)
+
+    return build
+
+
+def stage_scan_prices(interval: str):
+    def build(fx: Fixtures):
+        return (lambda: scan_prices(fx.lake_dir, interval)), fx.rows(interval)
+
+    return build
+
+
+def stage_fetch_from_s3(interval: str):
+    def build(fx: Fixtures):
+        from app.fastapi_app import main as api
+
+        symbol = fx.symbols[0]
+
+        def run():
+            with patched_boto3(fx.s3), _quiet():
+                df = api.fetch_from_s3(symbol, interval, LATEST_LIMIT)
+            if df is None or df.empty:
+                raise RuntimeError(f"fetch_from_s3 returned no data for {symbol} {interval}")
+
+        return run, LATEST_LIMIT
+
+    return build
+
+
+def build_features_reference(fx: Fixtures):
+    return (lambda: make_label(add_basic_features(fx.series_1h))), len(fx.series_1h)
+
+
+def build_features_kernel(fx: Fixtures):
+    return (lambda: basic_features_fast(fx.series_1h, horizon=1)), len(fx.series_1h)
+
+
+def build_features_panel(fx: Fixtures):
+    return (lambda: panel_features(fx.panel_1d, horizon=DEFAULT_MODEL_CONFIG["horizon"])), len(fx.panel_1d)
+
+
+def build_train_symbols(fx: Fixtures):
+    models_dir = str(fx.workdir / "models")
+
+    def run():
+        with _quiet():
+            train_symbols(fx.panel_1d, fx.symbols, models_dir, dry_run=True, workers=1, mode="full")
+
+    return run, len(fx.panel_1d)
+
+
+def build_serialize_latest(fx: Fixtures):
+    from app.fastapi_app.main import serialize_candles
+
+    return (lambda: serialize_candles(fx.window)), len(fx.window)
+
+
+def build_compact_score(fx: Fixtures):
+    return (lambda: fx.compact.predict_proba_up(fx.score_rows)), len(fx.score_rows)
+
+
+STAGES = {
+    "write_parquet_1d": stage_write_parquet("1d"),
+    "write_parquet_1h": stage_write_parquet("1h"),
+    "scan_prices_1d": stage_scan_prices("1d"),
+    "scan_prices_1h": stage_scan_prices("1h"),
+    "fetch_from_s3_1d": stage_fetch_from_s3("1d"),
+    "fetch_from_s3_1h": stage_fetch_from_s3("1h"),
+    "features_reference_1h": build_features_reference,
+    "features_kernel_1h": build_features_kernel,
+    "features_panel_1d": build_features_panel,
+    "train_symbols_1d": build_train_symbols,
+    "serialize_latest": build_serialize_latest,
+    "compact_score_1d": build_compact_score,
+}
+
+
+# ==================== EXECUÇÃO ====================
+
+
+def measure(fn, repeat: int) -> dict:
+    fn()  # aquecimento: imports tardios, caches do pandas/pyarrow
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"time_ms": best * 1000, "peak_mb": peak / 2**20}
+
+
+def run_suite(symbols, years: float, repeat: int, only=None) -> dict:
+    names = [n for n in STAGES if not only or n in only]
+    unknown = set(only or []) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-suite-") as tmp:
+        t0 = time.perf_counter()
+        fx = Fixtures(symbols, years, pathlib.Path(tmp))
+        print(f"🧪 Fixtures ready in {time.perf_counter() - t0:.2f}s ({fx.rows('1d')} 1d rows, {fx.rows('1h')} 1h rows)")
+        for name in names:
+            fn, rows = STAGES[name](fx)
+            res = measure(fn, repeat)
+            res["rows"] = rows
+            results[name] = res
+            print(f"⏱️ {name:<24} {res['time_ms']:>10.2f} ms {res['peak_mb']:>9.2f} MB  ({rows} rows)")
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "params": {"symbols": len(symbols), "years": years, "repeat": repeat},
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "stages": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float, mem_threshold: float, min_delta_ms: float) -> list:
+    """Lista de regressões: estágios mais lentos/maiores que o baseline além do limite."""
+    if baseline["meta"]["params"] != current["meta"]["params"]:
+        print(f"⚠️ Fixture params differ: {baseline['meta']['params']} vs {current['meta']['params']}")
+
+    regressions = []
+    print(f"{'stage':<24} {'base ms':>10} {'cur ms':>10} {'Δ time':>8} {'base MB':>9} {'cur MB':>9} {'Δ mem':>8}")
+    for name, cur in current["stages"].items():
+        base = baseline["stages"].get(name)
+        if base is None:
+            print(f"{name:<24} {'(new)':>10} {cur['time_ms']:>10.2f}")
+            continue
+        dt = cur["time_ms"] / base["time_ms"] - 1 if base["time_ms"] else 0.0
+        dm = cur["peak_mb"] / base["peak_mb"] - 1 if base["peak_mb"] else 0.0
+        flags = []
+        # Estágios de poucos ms oscilam mais que o limite relativo: exige também delta absoluto
+        if dt > threshold and cur["time_ms"] - base["time_ms"] > min_delta_ms:
+            flags.append("time")
+        if dm > mem_threshold:
+            flags.append("memory")
+        mark = "❌ " + "+".join(flags) if flags else ""
+        print(
+            f"{name:<24} {base['time_ms']:>10.2f} {cur['time_ms']:>10.2f} {dt:>+8.1%} "
+            f"{base['peak_mb']:>9.2f} {cur['peak_mb']:>9.2f} {dm:>+8.1%} {mark}"
+        )
+        if flags:
+            regressions.append({"stage": name, "kind": flags, "time_change": dt, "memory_change": dm})
+    for name in baseline["stages"].keys() - current["stages"].keys():
+        print(f"{name:<24} (missing from current run)")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run the suite and write a JSON result")
+    run.add_argument("--symbols", type=int, default=len(SYMBOLS))
+    run.add_argument("--years", type=float, default=2)
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--only", default="", help="comma separated stage names")
+    run.add_argument("--out", default="benchmarks/baselines/baseline.json")
+
+    cmp_ = sub.add_parser("compare", help="compare a run against a baseline")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+    cmp_.add_argument("--threshold", type=float, default=0.2, help="relative time regression (0.2 = 20%%)")
+    cmp_.add_argument("--mem-threshold", type=float, default=None, help="relative memory regression (default: --threshold)")
+    cmp_.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore time changes smaller than this")
+
+    sub.add_parser("list", help="list stage names")
+    args = ap.parse_args()
+
+    if args.command == "list":
+        print("\n".join(STAGES))
+        return
+
+    if args.command == "run":
+        symbols = (SYMBOLS * (args.symbols // len(SYMBOLS) + 1))[: args.symbols]
+        # Mais símbolos que a lista base: sufixo numérico mantém nomes únicos
+        symbols = [s if i < len(SYMBOLS) else f"{s}{i // len(SYMBOLS)}" for i, s in enumerate(symbols)]
+        only = [s.strip() for s in args.only.split(",") if s.strip()]
+        result = run_suite(symbols, args.years, args.repeat, only)
+        out = pathlib.Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(result, indent=2))
+        print(f"💾 Results written to {out}")
+        return
+
+    baseline = json.loads(pathlib.Path(args.baseline).read_text())
+    current = json.loads(pathlib.Path(args.current).read_text())
+    mem_threshold = args.threshold if args.mem_threshold is None else args.mem_threshold
+    regressions = compare(baseline, current, args.threshold, mem_threshold, args.min_delta_ms)
+    if regressions:
+        raise SystemExit(f"❌ {len(regressions)} stage(s) regressed beyond the threshold")
+    print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
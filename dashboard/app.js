@@ -1,8 +1,16 @@
 // API Configuration - should be set via environment variable in production
 const API_BASE = window.API_BASE || "https://d8sxgxjgl9.execute-api.us-east-2.amazonaws.com";
 
+// Live updates: SSE (/stream) when the API runs on a long-lived server; otherwise
+// (e.g. behind API Gateway, where /stream answers 501) fall back to polling /latest
+const STREAM_ENABLED = window.STREAM_ENABLED !== false;
+const REFRESH_MS = window.REFRESH_MS || 60000;
+const CHART_LIMIT = 120;
+
 let currentSymbol = null;
 let currentData = null;
+let stream = null;
+let refreshTimer = null;
 
 // Utility functions
 function showLoading(show = true) {
@@ -44,9 +52,11 @@ async function fetchSymbols() {
   }
 }
 
-async function fetchLatest(symbol, interval = "1h", limit = 120) {
+async function fetchLatest(symbol, interval = "1h", limit = 120, cursor = null) {
   try {
-    const res = await fetch(`${API_BASE}/latest?symbol=${symbol}&interval=${interval}&limit=${limit}`);
+    // With a cursor (next_cursor of the previous call) only new/updated candles come back
+    const delta = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+    const res = await fetch(`${API_BASE}/latest?symbol=${symbol}&interval=${interval}&limit=${limit}${delta}`);
     const data = await res.json();
     return data;
   } catch (error) {
@@ -278,7 +288,7 @@ function renderPrediction(pred, symbol) {
           </div>
           <div class="flex justify-between">
             <span class="text-slate-400">Generated:</span>
-            <span class="text-white">${prediction.asof || new Date().toLocaleString()}</span>
+            <span class="text-white">${pred.asof || new Date().toLocaleString()}</span>
           </div>
         </div>
       </div>
@@ -288,6 +298,81 @@ function renderPrediction(pred, symbol) {
   lucide.createIcons();
 }
 
+// Live updates
+function mergeCandles(candles) {
+  // Upsert by timestamp: new bars are appended, the still-forming bar is replaced
+  const byTs = new Map(currentData.candles.map(c => [c.timestamp, c]));
+  candles.forEach(c => byTs.set(c.timestamp, c));
+  currentData.candles = Array.from(byTs.values())
+    .sort((a, b) => a.timestamp.localeCompare(b.timestamp))
+    .slice(-CHART_LIMIT);
+  renderChart(currentData);
+}
+
+function closeStream() {
+  if (stream) {
+    stream.close();
+    stream = null;
+  }
+  if (refreshTimer) {
+    clearInterval(refreshTimer);
+    refreshTimer = null;
+  }
+}
+
+function startPolling(symbol, interval) {
+  let cursor = currentData?.next_cursor || null;
+  let busy = false;
+  refreshTimer = setInterval(async () => {
+    if (busy) return;
+    busy = true;
+    try {
+      // has_more: more than CHART_LIMIT bars after the cursor, keep paging right away
+      let data;
+      do {
+        data = await fetchLatest(symbol, interval, CHART_LIMIT, cursor);
+        if (!data || !data.candles || symbol !== currentSymbol) return;
+        cursor = data.next_cursor || cursor;
+        if (!currentData?.candles) {
+          currentData = data;
+          renderChart(data);
+        } else if (data.candles.length) {
+          mergeCandles(data.candles);
+        }
+      } while (data.has_more);
+    } finally {
+      busy = false;
+    }
+  }, REFRESH_MS);
+}
+
+function subscribe(symbol, interval) {
+  closeStream();
+  if (!STREAM_ENABLED || !window.EventSource) {
+    startPolling(symbol, interval);
+    return;
+  }
+
+  stream = new EventSource(`${API_BASE}/stream?symbols=${symbol}&interval=${interval}`);
+  stream.addEventListener('candles', (e) => {
+    const data = JSON.parse(e.data);
+    if (data.symbol !== currentSymbol || data.interval !== interval || !currentData?.candles) return;
+    mergeCandles(data.candles);
+  });
+  stream.addEventListener('prediction', (e) => {
+    const pred = JSON.parse(e.data);
+    if (pred.symbol === currentSymbol) renderPrediction(pred, pred.symbol);
+  });
+  stream.onerror = () => {
+    // CONNECTING = the browser retries on its own; CLOSED = endpoint unavailable
+    if (stream && stream.readyState === EventSource.CLOSED) {
+      showNotification('Live stream unavailable, polling instead', 'info');
+      closeStream();
+      startPolling(symbol, interval);
+    }
+  };
+}
+
 // Main functions
 async function loadData() {
   const symbolSelect = document.getElementById('symbolSelect');
@@ -304,10 +389,12 @@ async function loadData() {
   showLoading(true);
   
   try {
-    const data = await fetchLatest(currentSymbol, interval, 120);
+    const data = await fetchLatest(currentSymbol, interval, CHART_LIMIT);
     currentData = data;
     
     renderChart(data);
+    // From here on only new/updated candles arrive (stream or polling)
+    subscribe(currentSymbol, interval);
     showNotification('Data loaded successfully', 'success');
   } catch (error) {
     console.error('Error loading data:', error);
@@ -7,4 +7,8 @@ window.API_BASE = "https://your-api-gateway-url.execute-api.region.amazonaws.com
 window.ENVIRONMENT = "production"; // or "development", "staging"
 
 // Optional: Debug mode
-window.DEBUG_MODE = false;
\ No newline at end of file
+window.DEBUG_MODE = false;
+
+// Optional: live updates via SSE (/stream); set false to always poll /latest
+window.STREAM_ENABLED = true;
+window.REFRESH_MS = 60000;
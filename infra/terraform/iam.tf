@@ -23,7 +23,7 @@ resource "aws_iam_policy" "lambda_s3_rw" {
     Version = "2012-10-17",
     Statement = [{
       Effect = "Allow",
-      Action = ["s3:GetObject", "s3:PutObject", "s3:ListBucket"],
+      Action = ["s3:GetObject", "s3:PutObject", "s3:DeleteObject", "s3:ListBucket"],
       Resource = [
         "arn:aws:s3:::fiap-fase3-finance-raw",
         "arn:aws:s3:::fiap-fase3-finance-raw/*",
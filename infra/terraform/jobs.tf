@@ -19,6 +19,20 @@ resource "aws_lambda_function" "job" {
   }
 }
 
+# Fan-out: o job em modo coordenador invoca a própria função por shard
+resource "aws_iam_role_policy" "job_self_invoke" {
+  name = "${var.prefix}-job-self-invoke"
+  role = aws_iam_role.lambda_exec.id
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [{
+      Effect   = "Allow",
+      Action   = ["lambda:InvokeFunction"],
+      Resource = aws_lambda_function.job.arn
+    }]
+  })
+}
+
 # Schedules
 resource "aws_cloudwatch_event_rule" "ingest_1h" {
   name                = "${var.prefix}-ingest-1h"
@@ -29,7 +43,7 @@ resource "aws_cloudwatch_event_target" "ingest_1h" {
   rule      = aws_cloudwatch_event_rule.ingest_1h.name
   target_id = "lambda-job-ingest-1h"
   arn       = aws_lambda_function.job.arn
-  input     = jsonencode({ JOB_NAME = "ingest_1h" })
+  input     = jsonencode({ JOB_NAME = "ingest_1h", shards = var.job_shards })
 }
 
 resource "aws_lambda_permission" "allow_events_ingest1h" {
@@ -50,7 +64,7 @@ resource "aws_cloudwatch_event_target" "ingest_1d" {
   rule      = aws_cloudwatch_event_rule.ingest_1d.name
   target_id = "lambda-job-ingest-1d"
   arn       = aws_lambda_function.job.arn
-  input     = jsonencode({ JOB_NAME = "ingest_1d" })
+  input     = jsonencode({ JOB_NAME = "ingest_1d", shards = var.job_shards })
 }
 
 resource "aws_lambda_permission" "allow_events_ingest1d" {
@@ -61,6 +75,27 @@ resource "aws_lambda_permission" "allow_events_ingest1d" {
   source_arn    = aws_cloudwatch_event_rule.ingest_1d.arn
 }
 
+resource "aws_cloudwatch_event_rule" "repair_gaps" {
+  name                = "${var.prefix}-repair-gaps"
+  schedule_expression = "cron(15 0 * * ? *)" # 00:15 UTC diariamente, antes do treino
+  description         = "Fill missing sessions left by failed incremental runs"
+}
+
+resource "aws_cloudwatch_event_target" "repair_gaps" {
+  rule      = aws_cloudwatch_event_rule.repair_gaps.name
+  target_id = "lambda-job-repair-gaps"
+  arn       = aws_lambda_function.job.arn
+  input     = jsonencode({ JOB_NAME = "repair_gaps", shards = var.job_shards })
+}
+
+resource "aws_lambda_permission" "allow_events_repair_gaps" {
+  statement_id  = "AllowEventInvokeRepairGaps"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.job.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.repair_gaps.arn
+}
+
 resource "aws_cloudwatch_event_rule" "train_daily" {
   name                = "${var.prefix}-train-daily"
   schedule_expression = "cron(30 0 * * ? *)" # 00:30 UTC diariamente
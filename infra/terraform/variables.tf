@@ -9,3 +9,9 @@ variable "prefix" {
   type        = string
   default     = "fiap-fase3"
 }
+
+variable "job_shards" {
+  description = "Parallel symbol shards for ingest/repair jobs (1 = single invocation)"
+  type        = number
+  default     = 1
+}
@@ -0,0 +1,91 @@
+"""Backtest walk-forward: sinais, métricas e ausência de look-ahead."""
+import numpy as np
+import pytest
+
+from app.ml.backtest import max_drawdown, parse_thresholds, run_backtest, summarize, walk_forward_probs
+from app.ml.features import add_basic_features, make_label
+from app.ml.scorer import positions_from_probs, signal_from_prob
+from benchmarks.fixtures import make_candles
+
+
+def daily(symbol="AAPL", years=1.5, seed=0):
+    frame = make_candles(symbol, "1d", years=years, seed=seed)[["timestamp", "close", "symbol"]]
+    return frame.assign(close=frame["close"].astype("float64"))
+
+
+def test_positions_match_signal_from_prob():
+    probs = np.array([0.0, 0.4, 0.45, 0.5, 0.59, 0.6, 1.0, np.nan])
+    sides = {"buy": 1.0, "sell": -1.0, "hold": 0.0}
+
+    expected = [sides[signal_from_prob(p, 0.6, 0.4)] for p in probs[:-1]] + [0.0]
+    np.testing.assert_array_equal(positions_from_probs(probs, 0.6, 0.4), expected)
+    np.testing.assert_array_equal(positions_from_probs(probs, 0.6, 0.4, long_only=True), np.maximum(expected, 0.0))
+
+
+def test_summarize_hand_computed_metrics():
+    pos = np.array([1.0, 1.0, 0.0, -1.0])
+    fwd = np.array([0.01, -0.02, 0.03, -0.01])
+
+    metrics, pnl = summarize(pos, fwd, cost_bps=10)
+
+    # Giro 1, 0, 1, 1: cada troca de posição paga 10 bps
+    np.testing.assert_allclose(pnl, [0.009, -0.02, -0.001, 0.009])
+    assert metrics["days"] == 4
+    assert metrics["trades"] == 3
+    assert metrics["exposure"] == pytest.approx(0.75)
+    assert metrics["hit_rate"] == pytest.approx(2 / 3)
+    assert metrics["turnover"] == pytest.approx(0.75)
+    assert metrics["total_return"] == pytest.approx(np.prod(1 + pnl) - 1)
+    assert metrics["buy_and_hold_return"] == pytest.approx(np.prod(1 + fwd) - 1)
+    assert metrics["max_drawdown"] == pytest.approx(0.98 * 0.999 - 1)  # pico após o 1º dia, vale no 3º
+
+
+def test_summarize_flat_strategy():
+    metrics, pnl = summarize(np.zeros(5), np.full(5, 0.01))
+
+    assert not pnl.any()
+    assert metrics["trades"] == 0 and metrics["hit_rate"] is None
+    assert metrics["sharpe"] == 0.0 and metrics["max_drawdown"] == 0.0
+
+
+def test_max_drawdown_from_running_peak():
+    assert max_drawdown(np.array([0.1, -0.5, 0.2])) == pytest.approx(-0.5)
+    assert max_drawdown(np.array([0.01, 0.02])) == 0.0
+    assert max_drawdown(np.array([])) == 0.0
+
+
+def test_parse_thresholds():
+    assert parse_thresholds("0.6:0.4,0.55:0.45") == [(0.6, 0.4), (0.55, 0.45)]
+
+
+def test_walk_forward_has_no_look_ahead():
+    frame = daily()
+    cut = len(frame) - 80
+    shocked = frame.copy()
+    shocked.loc[cut:, "close"] *= np.random.default_rng(1).uniform(0.8, 1.2, len(frame) - cut)
+
+    d, d_shocked = (make_label(add_basic_features(f)) for f in (frame, shocked))
+    probs = walk_forward_probs(d, train_days=120, step=10)
+    probs_shocked = walk_forward_probs(d_shocked, train_days=120, step=10)
+
+    assert np.isnan(probs[:120]).all() and not np.isnan(probs[120:]).any()
+    # Linha k-1 é a última cujo label (close de k) ainda não mudou
+    k = int(np.searchsorted(d["timestamp"].to_numpy(), frame["timestamp"].to_numpy()[cut]))
+    np.testing.assert_array_equal(probs[:k - 1], probs_shocked[:k - 1])
+    assert not np.allclose(probs[k:], probs_shocked[k:])
+
+
+def test_run_backtest_reports_symbols_and_portfolio():
+    frames = {"AAPL": daily("AAPL", seed=0), "MSFT": daily("MSFT", seed=1), "NEW": daily("NEW", years=0.3, seed=2)}
+
+    report = run_backtest(frames, train_days=120, step=21, thresholds=[(0.6, 0.4), (0.55, 0.45)])
+
+    assert report["symbols"]["NEW"]["status"] == "insufficient_data"
+    for sym in ("AAPL", "MSFT"):
+        by_threshold = report["symbols"][sym]
+        assert set(by_threshold) == {"0.6/0.4", "0.55/0.45"}
+        # As probabilidades são as mesmas para todos os limiares
+        assert by_threshold["0.6/0.4"]["days"] == by_threshold["0.55/0.45"]["days"]
+        assert by_threshold["0.55/0.45"]["exposure"] >= by_threshold["0.6/0.4"]["exposure"]
+    assert set(report["portfolio"]) == {"0.6/0.4", "0.55/0.45"}
+    assert report["portfolio"]["0.6/0.4"]["days"] == report["symbols"]["AAPL"]["0.6/0.4"]["days"]
@@ -0,0 +1,35 @@
+"""Fan-out em shards: falha de um shard não derruba o resultado dos outros."""
+import io
+import json
+
+from app.jobs.fanout import LambdaInvoker, aggregate, split_shards
+
+
+class FlakyLambda:
+    """Cliente Lambda falso: o shard com `fail` no evento estoura como um timeout do boto3."""
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        event = json.loads(Payload)
+        if event.get("fail"):
+            raise TimeoutError("Read timeout on endpoint URL")
+        body = {"symbols_processed": len(event["symbols"].split(","))}
+        return {"Payload": io.BytesIO(json.dumps({"statusCode": 200, "body": body}).encode())}
+
+
+def test_split_shards_is_balanced_and_complete():
+    shards = split_shards(list("ABCDEFG"), 3)
+    assert shards == [["A", "B", "C"], ["D", "E"], ["F", "G"]]
+    assert split_shards(["A"], 4) == [["A"]]
+
+
+def test_failed_shard_is_reported_without_losing_the_others():
+    shard_symbols = [["AAPL", "MSFT"], ["NVDA"], ["TSLA", "META"]]
+    events = [{"symbols": ",".join(s), "fail": i == 1} for i, s in enumerate(shard_symbols)]
+
+    results = LambdaInvoker("jobs", client=FlakyLambda()).invoke_all(events)
+    report = aggregate("ingest_1d", shard_symbols, results, elapsed=1.0)
+
+    assert report["statusCode"] == 500
+    assert [f["shard"] for f in report["body"]["failed_shards"]] == [1]
+    assert "TimeoutError" in report["body"]["failed_shards"][0]["error"]
+    assert report["body"]["symbols_processed"] == 4
@@ -0,0 +1,129 @@
+"""Kernel NumPy, modo painel e motor incremental contra a referência pandas."""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.features import (
+    FEATURE_COLUMNS, add_basic_features, basic_features_fast, make_label, panel_features, split_panel,
+)
+from app.ml.streaming import RESYNC_EVERY, StreamingFeatures
+from benchmarks.fixtures import make_candles
+
+FEATURES = [c for c in FEATURE_COLUMNS if not c.startswith("sma")] + ["sma5", "sma10", "sma20"]
+
+
+def reference(frame: pd.DataFrame, horizon: int = None) -> pd.DataFrame:
+    out = add_basic_features(frame)
+    return make_label(out, horizon) if horizon is not None else out
+
+
+def assert_features_close(actual: pd.DataFrame, expected: pd.DataFrame, rtol=1e-7, atol=1e-12):
+    assert list(actual["timestamp"]) == list(expected["timestamp"])
+    for name in FEATURES:
+        np.testing.assert_allclose(
+            actual[name].to_numpy(), expected[name].to_numpy(), rtol=rtol, atol=atol, err_msg=name
+        )
+
+
+@pytest.mark.parametrize("horizon", [None, 1, 5])
+def test_panel_matches_per_symbol_reference_across_price_scales(horizon):
+    # Níveis de preço muito diferentes: o retorno na fronteira entre símbolos seria ~3e5
+    scales = {"AAPL": 600_000.0, "MSFT": 2.0, "NVDA": 600_000.0}
+    frames = {
+        sym: make_candles(sym, "1h", years=0.5, seed=i).assign(
+            close=lambda d, k=k: d["close"].astype("float64") / 100 * k
+        )
+        for i, (sym, k) in enumerate(scales.items())
+    }
+    long = pd.concat([f[["timestamp", "close", "symbol"]] for f in frames.values()], ignore_index=True)
+
+    panel = split_panel(panel_features(long, horizon=horizon))
+
+    assert set(panel) == set(scales)
+    for sym, frame in frames.items():
+        expected = reference(frame[["timestamp", "close", "symbol"]].reset_index(drop=True), horizon)
+        assert_features_close(panel[sym], expected)
+        if horizon is not None:
+            np.testing.assert_array_equal(panel[sym]["label"].to_numpy(), expected["label"].to_numpy())
+
+
+def test_panel_drops_warmup_rows_of_each_symbol():
+    frames = [make_candles(sym, "1d", years=0.2, seed=i) for i, sym in enumerate(["AAPL", "MSFT"])]
+    long = pd.concat([f[["timestamp", "close", "symbol"]] for f in frames], ignore_index=True)
+
+    panel = split_panel(panel_features(long))
+
+    for frame in frames:
+        sym = str(frame["symbol"].iloc[0])
+        assert len(panel[sym]) == len(reference(frame))
+
+
+@pytest.mark.parametrize("horizon", [None, 1, 5])
+@pytest.mark.parametrize("interval,years", [("1d", 3), ("1h", 0.5)])
+def test_fast_kernel_matches_pandas_reference(interval, years, horizon):
+    frame = make_candles("AAPL", interval, years=years, seed=3)
+    frame["close"] = frame["close"].astype("float64")
+
+    fast = basic_features_fast(frame, horizon=horizon)
+    expected = reference(frame, horizon)
+
+    assert list(fast.index) == list(expected.index)
+    assert_features_close(fast, expected)
+    if horizon is not None:
+        np.testing.assert_array_equal(fast["label"].to_numpy(), expected["label"].to_numpy())
+        np.testing.assert_allclose(fast[f"close_t{horizon}"], expected[f"close_t{horizon}"])
+
+
+def test_fast_kernel_float32_output_stays_close():
+    frame = make_candles("AAPL", "1h", years=0.5, seed=4)
+    frame["close"] = frame["close"].astype("float64")
+
+    fast = basic_features_fast(frame, dtype=np.float32)
+
+    assert fast["sma20"].dtype == np.float32
+    # Retornos perto de zero: em float32 o erro é absoluto (~1e-7), não relativo
+    assert_features_close(fast, reference(frame), rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize("rows", [0, 5, 20, 21])
+def test_fast_kernel_short_series(rows):
+    frame = make_candles("AAPL", "1d", years=1, seed=5).head(rows)
+    frame["close"] = frame["close"].astype("float64")
+
+    fast = basic_features_fast(frame, horizon=1)
+
+    assert len(fast) == len(reference(frame, 1))
+
+
+def test_streaming_engine_matches_pandas_reference():
+    # Mais de RESYNC_EVERY barras: cobre também a recomputação periódica das somas
+    frame = make_candles("AAPL", "1h", years=1.5, seed=6)
+    frame["close"] = frame["close"].astype("float64")
+    assert len(frame) > 2 * RESYNC_EVERY
+
+    streamed = StreamingFeatures().update_frame(frame)
+
+    assert_features_close(streamed, reference(frame).reset_index(drop=True))
+
+
+def test_streaming_state_survives_json_round_trip():
+    frame = make_candles("AAPL", "1d", years=1, seed=7)
+    frame["close"] = frame["close"].astype("float64")
+    head, tail = frame.iloc[:100], frame.iloc[100:]
+
+    engine = StreamingFeatures()
+    engine.update_frame(head)
+    resumed = StreamingFeatures.from_dict(json.loads(json.dumps(engine.to_dict())))
+
+    expected = reference(frame)
+    expected = expected[expected["timestamp"] >= tail["timestamp"].iloc[0]].reset_index(drop=True)
+    assert_features_close(resumed.update_frame(tail), expected)
+
+
+def test_streaming_rejects_bars_out_of_order():
+    engine = StreamingFeatures()
+    engine.update("2025-09-02T14:00:00Z", 100.0)
+    with pytest.raises(ValueError):
+        engine.update("2025-09-02T14:00:00Z", 101.0)
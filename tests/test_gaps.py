@@ -0,0 +1,115 @@
+"""Detecção de lacunas e marcador de pregões já buscados (app.lake.gaps, repair_gaps)."""
+import pathlib
+import subprocess
+import sys
+
+import pandas as pd
+
+from app.lake.calendar import calendar_version, trading_sessions
+from app.lake.gaps import find_gaps, read_checked_sessions, record_checked_sessions
+from app.lake.storage import LocalStorage
+from app.lake.writer import write_parquet_partitioned
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+def test_calendar_version_is_stable_across_processes():
+    other = subprocess.run(
+        [sys.executable, "-c", "from app.lake.calendar import calendar_version; print(calendar_version())"],
+        capture_output=True, text=True, check=True, cwd=ROOT,
+    )
+    assert other.stdout.strip() == calendar_version()
+
+
+def test_checked_marker_written_in_another_process_is_accepted(tmp_path):
+    script = (
+        "import pandas as pd\n"
+        "from app.lake.gaps import record_checked_sessions\n"
+        "from app.lake.storage import LocalStorage\n"
+        f"record_checked_sessions(LocalStorage({str(tmp_path)!r}), '1d', 'AAPL',\n"
+        "    pd.to_datetime(['2025-09-02', '2025-09-03']), keep_from='2025-01-01')\n"
+    )
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=ROOT)
+
+    checked = read_checked_sessions(LocalStorage(tmp_path), "1d", "AAPL")
+    assert list(checked) == list(pd.to_datetime(["2025-09-02", "2025-09-03"]))
+
+
+def test_checked_marker_from_other_calendar_is_ignored(tmp_path):
+    storage = LocalStorage(tmp_path)
+    record_checked_sessions(storage, "1d", "AAPL", pd.to_datetime(["2025-09-02"]), keep_from="2025-01-01")
+    marker = storage.read_bytes("_state/gaps_checked/prices_1d/symbol=AAPL.json").replace(
+        calendar_version().encode(), b"000000000000"
+    )
+    storage.write_bytes("_state/gaps_checked/prices_1d/symbol=AAPL.json", marker)
+
+    assert read_checked_sessions(storage, "1d", "AAPL").empty
+
+
+def test_repair_does_not_refetch_partially_filled_window(tmp_path, monkeypatch):
+    import app.jobs.repair_gaps as repair_gaps
+
+    calls = []
+
+    def fetch_first_session_only(symbol, interval, start, end):
+        # Provedor devolve só o primeiro pregão da janela; o resto fica faltando
+        calls.append((start, end))
+        return pd.DataFrame({
+            "timestamp": [pd.Timestamp(start).tz_localize("UTC")],
+            "open": [1.0], "high": [1.0], "low": [1.0], "close": [1.0], "volume": [100.0],
+        })
+
+    monkeypatch.setattr(repair_gaps, "fetch_range", fetch_first_session_only)
+    storage = LocalStorage(tmp_path)
+
+    first = repair_gaps.repair_symbols(["AAPL"], storage, "1d", days=20)
+    assert len(calls) == 1 and first["AAPL"][0]["rows"] == 1
+
+    second = repair_gaps.repair_symbols(["AAPL"], storage, "1d", days=20)
+    assert len(calls) == 1
+    assert second == {}
+
+
+def write_sessions(storage, interval, sessions, bars=1):
+    if interval == "1d":
+        ts = [pd.Timestamp(d, tz="UTC") for d in sessions]
+    else:
+        # Barras de 1h a partir da abertura (13:30 UTC no horário de verão de NY)
+        ts = [pd.Timestamp(d, tz="UTC") + pd.Timedelta(hours=13.5 + h) for d in sessions for h in range(bars)]
+    frame = pd.DataFrame({"timestamp": ts, "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": 1})
+    write_parquet_partitioned(frame, storage, interval, "AAPL")
+
+
+def test_trading_sessions_skip_weekends_and_holidays():
+    # 2025-09-01 é Labor Day
+    sessions = trading_sessions("2025-08-29", "2025-09-03")
+    assert list(sessions) == list(pd.to_datetime(["2025-08-29", "2025-09-02", "2025-09-03"]))
+
+
+def test_find_gaps_coalesces_missing_sessions_across_weekends(tmp_path):
+    storage = LocalStorage(tmp_path)
+    sessions = trading_sessions("2025-09-02", "2025-09-30")
+    # Sexta 5 e segunda 8 faltam (uma janela só); quarta 17 sozinha
+    gone = pd.to_datetime(["2025-09-05", "2025-09-08", "2025-09-17"])
+    write_sessions(storage, "1d", sessions.difference(gone))
+
+    gaps = find_gaps(storage, "1d", "AAPL", "2025-09-02", "2025-09-30")
+
+    assert gaps == [
+        (pd.Timestamp("2025-09-05"), pd.Timestamp("2025-09-08")),
+        (pd.Timestamp("2025-09-17"), pd.Timestamp("2025-09-17")),
+    ]
+    assert find_gaps(storage, "1d", "AAPL", "2025-09-02", "2025-09-30", skip=gone[:2]) == [gaps[1]]
+
+
+def test_find_gaps_hourly_flags_sessions_with_too_few_bars(tmp_path):
+    storage = LocalStorage(tmp_path)
+    write_sessions(storage, "1h", pd.to_datetime(["2025-09-02", "2025-09-04"]), bars=7)
+    write_sessions(storage, "1h", pd.to_datetime(["2025-09-03"]), bars=2)
+
+    gaps = find_gaps(storage, "1h", "AAPL", "2025-09-02", "2025-09-05")
+
+    assert gaps == [
+        (pd.Timestamp("2025-09-03"), pd.Timestamp("2025-09-03")),
+        (pd.Timestamp("2025-09-05"), pd.Timestamp("2025-09-05")),
+    ]
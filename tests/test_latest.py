@@ -0,0 +1,93 @@
+"""/latest em modo delta: cursor, paginação e barra em formação."""
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.fastapi_app.main import app, decode_cursor, encode_cursor
+from app.lake.storage import S3Storage
+from app.lake.writer import write_parquet_partitioned
+from benchmarks.load_test import RAW_BUCKET, make_yf_stub, patched_boto3, patched_yfinance, seed_lake
+
+
+@pytest.fixture
+def lake():
+    s3, candles = seed_lake(["AAPL"], 0.2, 0)
+    with patched_boto3(s3), patched_yfinance(make_yf_stub(candles, 0)), TestClient(app) as client:
+        yield client, s3, candles[("AAPL", "1h")]
+
+
+def get(client, **params):
+    r = client.get("/latest", params={"symbol": "AAPL", "interval": "1h", **params})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def stamps(body):
+    return [c["timestamp"] for c in body["candles"]]
+
+
+def test_cursor_round_trip():
+    ts = pd.Timestamp("2025-10-01T20:30:00Z")
+    cursor = encode_cursor(ts, True)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (ts, True)
+    # Sem fuso é tratado como UTC
+    assert decode_cursor(encode_cursor(pd.Timestamp("2025-10-01 20:30"), False)) == (ts, False)
+
+
+def test_invalid_since_or_cursor_is_400(lake):
+    client, _, _ = lake
+    assert client.get("/latest", params={"symbol": "AAPL", "cursor": "zz!"}).status_code == 400
+    assert client.get("/latest", params={"symbol": "AAPL", "since": "nope"}).status_code == 400
+
+
+def test_cursor_returns_only_new_bars(lake):
+    client, s3, df = lake
+    first = get(client, limit=5)
+    assert stamps(first) == [t.isoformat() for t in df["timestamp"].iloc[-5:]]
+
+    unchanged = get(client, cursor=first["next_cursor"])
+    assert unchanged["candles"] == [] and not unchanged["replaced"]
+    assert unchanged["next_cursor"] == first["next_cursor"]
+
+    last = df.tail(1)
+    new = last.assign(timestamp=last["timestamp"] + pd.Timedelta(hours=1))
+    with contextlib.redirect_stdout(io.StringIO()):
+        write_parquet_partitioned(new, S3Storage(RAW_BUCKET, client=s3), "1h", "AAPL")
+
+    delta = get(client, cursor=first["next_cursor"])
+    assert stamps(delta) == [new["timestamp"].iloc[0].isoformat()]
+    assert not delta["replaced"]
+
+
+def test_since_pages_through_the_delta_in_order(lake):
+    client, _, df = lake
+    since = df["timestamp"].iloc[-301]
+    got, params, pages = [], {"limit": 120, "since": since.isoformat()}, 0
+    while True:
+        body = get(client, **params)
+        got += stamps(body)
+        pages += 1
+        if not body["has_more"]:
+            break
+        params = {"limit": 120, "cursor": body["next_cursor"]}
+
+    assert pages == 3
+    assert got == [t.isoformat() for t in df["timestamp"].iloc[-300:]]
+    assert get(client, cursor=body["next_cursor"])["candles"] == []
+
+
+def test_forming_bar_from_cursor_is_sent_again_as_replaced(lake):
+    client, _, df = lake
+    last = df["timestamp"].iloc[-1]
+
+    body = get(client, cursor=encode_cursor(last, True))
+    assert stamps(body) == [last.isoformat()]
+    assert body["replaced"]
+
+    closed = get(client, cursor=encode_cursor(last, False))
+    assert closed["candles"] == [] and not closed["replaced"]
@@ -0,0 +1,38 @@
+"""Paridade entre o scorer compacto (.npz, usado pela API) e o predict_proba do sklearn."""
+import numpy as np
+import pytest
+
+from app.ml.features import add_basic_features, make_label
+from app.ml.model import (
+    CompactModel,
+    compact_path,
+    model_features,
+    save_model,
+    to_compact,
+    train_classifier,
+    train_full_incremental,
+)
+from app.ml.trainer import PARITY_TOL
+from benchmarks.fixtures import make_candles
+
+TRAINERS = {"LogisticRegression": train_classifier, "IncrementalLogit": train_full_incremental}
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return make_label(add_basic_features(make_candles("AAPL", "1d", years=2, seed=0)))
+
+
+@pytest.mark.parametrize("kind", sorted(TRAINERS))
+def test_compact_matches_predict_proba(kind, frame, tmp_path):
+    train, test = frame.iloc[:-90], frame.iloc[-90:]
+    clf = TRAINERS[kind](train, random_state=0)
+    model_path = str(tmp_path / "AAPL_daily_logreg.pkl")
+    save_model(clf, model_path, to_compact(clf, train))
+
+    compact = CompactModel.load(compact_path(model_path))
+
+    assert compact.meta["model"] == kind
+    assert compact.features == model_features(clf)
+    expected = clf.predict_proba(test[model_features(clf)])[:, 1]
+    np.testing.assert_allclose(compact.predict_proba_up(test), expected, rtol=0, atol=PARITY_TOL)
@@ -0,0 +1,70 @@
+"""StreamHub: o que chega aos assinantes quando o lake muda entre polls."""
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from app.fastapi_app.main import serialize_candles
+from app.fastapi_app.stream import StreamHub
+from app.lake.storage import LocalStorage
+from app.lake.writer import write_parquet_partitioned
+from benchmarks.fixtures import make_candles
+
+
+def write(df, storage):
+    with contextlib.redirect_stdout(io.StringIO()):
+        write_parquet_partitioned(df, storage, "1h", "AAPL")
+
+
+def next_bar(df, hours=1):
+    last = df.tail(1)
+    return last.assign(timestamp=last["timestamp"] + pd.Timedelta(hours=hours))
+
+
+@pytest.fixture
+def lake(tmp_path):
+    storage = LocalStorage(tmp_path)
+    candles = make_candles("AAPL", "1h", years=0.1, seed=0)
+    write(candles, storage)
+    return storage, candles
+
+
+def test_first_poll_seeds_window_from_newest_partitions(lake):
+    storage, candles = lake
+    # Última escrita regrava um pregão antigo (como o repair_gaps)
+    write(candles.head(7).assign(close=candles["close"].head(7) * 1.01), storage)
+
+    payload = StreamHub(lambda: storage, serialize_candles)._poll_topic("AAPL", "1h")
+
+    assert payload["candles"][-1]["timestamp"] == candles["timestamp"].iloc[-1].isoformat()
+
+
+def test_single_write_publishes_only_its_changes(lake):
+    storage, candles = lake
+    hub = StreamHub(lambda: storage, serialize_candles)
+    hub._poll_topic("AAPL", "1h")
+
+    new = next_bar(candles)
+    write(new, storage)
+    payload = hub._poll_topic("AAPL", "1h")
+
+    assert [c["timestamp"] for c in payload["candles"]] == [new["timestamp"].iloc[0].isoformat()]
+    assert payload["replaced"] == []
+    assert hub._poll_topic("AAPL", "1h") is None
+
+
+def test_several_writes_between_polls_are_all_published(lake):
+    storage, candles = lake
+    hub = StreamHub(lambda: storage, serialize_candles)
+    hub._poll_topic("AAPL", "1h")
+
+    # Duas escritas em pregões diferentes antes do próximo poll: o watermark só lista a última
+    first, second = next_bar(candles, hours=24), next_bar(candles, hours=48)
+    write(first, storage)
+    write(second, storage)
+    payload = hub._poll_topic("AAPL", "1h")
+
+    published = {c["timestamp"] for c in payload["candles"]}
+    assert first["timestamp"].iloc[0].isoformat() in published
+    assert second["timestamp"].iloc[0].isoformat() in published
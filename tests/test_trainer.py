@@ -0,0 +1,53 @@
+"""run_parallel: falha de uma tarefa ou de um worker não derruba as outras."""
+import os
+
+from app.ml import trainer
+
+
+def _task(task):
+    symbol = task[0]
+    if symbol == "IOERR":
+        raise OSError("s3 read failed")
+    if symbol == "CRASH":
+        os._exit(9)  # worker morto, como um OOM-kill
+    return {"symbol": symbol, "status": "trained"}
+
+
+def test_task_exception_only_fails_that_task():
+    results = trainer.run_parallel([("AAPL",), ("IOERR",), ("MSFT",)], workers=2, fn=_task)
+
+    assert [r["status"] for r in results] == ["trained", "error", "trained"]
+    assert "OSError" in results[1]["error"]
+
+
+def test_dead_pool_worker_becomes_error_results():
+    results = trainer.run_parallel([("AAPL",), ("CRASH",), ("MSFT",)], workers=2, fn=_task)
+
+    assert [r["symbol"] for r in results] == ["AAPL", "CRASH", "MSFT"]
+    assert results[1]["status"] == "error"
+    assert all(r["status"] in ("trained", "error") for r in results)
+
+
+def test_pipe_runner_keeps_order_and_isolates_failures():
+    results = trainer._run_pipes(_task, [("AAPL",), ("IOERR",), ("MSFT",), ("NVDA",)], workers=2)
+
+    assert [r["symbol"] for r in results] == ["AAPL", "IOERR", "MSFT", "NVDA"]
+    assert [r["status"] for r in results] == ["trained", "error", "trained", "trained"]
+
+
+def test_dead_pipe_worker_fails_only_its_tasks():
+    results = trainer._run_pipes(_task, [("AAPL",), ("CRASH",), ("MSFT",), ("NVDA",)], workers=2)
+
+    # Worker 1 recebe CRASH e NVDA (round-robin) e morre; worker 0 termina normalmente
+    assert [r["status"] for r in results] == ["trained", "error", "trained", "error"]
+    assert "exitcode=9" in results[1]["error"]
+
+
+def test_pool_creation_oserror_falls_back_to_pipes(monkeypatch):
+    def no_semaphores(*args, **kwargs):
+        raise OSError("[Errno 38] Function not implemented")
+
+    monkeypatch.setattr(trainer, "ProcessPoolExecutor", no_semaphores)
+    results = trainer.run_parallel([("AAPL",), ("MSFT",)], workers=2, fn=_task)
+
+    assert [r["status"] for r in results] == ["trained", "trained"]
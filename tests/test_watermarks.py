@@ -0,0 +1,84 @@
+"""Watermarks por símbolo e seleção dos símbolos a retreinar."""
+import json
+
+import pandas as pd
+
+from app.jobs.train_daily import (
+    TRAINING_REPORT_KEY,
+    consumed_watermark,
+    merge_training_report,
+    save_training_state,
+    select_symbols,
+)
+from app.lake.storage import LocalStorage
+from app.lake.watermarks import changed_since, read_watermark
+from app.lake.writer import write_parquet_partitioned
+
+
+def candles(start, periods, close=100.0):
+    ts = pd.date_range(start, periods=periods, freq="1D", tz="UTC")
+    return pd.DataFrame({"timestamp": ts, "open": close, "high": close, "low": close, "close": close, "volume": 1})
+
+
+def test_rewrite_without_changes_writes_nothing(tmp_path):
+    storage = LocalStorage(tmp_path)
+    write_parquet_partitioned(candles("2025-08-25", 14), storage, "1d", "AAPL")
+    before = read_watermark(storage, "1d", "AAPL")
+
+    # Refetch dos últimos dias já gravados: nenhuma partição regravada, revisão não avança
+    assert write_parquet_partitioned(candles("2025-09-05", 3), storage, "1d", "AAPL") == []
+    assert read_watermark(storage, "1d", "AAPL") == before
+
+
+def test_watermark_tracks_revision_max_timestamp_and_partitions(tmp_path):
+    storage = LocalStorage(tmp_path)
+    write_parquet_partitioned(candles("2025-08-25", 14), storage, "1d", "AAPL")
+    first = read_watermark(storage, "1d", "AAPL")
+    assert first["revision"] == 1
+    assert pd.Timestamp(first["max_timestamp"]) == pd.Timestamp("2025-09-07", tz="UTC")
+    assert len(first["partitions"]) == 2
+
+    # Correção de um pregão antigo: nova revisão, só a partição de agosto, max_timestamp mantido
+    write_parquet_partitioned(candles("2025-08-26", 1, close=99.0), storage, "1d", "AAPL")
+    second = read_watermark(storage, "1d", "AAPL")
+    assert second["revision"] == 2
+    assert second["max_timestamp"] == first["max_timestamp"]
+    assert [p.split("symbol=AAPL/")[1] for p in second["partitions"]] == ["year=2025/month=8/part-0.parquet"]
+
+
+def test_changed_since():
+    assert changed_since({"revision": 3}, {"revision": 3}) is False
+    assert changed_since({"revision": 4}, {"revision": 3}) is True
+    # Sem watermark ou sem treino anterior: não há como saber, então treina
+    assert changed_since(None, {"revision": 3}) is True
+    assert changed_since({"revision": 1}, None) is True
+
+
+def test_select_symbols_skips_only_unchanged(tmp_path):
+    raw, models = LocalStorage(tmp_path / "raw"), LocalStorage(tmp_path / "models")
+    for sym in ("AAPL", "MSFT"):
+        write_parquet_partitioned(candles("2025-08-25", 14), raw, "1d", sym)
+    save_training_state(models, {
+        sym: consumed_watermark(read_watermark(raw, "1d", sym), "trained") for sym in ("AAPL", "MSFT")
+    })
+    write_parquet_partitioned(candles("2025-09-08", 1), raw, "1d", "MSFT")
+
+    pending, skipped, _, _ = select_symbols(raw, models, ["AAPL", "MSFT", "NVDA"])
+    assert pending == ["MSFT", "NVDA"]
+    assert skipped == {"AAPL": {"status": "skipped", "reason": "no new data since last training", "revision": 1}}
+
+    forced, skipped, _, _ = select_symbols(raw, models, ["AAPL", "MSFT"], force=True)
+    assert forced == ["AAPL", "MSFT"] and skipped == {}
+
+
+def test_report_keeps_last_real_metrics_for_skipped_symbols(tmp_path):
+    models = LocalStorage(tmp_path)
+    models.write_bytes(TRAINING_REPORT_KEY, json.dumps({"AAPL": {"accuracy": 0.55}, "MSFT": {"accuracy": 0.5}}).encode())
+
+    merged = merge_training_report(models, {
+        "AAPL": {"status": "skipped", "revision": 1},
+        "MSFT": {"accuracy": 0.6},
+        "NVDA": {"status": "skipped", "revision": 1},
+    })
+
+    assert merged == {"AAPL": {"accuracy": 0.55}, "MSFT": {"accuracy": 0.6}, "NVDA": {"status": "skipped", "revision": 1}}
@@ -0,0 +1,108 @@
+"""Escrita particionada do lake: merge, dedup, arquivos antigos e schema compacto."""
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from app.lake.schema import CANDLE_COLS, candle_schema, normalize_candles
+from app.lake.storage import LocalStorage, S3Storage
+from app.lake.writer import symbol_prefix, write_parquet_partitioned
+from benchmarks.local_s3 import LocalS3Client
+
+
+def candles(start, periods, freq="1h", close=100.0):
+    ts = pd.date_range(start, periods=periods, freq=freq, tz="UTC")
+    return pd.DataFrame({
+        "timestamp": ts, "open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1000,
+    })
+
+
+def read_all(storage, interval="1h", symbol="AAPL"):
+    keys = sorted(k for k in storage.list_keys(symbol_prefix(interval, symbol) + "/") if k.endswith(".parquet"))
+    return keys, pd.concat([storage.read_table(k).to_pandas() for k in keys], ignore_index=True)
+
+
+@pytest.fixture(params=["local", "s3"])
+def storage(request, tmp_path):
+    if request.param == "local":
+        return LocalStorage(tmp_path)
+    return S3Storage("raw", client=LocalS3Client())
+
+
+def test_writes_one_file_per_day_partition(storage):
+    written = write_parquet_partitioned(candles("2025-09-02 13:30", 30), storage, "1h", "AAPL")
+
+    keys, stored = read_all(storage)
+    assert written == keys
+    assert [k.split("symbol=AAPL/")[1] for k in keys] == [
+        "year=2025/month=9/day=2/part-0.parquet", "year=2025/month=9/day=3/part-0.parquet",
+    ]
+    assert len(stored) == 30
+
+
+def test_daily_interval_is_partitioned_by_month(storage):
+    write_parquet_partitioned(candles("2025-08-25", 14, freq="1D"), storage, "1d", "AAPL")
+
+    keys, stored = read_all(storage, "1d")
+    assert [k.split("symbol=AAPL/")[1] for k in keys] == [
+        "year=2025/month=8/part-0.parquet", "year=2025/month=9/part-0.parquet",
+    ]
+    assert len(stored) == 14
+
+
+def test_merge_keeps_existing_rows_and_last_write_wins(storage):
+    write_parquet_partitioned(candles("2025-09-02 13:30", 6), storage, "1h", "AAPL")
+    # Refetch sobrepõe as duas últimas barras (valor novo) e acrescenta uma
+    write_parquet_partitioned(candles("2025-09-02 17:30", 3, close=101.0), storage, "1h", "AAPL")
+
+    _, stored = read_all(storage)
+    assert stored["timestamp"].is_monotonic_increasing and stored["timestamp"].is_unique
+    assert list(stored["close"]) == [100.0] * 4 + [101.0] * 3
+
+
+def test_legacy_files_are_folded_into_the_part_file(storage):
+    prefix = symbol_prefix("1h", "AAPL") + "/year=2025/month=9/day=2"
+    # Arquivo no formato antigo (write_to_dataset: nome uuid, float64, symbol string)
+    legacy = candles("2025-09-02 13:30", 3).assign(symbol="AAPL")
+    storage.write_table(pa.Table.from_pandas(legacy), f"{prefix}/3f2a9c0e.parquet")
+
+    write_parquet_partitioned(candles("2025-09-02 16:30", 2), storage, "1h", "AAPL")
+
+    keys, stored = read_all(storage)
+    assert keys == [f"{prefix}/part-0.parquet"]
+    assert len(stored) == 5
+
+
+def test_normalize_yfinance_frames_to_compact_schema():
+    idx = pd.DatetimeIndex(pd.date_range("2025-09-02", periods=3, freq="1D"), name="Date")
+    flat = pd.DataFrame(
+        {"Open": [1.0, 2.0, 3.0], "High": 4.0, "Low": 0.5, "Close": [1.5, None, 2.5], "Volume": [10.0, None, 30.0]},
+        index=idx,
+    )
+    multi = flat.copy()
+    multi.columns = pd.MultiIndex.from_product([flat.columns, ["AAPL"]])
+
+    for raw in (flat, multi):
+        out = normalize_candles(raw, "AAPL", "1d")
+        assert list(out.columns) == CANDLE_COLS
+        assert str(out["timestamp"].dt.tz) == "UTC"
+        assert out["close"].dtype == "float32" and out["volume"].dtype == "int64"
+        assert list(out["symbol"].cat.categories) == ["AAPL"]
+        # Linha sem fechamento é descartada
+        assert list(out["close"]) == [1.5, 2.5]
+
+
+def test_stored_files_use_the_compact_schema(storage):
+    # Entrada float64 com symbol string (como os arquivos antigos) sai no schema compacto
+    write_parquet_partitioned(candles("2025-09-02 13:30", 3).assign(symbol="AAPL"), storage, "1h", "AAPL")
+
+    keys, stored = read_all(storage)
+    schema = storage.read_table(keys[0]).schema
+    assert schema.metadata is None
+    # O Parquet devolve os índices de dictionary como int32; os tipos de valor são os do schema
+    for field in candle_schema():
+        stored_type = schema.field(field.name).type
+        if pa.types.is_dictionary(field.type):
+            assert stored_type.value_type == field.type.value_type
+        else:
+            assert stored_type == field.type
+    assert stored["symbol"].dtype == "category"